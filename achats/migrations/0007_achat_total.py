@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from common.backfill import backfill_update
+
+
+def remplir_totaux(apps, schema_editor):
+    Achat = apps.get_model('achats', 'Achat')
+    LigneAchat = apps.get_model('achats', 'LigneAchat')
+    somme = (
+        LigneAchat.objects.filter(achat_id=OuterRef('pk'))
+        .values('achat_id')
+        .annotate(s=Sum('montant'))
+        .values('s')[:1]
+    )
+    backfill_update(Achat.objects.all(), {'total': Coalesce(Subquery(somme), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achats', '0006_alter_achat_created_by_alter_achat_deleted_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achat',
+            name='total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total (Ar)'),
+        ),
+        migrations.AddIndex(
+            model_name='achat',
+            index=models.Index(fields=['paiement', 'statut_publication'], name='achat_paiement_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='achat',
+            index=models.Index(fields=['date'], name='achat_date_idx'),
+        ),
+        migrations.RunPython(remplir_totaux, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from articles.models import Article 
 from common.models import Caisse
 from common.mixins import AuditMixin
@@ -8,13 +11,33 @@ class Achat(AuditMixin):
     num_facture = models.TextField("N° Facture", blank=True, null=True)
     remarque = models.TextField("Remarque", blank=True, null=True)
     paiement = models.ForeignKey(Caisse, null=True, on_delete=models.SET_NULL)
+    # Somme des lignes, tenue à jour par achats.signals (SUM SQL direct dans les rapports)
+    total = models.PositiveIntegerField("Total (Ar)", default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["paiement", "statut_publication"], name="achat_paiement_statut_idx"),
+            models.Index(fields=["date"], name="achat_date_idx"),
+        ]
 
     def __str__(self):
         return f"Achat du {self.date}"
 
-    @property
-    def total(self):
-        return sum(ligne.montant for ligne in self.lignes_achats.all())
+    @staticmethod
+    def total_lignes_expr():
+        """Sous-requête SUM(lignes.montant) pour un UPDATE ensembliste."""
+        somme = (
+            LigneAchat.objects.filter(achat_id=OuterRef("pk"))
+            .values("achat_id")
+            .annotate(s=Sum("montant"))
+            .values("s")[:1]
+        )
+        return Coalesce(Subquery(somme), Value(0))
+
+    @classmethod
+    def recalculer_totaux(cls, achat_ids):
+        # update() ne passe pas par auto_now : updated_at daté ici pour backup_stream --since
+        return cls.objects.filter(pk__in=achat_ids).update(total=cls.total_lignes_expr(), updated_at=timezone.now())
 
 class LigneAchat(AuditMixin):
     achat = models.ForeignKey(Achat, on_delete=models.CASCADE, related_name="lignes_achats")
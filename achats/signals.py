@@ -0,0 +1,11 @@
+# achats/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Achat, LigneAchat
+
+
+@receiver(post_save, sender=LigneAchat)
+@receiver(post_delete, sender=LigneAchat)
+def maj_total_achat(sender, instance, **kwargs):
+    # Un seul UPDATE ... SET total = (SELECT SUM ...) par écriture de ligne
+    Achat.recalculer_totaux([instance.achat_id])
@@ -2,6 +2,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse, QueryDict
+from django.db.models import Sum
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate
@@ -9,6 +10,7 @@ from django.contrib import messages
 from datetime import date
 from django.template.loader import render_to_string
 from django.utils.dateparse import parse_date
+from common import referentiel
 from common.decorators import admin_required
 from .models import Achat, LigneAchat
 from common.models import Caisse
@@ -55,7 +57,7 @@ def build_achats_context(request):
     # Données annexes
     articles_qs   = Article.actifs.all().order_by('nom')
     articles_data = list(articles_qs.values('id', 'nom', 'prix_achat'))
-    total_achats  = sum(a.total for a in Achat.actifs.select_related('paiement'))
+    total_achats  = Achat.actifs.aggregate(total=Sum('total'))['total'] or 0
 
     # 🔁 mode d’affichage (session dédiée aux achats)
     display_mode = resolve_display_mode(request, session_key="display_achats", default="cards")
@@ -65,7 +67,7 @@ def build_achats_context(request):
         'page_obj': page_obj,
         'total_achats': total_achats,
         'articles': articles_data,
-        'caisses': Caisse.actifs.all(),
+        'caisses': referentiel.caisses(),
         'today': date.today().isoformat(),
         'filter_article': article_id,
         'date_filter': date_filter,
@@ -198,7 +200,7 @@ def achat_edit(request, pk):
         "form": form,
         "achat": achat,
         "articles": articles,
-        'caisses' : Caisse.actifs.all(),
+        'caisses' : referentiel.caisses(),
         "articles_json": articles_json,
         "date": achat.date.isoformat(),
         "num_facture": achat.num_facture,
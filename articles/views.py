@@ -7,10 +7,11 @@ from django.contrib import messages
 from django.contrib.auth import authenticate
 from django.db.models.deletion import ProtectedError
 
+from common import referentiel
 from common.decorators import admin_required
 from common.utils import is_admin, resolve_display_mode
 
-from .models import Article, Service, Taille, Couleur, Categorie
+from .models import Article, Service
 from .forms import ArticleForm, ServiceForm
 
 
@@ -59,9 +60,9 @@ def build_articles_context(request):
     display_mode = resolve_display_mode(request, session_key="display_articles", default="cards")
 
     # 👇 Injecter les listes pour les <select> des modaux
-    tailles = Taille.objects.all().order_by('taille')
-    couleurs = Couleur.objects.all().order_by('couleur')
-    categories = Categorie.objects.all().order_by('categorie')
+    tailles = referentiel.tailles()
+    couleurs = referentiel.couleurs()
+    categories = referentiel.categories()
 
     return {
         'articles': page_obj.object_list,
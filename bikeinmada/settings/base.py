@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'charges',
     'caisses',
     'statistiques',
+    'comptabilite',
     'service',
     'pwa',
     'configuration',
@@ -42,7 +43,9 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'common.middleware.CurrentUserMiddleware',
+    'common.middleware.PermissionsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'statistiques.middleware.PeriodeClotureeMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0006_pages_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('caisses', '0006_alter_mouvementcaisse_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Releve',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut_publication', models.CharField(choices=[('publié', 'Publié'), ('modifié', 'Modifié'), ('supprimé', 'Supprimé')], default='publié', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('fichier', models.CharField(max_length=255)),
+                ('date_debut', models.DateField(blank=True, null=True)),
+                ('date_fin', models.DateField(blank=True, null=True)),
+                ('caisse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='releves', to='common.caisse')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_created_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+                ('deleted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_deleted_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_updated_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='LigneReleve',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('libelle', models.CharField(blank=True, max_length=255)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('montant', models.BigIntegerField()),
+                ('statut', models.CharField(choices=[('non_rapprochee', 'Non rapprochée'), ('suggeree', 'Suggérée'), ('rapprochee', 'Rapprochée')], default='non_rapprochee', max_length=15)),
+                ('source_type', models.CharField(blank=True, max_length=12)),
+                ('source_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('caisse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes_releve', to='common.caisse')),
+                ('releve', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='caisses.releve')),
+            ],
+            options={
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['caisse', 'statut', 'date'], name='releve_caisse_statut_idx'), models.Index(fields=['source_type', 'source_id'], name='releve_source_idx')],
+            },
+        ),
+    ]
@@ -21,4 +21,43 @@ class MouvementCaisse(AuditMixin):
     reference = models.CharField(max_length=255, blank=True)
 
     def __str__(self):
-        return f"{self.date.date()} - {self.montant} Ar de {self.caisse_debit} à {self.caisse_credit}"
\ No newline at end of file
+        return f"{self.date.date()} - {self.montant} Ar de {self.caisse_debit} à {self.caisse_credit}"
+
+class Releve(AuditMixin):
+    """Relevé bancaire / mobile money importé (CSV ou XLSX) pour une caisse."""
+    caisse = models.ForeignKey(Caisse, on_delete=models.CASCADE, related_name="releves")
+    fichier = models.CharField(max_length=255)
+    date_debut = models.DateField(null=True, blank=True)
+    date_fin = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Relevé {self.caisse.nom} - {self.fichier}"
+
+
+class LigneReleve(models.Model):
+    STATUT_CHOICES = [
+        ("non_rapprochee", "Non rapprochée"),
+        ("suggeree", "Suggérée"),
+        ("rapprochee", "Rapprochée"),
+    ]
+
+    releve = models.ForeignKey(Releve, on_delete=models.CASCADE, related_name="lignes")
+    caisse = models.ForeignKey(Caisse, on_delete=models.CASCADE, related_name="lignes_releve")
+    date = models.DateField()
+    libelle = models.CharField(max_length=255, blank=True)
+    reference = models.CharField(max_length=100, blank=True)
+    montant = models.BigIntegerField()  # > 0 : entrée en caisse, < 0 : sortie
+    statut = models.CharField(max_length=15, choices=STATUT_CHOICES, default="non_rapprochee")
+    # Pièce rapprochée, même clé que comptabilite.Ecriture (vente, charge, versement...)
+    source_type = models.CharField(max_length=12, blank=True)
+    source_id = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["date", "id"]
+        indexes = [
+            models.Index(fields=["caisse", "statut", "date"], name="releve_caisse_statut_idx"),
+            models.Index(fields=["source_type", "source_id"], name="releve_source_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.libelle} {self.montant}"
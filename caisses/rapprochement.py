@@ -0,0 +1,272 @@
+# caisses/rapprochement.py
+"""
+Import des relevés (banque, MVola, Orange Money...) et rapprochement avec
+les pièces de la caisse.
+
+Les candidats sont les écritures du compte caisse (comptabilite.Ecriture) :
+ventes, charges, versements, achats et mouvements, avec le même signe que le
+relevé (débit = entrée, crédit = sortie). Ils sont rangés dans des paniers
+{(caisse, montant): [pièces triées par date]} ; une ligne de relevé ne
+compare donc que les pièces de même montant, dans la fenêtre de dates, par
+recherche dichotomique — jamais toutes les paires.
+"""
+import io
+import os
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from django.db import connection, transaction
+
+from common.utils import filtrer_periode
+from comptabilite.journal import COMPTE_CAISSE
+from comptabilite.models import Ecriture
+from .models import LigneReleve, Releve
+
+FENETRE_JOURS = 3
+
+# Formats de date acceptés, essayés dans l'ordre (jamais de jour/mois deviné)
+FORMATS_DATE = ("%Y-%m-%d", "%d/%m/%Y")
+
+# Noms de colonnes acceptés (en minuscules) -> champ de LigneReleve
+COLONNES = {
+    "date": ("date", "date operation", "date opération", "date valeur"),
+    "libelle": ("libelle", "libellé", "description", "motif"),
+    "reference": ("reference", "référence", "ref", "transaction id", "id transaction"),
+    "montant": ("montant", "amount"),
+    "credit": ("credit", "crédit", "entrée", "entree"),
+    "debit": ("debit", "débit", "sortie"),
+}
+
+
+def _colonne(df, champ):
+    for nom in COLONNES[champ]:
+        if nom in df.columns:
+            return df[nom]
+    return None
+
+
+def _entier(serie):
+    return pd.to_numeric(serie, errors="coerce").fillna(0).round().astype("int64")
+
+
+def _date(valeur):
+    """Date d'une cellule : date Excel, ou texte AAAA-MM-JJ puis JJ/MM/AAAA (heure ignorée) ; None sinon."""
+    if isinstance(valeur, datetime):  # pd.Timestamp compris
+        return valeur.date()
+    if isinstance(valeur, date):
+        return valeur
+    texte = str(valeur).strip().split(" ")[0]
+    for fmt in FORMATS_DATE:
+        try:
+            return datetime.strptime(texte, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def lire_releve(fichier, nom=None):
+    """
+    Lit un relevé CSV/XLSX et renvoie une liste de dicts {date, libelle,
+    reference, montant}. Montant signé, ou colonnes crédit/débit séparées.
+    Une ligne avec un montant mais une date illisible fait échouer la lecture
+    (ValueError qui cite les lignes du fichier) : elle n'est jamais ignorée.
+    """
+    nom = (nom or getattr(fichier, "name", "") or "").lower()
+    if nom.endswith((".xlsx", ".xls")):
+        df = pd.read_excel(fichier)
+    else:
+        brut = fichier.read()
+        if isinstance(brut, bytes):
+            try:
+                brut = brut.decode("utf-8-sig")
+            except UnicodeDecodeError:
+                brut = brut.decode("latin-1")
+        # Séparateur détecté automatiquement (',' ou ';' selon l'export)
+        df = pd.read_csv(io.StringIO(brut), sep=None, engine="python")
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+
+    dates = _colonne(df, "date")
+    if dates is None:
+        raise ValueError("Colonne « date » introuvable dans le relevé.")
+
+    montant = _colonne(df, "montant")
+    if montant is not None:
+        montants = _entier(montant)
+    else:
+        credit, debit = _colonne(df, "credit"), _colonne(df, "debit")
+        if credit is None and debit is None:
+            raise ValueError("Colonne « montant » (ou « crédit » / « débit ») introuvable.")
+        montants = (_entier(credit) if credit is not None else 0) - (_entier(debit) if debit is not None else 0)
+
+    libelles = _colonne(df, "libelle")
+    references = _colonne(df, "reference")
+    lignes, illisibles = [], []
+    for i in range(len(df)):
+        if not montants.iloc[i]:
+            continue
+        jour = None if pd.isna(dates.iloc[i]) else _date(dates.iloc[i])
+        if jour is None:
+            illisibles.append(i + 2)  # ligne du fichier, en-tête = ligne 1
+            continue
+        lignes.append({
+            "date": jour,
+            "libelle": "" if libelles is None or pd.isna(libelles.iloc[i]) else str(libelles.iloc[i]).strip()[:255],
+            "reference": "" if references is None or pd.isna(references.iloc[i]) else str(references.iloc[i]).strip()[:100],
+            "montant": int(montants.iloc[i]),
+        })
+    if illisibles:
+        cites = ", ".join(map(str, illisibles[:10])) + (" ..." if len(illisibles) > 10 else "")
+        raise ValueError(
+            f"Date illisible ligne(s) {cites} (formats acceptés : AAAA-MM-JJ ou JJ/MM/AAAA)."
+        )
+    return lignes
+
+
+@transaction.atomic
+def importer_releve(caisse, fichier, user=None):
+    """Crée le relevé et ses lignes ; les lignes déjà importées pour la caisse sont ignorées."""
+    lignes = lire_releve(fichier)
+    if not lignes:
+        raise ValueError("Aucune ligne exploitable dans le relevé.")
+
+    date_debut = min(l["date"] for l in lignes)
+    date_fin = max(l["date"] for l in lignes)
+    deja = set(
+        LigneReleve.objects.filter(caisse=caisse, date__gte=date_debut, date__lte=date_fin)
+        .values_list("date", "montant", "reference", "libelle")
+    )
+    releve = Releve.objects.create(
+        caisse=caisse,
+        fichier=os.path.basename(getattr(fichier, "name", "") or "releve")[:255],
+        date_debut=date_debut,
+        date_fin=date_fin,
+        created_by=user,
+    )
+    nouvelles = [
+        LigneReleve(releve=releve, caisse=caisse, **l)
+        for l in lignes
+        if (l["date"], l["montant"], l["reference"], l["libelle"]) not in deja
+    ]
+    LigneReleve.objects.bulk_create(nouvelles, batch_size=1000)
+    return releve, len(nouvelles), len(lignes) - len(nouvelles)
+
+
+def _pieces_rapprochees(caisse_ids):
+    """{(caisse_id, source_type, source_id)} déjà validées (un mouvement touche deux caisses)."""
+    return set(
+        LigneReleve.objects.filter(caisse_id__in=caisse_ids, statut="rapprochee")
+        .values_list("caisse_id", "source_type", "source_id")
+    )
+
+
+def _paniers(caisse_ids, depuis, avant, exclues):
+    """{(caisse_id, montant signé): [(date, source_type, source_id, libelle)] trié par date}."""
+    ecritures = filtrer_periode(
+        Ecriture.objects.filter(compte=COMPTE_CAISSE, caisse_id__in=caisse_ids), "date", depuis, avant
+    )
+    paniers = defaultdict(list)
+    for caisse_id, jour, debit, credit, source_type, source_id, libelle in ecritures.order_by("date", "id").values_list(
+        "caisse_id", "date", "debit", "credit", "source_type", "source_id", "libelle"
+    ):
+        if (caisse_id, source_type, source_id) in exclues:
+            continue
+        paniers[(caisse_id, debit - credit)].append((jour, source_type, source_id, libelle))
+    return paniers
+
+
+@transaction.atomic
+def rapprocher(caisse_ids, depuis=None, avant=None, fenetre=FENETRE_JOURS):
+    """
+    Rapproche les lignes non rapprochées des caisses sur [depuis, avant).
+    Un seul candidat dans la fenêtre : rapprochée ; plusieurs : suggérée
+    (le plus proche en date) ; aucun : reste non rapprochée. Les lignes
+    déjà rapprochées (validées) ne sont pas remises en cause.
+    """
+    lignes = LigneReleve.objects.filter(caisse_id__in=caisse_ids).exclude(statut="rapprochee")
+    lignes = list(filtrer_periode(lignes, "date", depuis, avant).order_by("date", "id"))
+
+    marge = timedelta(days=fenetre)
+    paniers = _paniers(
+        caisse_ids,
+        depuis - marge if depuis else None,
+        avant + marge if avant else None,
+        _pieces_rapprochees(caisse_ids),
+    )
+    dates_paniers = {cle: [p[0] for p in pieces] for cle, pieces in paniers.items()}
+    utilisees = set()
+
+    def candidats(ligne):
+        cle = (ligne.caisse_id, ligne.montant)
+        dates = dates_paniers.get(cle, [])
+        debut = bisect_left(dates, ligne.date - marge)
+        fin = bisect_right(dates, ligne.date + marge)
+        return [
+            p for p in paniers[cle][debut:fin]
+            if (ligne.caisse_id, p[1], p[2]) not in utilisees
+        ] if dates else []
+
+    def attribuer(ligne, piece, statut):
+        ligne.statut = statut
+        ligne.source_type, ligne.source_id = piece[1], piece[2]
+        utilisees.add((ligne.caisse_id, piece[1], piece[2]))
+
+    for ligne in lignes:
+        ligne.statut, ligne.source_type, ligne.source_id = "non_rapprochee", "", None
+
+    # 1) Correspondances uniques, répétées tant qu'elles libèrent d'autres lignes
+    restantes = lignes
+    while restantes:
+        for ligne in restantes:
+            uniques = candidats(ligne)
+            if len(uniques) == 1:
+                attribuer(ligne, uniques[0], "rapprochee")
+        suivantes = [l for l in restantes if l.statut != "rapprochee"]
+        if len(suivantes) == len(restantes):
+            break
+        restantes = suivantes
+
+    # 2) Cas ambigus : on suggère la pièce la plus proche en date
+    for ligne in restantes:
+        possibles = candidats(ligne)
+        if possibles:
+            meilleur = min(possibles, key=lambda p: abs((p[0] - ligne.date).days))
+            attribuer(ligne, meilleur, "suggeree")
+
+    _enregistrer(lignes)
+    return lignes
+
+
+def _enregistrer(lignes):
+    """
+    Écrit statut/pièce de chaque ligne par un UPDATE paramétré exécuté en lot
+    (executemany) : bulk_update génère un CASE par ligne, trop lent sur quelques milliers.
+    """
+    table = LigneReleve._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {connection.ops.quote_name(table)} "
+            "SET statut = %s, source_type = %s, source_id = %s WHERE id = %s",
+            [(l.statut, l.source_type, l.source_id, l.pk) for l in lignes],
+        )
+
+
+def ecarts(caisse_id, depuis=None, avant=None):
+    """
+    Rapport d'écarts : lignes de relevé sans pièce, et pièces de caisse
+    (écritures du compte caisse) sans ligne de relevé sur la période.
+    """
+    lignes = filtrer_periode(LigneReleve.objects.filter(caisse_id=caisse_id), "date", depuis, avant)
+    pieces = filtrer_periode(
+        Ecriture.objects.filter(compte=COMPTE_CAISSE, caisse_id=caisse_id), "date", depuis, avant
+    )
+
+    rapprochees = _pieces_rapprochees([caisse_id])
+    return {
+        "releve_sans_piece": lignes.filter(statut="non_rapprochee"),
+        "pieces_sans_releve": [
+            e for e in pieces.order_by("date", "id")
+            if (caisse_id, e.source_type, e.source_id) not in rapprochees
+        ],
+    }
@@ -1,3 +1,46 @@
-from django.test import TestCase
+import io
+from datetime import date
 
-# Create your tests here.
+import pandas as pd
+from django.test import SimpleTestCase
+
+from .rapprochement import lire_releve
+
+
+def csv(contenu, nom="releve.csv"):
+    fichier = io.BytesIO(contenu.encode("utf-8"))
+    fichier.name = nom
+    return fichier
+
+
+class LireReleveTests(SimpleTestCase):
+    def test_dates_iso_et_francaises(self):
+        lignes = lire_releve(csv(
+            "Date;Libellé;Montant\n"
+            "2024-03-04;Vente;15000\n"
+            "05/03/2024 10:12;Retrait;-2000\n"
+        ))
+        self.assertEqual([l["date"] for l in lignes], [date(2024, 3, 4), date(2024, 3, 5)])
+        self.assertEqual([l["montant"] for l in lignes], [15000, -2000])
+
+    def test_jour_et_mois_jamais_inverses(self):
+        lignes = lire_releve(csv("date,montant\n04/03/2024,100\n"))
+        self.assertEqual(lignes[0]["date"], date(2024, 3, 4))
+
+    def test_lignes_illisibles_signalees(self):
+        with self.assertRaises(ValueError) as erreur:
+            lire_releve(csv(
+                "date,credit,debit\n"
+                "2024-03-04,100,\n"
+                "03-04-2024,100,\n"
+                "31/02/2024,,50\n"
+                ",,\n"
+            ))
+        self.assertIn("ligne(s) 3, 4", str(erreur.exception))
+
+    def test_cellules_date_excel(self):
+        fichier = io.BytesIO()
+        pd.DataFrame({"Date": [pd.Timestamp(2024, 3, 4)], "Montant": [500]}).to_excel(fichier, index=False)
+        fichier.seek(0)
+        lignes = lire_releve(fichier, nom="releve.xlsx")
+        self.assertEqual(lignes, [{"date": date(2024, 3, 4), "libelle": "", "reference": "", "montant": 500}])
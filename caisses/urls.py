@@ -3,6 +3,11 @@ from . import views
 
 urlpatterns = [
     path('', views.etat_caisses, name='etat_caisses'),
+    path('soldes/', views.soldes_journaliers, name='soldes_journaliers'),
+    path('rapprochement/', views.rapprochement, name='rapprochement'),
+    path('rapprochement/importer/', views.importer_releve_view, name='importer_releve'),
+    path('rapprochement/lancer/', views.lancer_rapprochement, name='lancer_rapprochement'),
+    path('rapprochement/ligne/<int:pk>/<str:action>/', views.statut_ligne_releve, name='statut_ligne_releve'),
     path("mouvements/", views.mouvements_list, name="mouvements_list"),
     path("mouvement/ajouter/", views.ajouter_mouvement, name="ajouter_mouvement"),
     path('mouvements/modifier/<int:mouvement_id>/', views.modifier_mouvement, name='modifier_mouvement'),
@@ -1,10 +1,44 @@
 # caisses/utils.py
-from django.db.models import Sum
-from .models import Caisse, MouvementCaisse
-from ventes.models import Vente
-from achats.models import Achat
-from charges.models import Charge
-from caisses.models import Versement
+from collections import defaultdict
+from comptabilite.utils import flux_par_caisse
+from .models import Caisse
+
+# Composantes du solde d'une caisse (entrées puis sorties)
+FLUX_CAISSE = ("ventes", "mvt_entree", "achats", "charges", "versements", "mvt_sortie")
+FLUX_ENTREES = ("ventes", "mvt_entree")
+
+
+def flux_caisses(depuis=None, avant=None):
+    """
+    Flux par caisse sur [depuis, avant), lus dans le journal (compte caisse)
+    en un seul GROUP BY. Retourne {caisse_id: {"ventes": .., "achats": .., ...}}.
+    """
+    flux = defaultdict(lambda: dict.fromkeys(FLUX_CAISSE, 0))
+    for caisse_id, rubriques in flux_par_caisse(depuis, avant).items():
+        flux[caisse_id].update(rubriques)
+    return flux
+
+
+def flux_caisses_cumules(avant=None):
+    """
+    Flux depuis l'origine (jusqu'à `avant` exclu) : soldes figés des
+    périodes clôturées + flux vivants depuis la dernière clôture seulement.
+    """
+    from statistiques.models import Cloture, ClotureSolde
+
+    limite = Cloture.date_limite(avant=avant)
+    flux = flux_caisses(depuis=limite, avant=avant)
+    if limite:
+        for (rubrique, cle), montant in ClotureSolde.cumuls(prefixe="caisse_", avant=limite).items():
+            flux[int(cle)][rubrique[len("caisse_"):]] += montant
+    return flux
+
+
+def solde_caisse(caisse, flux):
+    f = flux.get(caisse.id) or dict.fromkeys(FLUX_CAISSE, 0)
+    entrees = sum(f[k] for k in FLUX_ENTREES)
+    sorties = sum(f[k] for k in FLUX_CAISSE if k not in FLUX_ENTREES)
+    return caisse.solde_initial + entrees - sorties
 
 
 def calculer_totaux_caisses(caisse_id=None):
@@ -13,32 +47,14 @@ def calculer_totaux_caisses(caisse_id=None):
     else:
         caisses = Caisse.objects.all()
 
+    flux = flux_caisses_cumules()
+
     total_solde_final = 0
     total_versements = 0
 
     for caisse in caisses:
-        ventes_total = Vente.actifs.filter(paiement=caisse).aggregate(total=Sum('montant'))['total'] or 0
-        achats_total = Achat.actifs.filter(paiement=caisse).aggregate(total=Sum('lignes_achats__montant'))['total'] or 0
-        charges_total = Charge.actifs.filter(
-            paiement=caisse,
-            libelle__compte_numero__startswith="6"
-        ).aggregate(total=Sum('montant'))['total'] or 0
-        versements_total = Versement.actifs.filter(caisse=caisse).aggregate(total=Sum('montant'))['total'] or 0
-
-        mouvements_entree = MouvementCaisse.actifs.filter(
-            caisse_credit_id=caisse.id
-        ).aggregate(total=Sum('montant'))['total'] or 0
-
-        mouvements_sortie = MouvementCaisse.actifs.filter(
-            caisse_debit_id=caisse.id
-        ).aggregate(total=Sum('montant'))['total'] or 0
-
-        entrees = ventes_total + mouvements_entree
-        sorties = achats_total + charges_total + versements_total + mouvements_sortie
-        solde_final = caisse.solde_initial + entrees - sorties
-
-        total_solde_final += solde_final
-        total_versements += versements_total
+        total_solde_final += solde_caisse(caisse, flux)
+        total_versements += flux.get(caisse.id, {}).get("versements", 0)
 
     return {
         'solde_final': total_solde_final,
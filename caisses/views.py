@@ -1,22 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum, Q, F, IntegerField, Value, Case, When
-from django.db.models.functions import TruncMonth
+from django.db.models import Sum, Count, Q, IntegerField, Value, Case, When
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.utils.dateparse import parse_date
 from django.utils.timezone import now
-from datetime import date
+from datetime import timedelta
 from calendar import monthrange
 from django.contrib import messages
-from collections import defaultdict
+from common import referentiel
 from common.decorators import admin_required
-from common.utils import is_admin
+from common.utils import Periode, annees_de, is_admin, lire_date, lire_pk, q_periodes
 from caisses.models import Caisse, Versement
-from caisses.utils import calculer_totaux_caisses
+from caisses.utils import calculer_totaux_caisses, flux_caisses_cumules, solde_caisse, FLUX_CAISSE
 from ventes.models import Vente, Commande, LigneCommande
-from achats.models import Achat
 from charges.models import Charge
-from common.models import Caisse, Pages
-from .models import MouvementCaisse
+from common.models import Caisse
+from .models import MouvementCaisse, LigneReleve, Releve
+from .rapprochement import importer_releve, rapprocher, ecarts
+from comptabilite.models import CaisseSoldeJournalier, RepartitionCharge
+from comptabilite.repartition import methode_valide, repartition
+from comptabilite.soldes import solde_au, soldes_au
 
 
 @login_required
@@ -25,56 +29,30 @@ def etat_caisses(request):
     # ------------------------------------------------------------------ #
     # 1)  ETAT INDIVIDUEL DES CAISSES  (GLOBAUX, NON FILTRÉS)
     # ------------------------------------------------------------------ #
-    caisses = Caisse.objects.all()
+    caisses = referentiel.caisses(actifs=False)
     etats = []
 
     total_solde_initial = total_entrees = total_achats = 0
     total_charges_caisses = total_versements = total_sorties = 0
     total_solde_final = total_mouvements = 0
 
-    for caisse in caisses:
-        ventes_total = (
-            Vente.actifs
-            .filter(paiement=caisse, commande__statut_vente="Payée")
-            .aggregate(total=Sum("montant"))["total"] or 0
-        )
-
-        achats_total = (
-            Achat.actifs.filter(paiement=caisse)
-            .aggregate(total=Sum("lignes_achats__montant"))["total"] or 0
-        )
-
-        charges_caisses_total = (
-            Charge.actifs
-            .filter(paiement=caisse, libelle__compte_numero__startswith="6")
-            .aggregate(total=Sum("montant"))["total"] or 0
-        )
-
-        versements_total = (
-            Versement.actifs.filter(caisse=caisse)
-            .aggregate(total=Sum("montant"))["total"] or 0
-        )
+    # Soldes figés des périodes clôturées + flux vivants depuis la dernière clôture
+    flux = flux_caisses_cumules()
 
-        mouvements_entree = (
-            MouvementCaisse.actifs.filter(caisse_credit_id=caisse.id)
-            .aggregate(total=Sum("montant"))["total"] or 0
-        )
-        mouvements_sortie = (
-            MouvementCaisse.actifs.filter(caisse_debit_id=caisse.id)
-            .aggregate(total=Sum("montant"))["total"] or 0
-        )
+    for caisse in caisses:
+        f = flux.get(caisse.id) or dict.fromkeys(FLUX_CAISSE, 0)
+        ventes_total = f["ventes"]
+        achats_total = f["achats"]
+        charges_caisses_total = f["charges"]
+        versements_total = f["versements"]
+        mouvements_entree = f["mvt_entree"]
+        mouvements_sortie = f["mvt_sortie"]
         mouvement = mouvements_entree - mouvements_sortie
         total_mouvements += mouvement
 
         entrees = ventes_total
         sorties = achats_total + charges_caisses_total + versements_total
-        solde_final = (
-            caisse.solde_initial
-            + entrees
-            + mouvements_entree
-            - sorties
-            - mouvements_sortie
-        )
+        solde_final = solde_caisse(caisse, flux)
 
         etats.append(
             {
@@ -104,97 +82,43 @@ def etat_caisses(request):
     year_param = (request.GET.get("year") or "").strip()
     month_param = (request.GET.get("month") or "").strip()
 
-    selected_year = int(year_param) if year_param and year_param.lower() != "tous" else None
-    selected_month = int(month_param) if month_param and month_param.lower() != "tous" else None
-
-    # Fenêtre temporelle annuelle
-    start_year = end_year = None
-    if selected_year:
-        start_year = date(selected_year, 1, 1)
-        end_year = date(selected_year + 1, 1, 1)  # exclusif
+    # « tous » ou valeur invalide : pas de filtre
+    selected_year = int(year_param) if year_param.isdecimal() else None
+    selected_month = int(month_param) if month_param.isdecimal() else None
+
+    # Périodes en intervalles de dates [début, fin) : les index sur les dates
+    # sont utilisés (pas de __year / __month). Mois sans année : ce mois pour
+    # chaque année où il y a des données.
+    annees = None
+    if selected_month and not selected_year:
+        annees = sorted(
+            set(annees_de(Commande.actifs.all(), "date_commande"))
+            | set(annees_de(Charge.actifs.all(), "date"))
+            | set(annees_de(Versement.actifs.all(), "date"))
+        )
+    periodes = Periode.depuis_filtres(selected_year, selected_month, annees)
 
     # Q() par modèle/champ
     # - Commande: date_commande (sur Commande)
-    # - LigneCommande: commande__date_commande (sur LC)
     # - Charge: date
-    # - Versement: date  (⚠️ adaptez si votre champ diffère)
-    commande_date_q = Q()
-    commande_date_q_lc = Q()
-    chg_date_q = Q()
-    vers_date_q = Q()
-
-    if start_year and end_year:
-        commande_date_q &= Q(date_commande__gte=start_year, date_commande__lt=end_year)
-        commande_date_q_lc &= Q(commande__date_commande__gte=start_year, commande__date_commande__lt=end_year)
-        chg_date_q &= Q(date__gte=start_year, date__lt=end_year)
-        vers_date_q &= Q(date__gte=start_year, date__lt=end_year)
-
-    if selected_month:
-        commande_date_q &= Q(date_commande__month=selected_month)
-        commande_date_q_lc &= Q(commande__date_commande__month=selected_month)
-        chg_date_q &= Q(date__month=selected_month)
-        vers_date_q &= Q(date__month=selected_month)
+    # - Versement: date
+    commande_date_q = q_periodes("date_commande", periodes)
+    chg_date_q = q_periodes("date", periodes)
+    vers_date_q = q_periodes("date", periodes)
 
     # ------------------------------------------------------------------ #
     # 2)  RÉPARTITION DES CHARGES NON AFFECTÉES PAR MOIS & PAR PAGE (FILTRABLE)
+    #     Parts pré-calculées par mois (comptabilite.repartition) selon la clé choisie
     # ------------------------------------------------------------------ #
-    charges_qs = Charge.actifs.filter(
-        page__isnull=True, libelle__compte_numero__startswith="6"
-    )
-    if chg_date_q:
-        charges_qs = charges_qs.filter(chg_date_q)
-
-    charges_par_mois = dict(
-        charges_qs
-        .annotate(mois=TruncMonth("date"))
-        .values("mois")
-        .annotate(total=Sum("montant"))
-        .values_list("mois", "total")
-    )
-
-    quantites_par_mois_page = defaultdict(lambda: defaultdict(int))
-    lignes = (
-        LigneCommande.actifs.filter(
-            commande__statut_vente="Payée", commande__vente__isnull=False
-        )
-        .filter(commande_date_q_lc)  # ✅ applique la période sur commande__date_commande
-        .annotate(
-            mois=TruncMonth("commande__date_commande"),
-            page_id=F("commande__page_id"),
-        )
-        .values("mois", "page_id")
-        .annotate(qte=Sum("quantite"))
-    )
-    for row in lignes:
-        quantites_par_mois_page[row["mois"]][row["page_id"]] += row["qte"]
-
-    part_charges_pages = defaultdict(int)     # cumul pour chaque page
-    repartition_charges = []                  # détail par mois pour le template
-    repartition_totaux = defaultdict(int)     # total cumulé par page
-
-    for mois, montant_charge_mois in charges_par_mois.items():
-        parts = {}
-        quantites_page = quantites_par_mois_page.get(mois, {})
-        total_qte_mois = sum(quantites_page.values()) or 1  # évite /0
-
-        for page_id, qte in quantites_page.items():
-            part = (qte / total_qte_mois) * montant_charge_mois
-            part_arrondi = int(round(part, -2))  # arrondi à la centaine
-            parts[page_id] = part_arrondi
-            part_charges_pages[page_id] += part_arrondi
-            repartition_totaux[page_id] += part_arrondi
-
-        repartition_charges.append(
-            {"mois": mois, "parts": parts, "total": montant_charge_mois}
-        )
-
-    repartition_total = sum(charges_par_mois.values())
+    methode_repartition = methode_valide(request.GET.get("cle"))
+    repartition_charges, repartition_totaux, repartition_total = repartition(periodes, methode_repartition)
+    part_charges_pages = repartition_totaux
 
     # ------------------------------------------------------------------ #
     # 3)  RÉCAPITULATIF PAR PAGE (FILTRABLE)
     # ------------------------------------------------------------------ #
     recap_pages = []
-    pages = Pages.objects.filter(type="VENTE")
+    pages = referentiel.pages("VENTE", actifs=False)
 
     total_chiffre_affaire = total_cout_achats = 0
     total_charges_pages = total_versements_pages = 0
@@ -287,8 +211,10 @@ def etat_caisses(request):
         "pages": pages,
         "today": now().date(),
         "repartition_charges": repartition_charges,
-        "repartition_totaux": dict(repartition_totaux),
+        "repartition_totaux": repartition_totaux,
         "repartition_total": repartition_total,
+        "methode_repartition": methode_repartition,
+        "methodes_repartition": RepartitionCharge.METHODES,
         "totaux": {
             "solde_initial": total_solde_initial,
             "entrees": total_entrees,
@@ -312,8 +238,8 @@ def etat_caisses(request):
 @login_required
 @admin_required
 def versements_list(request):
-    caisses = Caisse.objects.all()
-    pages = Pages.objects.filter(type="VENTE")
+    caisses = referentiel.caisses(actifs=False)
+    pages = referentiel.pages("VENTE", actifs=False)
 
     # Récupération des paramètres de filtre
     date_debut = request.GET.get("date_debut")
@@ -323,10 +249,7 @@ def versements_list(request):
 
     versements = Versement.objects.all().order_by("-date")
 
-    if date_debut:
-        versements = versements.filter(date__gte=date_debut)
-    if date_fin:
-        versements = versements.filter(date__lte=date_fin)
+    versements = Periode.entre(lire_date(date_debut), lire_date(date_fin)).filtrer(versements, "date")
     if caisse_id:
         versements = versements.filter(caisse_id=caisse_id)
     if page_id:
@@ -396,17 +319,14 @@ def supprimer_versement(request, pk):
 
 # Mouvements de caisse
 def mouvements_list(request):
-    caisses = Caisse.objects.all()
+    caisses = referentiel.caisses(actifs=False)
     mouvements = MouvementCaisse.objects.all().order_by('-date')
 
     date_debut = request.GET.get("date_debut")
     date_fin = request.GET.get("date_fin")
     caisse = request.GET.get("caisse")
 
-    if date_debut:
-        mouvements = mouvements.filter(date__date__gte=date_debut)
-    if date_fin:
-        mouvements = mouvements.filter(date__date__lte=date_fin)
+    mouvements = Periode.entre(lire_date(date_debut), lire_date(date_fin)).filtrer(mouvements, "date")
     if caisse:
         mouvements = mouvements.filter(Q(caisse_debit_id=caisse) | Q(caisse_credit_id=caisse))
 
@@ -500,4 +420,134 @@ def supprimer_mouvement(request, mouvement_id):
     # mouvement.delete()
     mouvement.soft_delete(user=request.user)
     messages.success(request, "Mouvement supprimé.")
-    return redirect("mouvements_list")
\ No newline at end of file
+    return redirect("mouvements_list")
+
+@login_required
+@admin_required
+def soldes_journaliers(request):
+    """Courbe de trésorerie : soldes de fin de journée d'une caisse sur une période."""
+    caisses = referentiel.caisses(actifs=False)
+    today = now().date()
+
+    caisse_id = lire_pk(request.GET.get("caisse"))
+    caisse = referentiel.caisse(caisse_id) if caisse_id else next(iter(caisses), None)
+    date_debut = lire_date(request.GET.get("date_debut"), today.replace(day=1))
+    date_fin = lire_date(request.GET.get("date_fin"), today)
+    date_solde = lire_date(request.GET.get("au"), today)
+    # Solde de toutes les caisses à une date : une lecture indexée par caisse
+    soldes = soldes_au(date_solde, caisses)
+
+    context = {
+        "caisses": caisses,
+        "caisse": caisse,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+        "date_solde": date_solde,
+        "soldes_au": [(c, soldes[c.pk]) for c in caisses],
+        "is_admin": is_admin(request.user),
+    }
+    if caisse:
+        context.update({
+            "ouverture": solde_au(caisse, date_debut - timedelta(days=1)),
+            "jours": Periode.entre(date_debut, date_fin).filtrer(
+                CaisseSoldeJournalier.objects.filter(caisse=caisse), "date"
+            ),
+        })
+    return render(request, "caisses/soldes_journaliers.html", context)
+
+
+def _rapprochement_url(caisse_id, date_debut, date_fin):
+    return (
+        f"{reverse('rapprochement')}?caisse={caisse_id}"
+        f"&date_debut={date_debut or ''}&date_fin={date_fin or ''}"
+    )
+
+
+@login_required
+@admin_required
+def rapprochement(request):
+    caisses = referentiel.caisses(actifs=False)
+    today = now().date()
+
+    caisse_id = lire_pk(request.GET.get("caisse"))
+    caisse = referentiel.caisse(caisse_id) if caisse_id else next(iter(caisses), None)
+    date_debut = lire_date(request.GET.get("date_debut"), today.replace(day=1))
+    date_fin = lire_date(request.GET.get("date_fin"), today)
+    periode = Periode.entre(date_debut, date_fin)
+
+    context = {
+        "caisses": caisses,
+        "caisse": caisse,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+        "is_admin": is_admin(request.user),
+    }
+    if caisse:
+        lignes = periode.filtrer(LigneReleve.objects.filter(caisse=caisse), "date")
+        context.update({
+            "lignes": lignes,
+            "compteurs": dict(lignes.order_by().values_list("statut").annotate(n=Count("id"))),
+            "releves": Releve.objects.filter(caisse=caisse).order_by("-created_at")[:10],
+            **ecarts(caisse.id, periode.debut, periode.fin),
+        })
+    return render(request, "caisses/rapprochement.html", context)
+
+
+@login_required
+@admin_required
+@require_POST
+def importer_releve_view(request):
+    caisse = get_object_or_404(Caisse, pk=request.POST.get("caisse"))
+    fichier = request.FILES.get("fichier")
+    if not fichier:
+        messages.warning(request, "Veuillez choisir un fichier CSV ou XLSX.")
+        return redirect(f"{reverse('rapprochement')}?caisse={caisse.id}")
+    try:
+        releve, importees, doublons = importer_releve(caisse, fichier, user=request.user)
+    except Exception as e:  # fichier illisible, colonnes manquantes...
+        messages.error(request, f"Import impossible : {e}")
+        return redirect(f"{reverse('rapprochement')}?caisse={caisse.id}")
+
+    periode = Periode.entre(releve.date_debut, releve.date_fin)
+    lignes = rapprocher([caisse.id], periode.debut, periode.fin)
+    rapprochees = sum(1 for l in lignes if l.statut == "rapprochee")
+    messages.success(
+        request,
+        f"{importees} ligne(s) importée(s) ({doublons} doublon(s) ignoré(s)), "
+        f"{rapprochees} rapprochée(s) automatiquement."
+    )
+    return redirect(_rapprochement_url(caisse.id, releve.date_debut, releve.date_fin))
+
+
+@login_required
+@admin_required
+@require_POST
+def lancer_rapprochement(request):
+    caisse = get_object_or_404(Caisse, pk=request.POST.get("caisse"))
+    date_debut = lire_date(request.POST.get("date_debut"))
+    date_fin = lire_date(request.POST.get("date_fin"))
+    if not date_debut or not date_fin:
+        messages.error(request, "Période invalide (dates attendues au format AAAA-MM-JJ).")
+        return redirect(f"{reverse('rapprochement')}?caisse={caisse.id}")
+    periode = Periode.entre(date_debut, date_fin)
+    lignes = rapprocher([caisse.id], periode.debut, periode.fin)
+    rapprochees = sum(1 for l in lignes if l.statut == "rapprochee")
+    suggerees = sum(1 for l in lignes if l.statut == "suggeree")
+    messages.success(request, f"Rapprochement : {rapprochees} rapprochée(s), {suggerees} suggestion(s).")
+    return redirect(_rapprochement_url(caisse.id, date_debut, date_fin))
+
+
+@login_required
+@admin_required
+@require_POST
+def statut_ligne_releve(request, pk, action):
+    ligne = get_object_or_404(LigneReleve, pk=pk)
+    if action == "valider" and ligne.source_type:
+        ligne.statut = "rapprochee"
+    else:
+        ligne.statut = "non_rapprochee"
+        ligne.source_type, ligne.source_id = "", None
+    ligne.save(update_fields=["statut", "source_type", "source_id"])
+    return redirect(_rapprochement_url(
+        ligne.caisse_id, request.POST.get("date_debut"), request.POST.get("date_fin")
+    ))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChargesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'charges'
+
+    def ready(self):
+        import charges.signals
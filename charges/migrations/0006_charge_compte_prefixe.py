@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:01
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Substr, Trim
+
+from common.backfill import backfill_update
+
+
+def remplir_prefixes(apps, schema_editor):
+    Charge = apps.get_model('charges', 'Charge')
+    PlanDesComptes = apps.get_model('common', 'PlanDesComptes')
+    prefixe = (
+        PlanDesComptes.objects.filter(pk=OuterRef('libelle_id'))
+        .annotate(p=Substr(Trim('compte_numero'), 1, 2))
+        .values('p')[:1]
+    )
+    backfill_update(Charge.objects.all(), {'compte_prefixe': Subquery(prefixe)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('charges', '0005_alter_charge_created_by_alter_charge_deleted_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='charge',
+            name='compte_prefixe',
+            field=models.CharField(blank=True, default='', editable=False, max_length=2),
+        ),
+        migrations.AddIndex(
+            model_name='charge',
+            index=models.Index(fields=['compte_prefixe', 'date'], name='charge_prefixe_date_idx'),
+        ),
+        migrations.RunPython(remplir_prefixes, migrations.RunPython.noop),
+    ]
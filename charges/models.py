@@ -2,6 +2,10 @@ from django.db import models
 from common.models import PlanDesComptes, Caisse, Pages
 from common.mixins import AuditMixin
 
+def prefixe_compte(compte_numero):
+    """Deux premiers chiffres du compte (classe + sous-classe), ex: '6061' -> '60'."""
+    return (compte_numero or "").strip()[:2]
+
 class Charge(AuditMixin):
     date = models.DateField()
     libelle = models.ForeignKey(PlanDesComptes, on_delete=models.PROTECT)
@@ -11,6 +15,21 @@ class Charge(AuditMixin):
     remarque = models.CharField(max_length=255, blank=True)
     paiement = models.ForeignKey(Caisse, on_delete=models.PROTECT)
     page = models.ForeignKey(Pages, null=True, blank=True, on_delete=models.PROTECT)
+    # Copie de libelle.compte_numero[:2] : les rubriques se calculent en un GROUP BY sans jointure
+    compte_prefixe = models.CharField(max_length=2, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["compte_prefixe", "date"], name="charge_prefixe_date_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.libelle_id:
+            self.compte_prefixe = prefixe_compte(self.libelle.compte_numero)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "libelle" in update_fields:
+            kwargs["update_fields"] = set(update_fields) | {"compte_prefixe"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.date} - {self.libelle.libelle}"
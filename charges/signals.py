@@ -0,0 +1,12 @@
+# charges/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from common.models import PlanDesComptes
+from .models import Charge, prefixe_compte
+
+
+@receiver(post_save, sender=PlanDesComptes)
+def maj_prefixe_charges(sender, instance, **kwargs):
+    # Renumérotation d'un compte : on recopie le nouveau préfixe sur ses charges
+    prefixe = prefixe_compte(instance.compte_numero)
+    Charge.objects.filter(libelle=instance).exclude(compte_prefixe=prefixe).update(compte_prefixe=prefixe)
@@ -0,0 +1,22 @@
+# charges/utils.py
+from django.db.models import Sum
+from .models import Charge
+
+
+def totaux_par_prefixe(queryset=None, date_debut=None, date_fin=None):
+    """
+    Un seul GROUP BY compte_prefixe -> {'60': 120000, '62': 45000, ...}.
+    Remplace les N agrégats `libelle__compte_numero__startswith=...`.
+    """
+    qs = Charge.actifs.all() if queryset is None else queryset
+    if date_debut:
+        qs = qs.filter(date__gte=date_debut)
+    if date_fin:
+        qs = qs.filter(date__lte=date_fin)
+    rows = qs.order_by().values_list("compte_prefixe").annotate(total=Sum("montant"))
+    return {prefixe: total or 0 for prefixe, total in rows}
+
+
+def somme_comptes(totaux, *prefixes):
+    """Somme des préfixes commençant par l'un des `prefixes` ('6', '61', ...)."""
+    return sum(total for prefixe, total in totaux.items() if prefixe.startswith(prefixes))
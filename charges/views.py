@@ -7,10 +7,11 @@ from django.core.paginator import Paginator
 from django.http import QueryDict
 from datetime import date
 from django.db.models import Sum
+from common import referentiel
 from common.decorators import admin_required
 from common.utils import is_admin, resolve_display_mode
 from .models import Charge
-from common.models import PlanDesComptes, Caisse, Pages
+from common.models import Pages
 
 def _build_charges_context(request):
     charges_qs = Charge.objects.select_related("libelle", "paiement", "page") \
@@ -59,9 +60,9 @@ def _build_charges_context(request):
     return {
         "charges": page_obj.object_list,
         "total_charges": total_charges,
-        "plans": PlanDesComptes.objects.all().order_by('compte_numero'),
-        "caisses": Caisse.objects.all(),
-        "pages": Pages.objects.all(),
+        "plans": referentiel.comptes(),
+        "caisses": referentiel.caisses(actifs=False),
+        "pages": referentiel.pages(actifs=False),
         "today": date.today().isoformat(),
         "is_admin": is_admin(request.user),
         "filters": {
@@ -137,9 +138,9 @@ def modifier_charge(request, pk):
 
     context = {
         "charge": charge,
-        "plans": PlanDesComptes.objects.all().order_by('compte_numero'),
-        "caisses": Caisse.objects.all(),
-        "pages": Pages.objects.all(),  
+        "plans": referentiel.comptes(),
+        "caisses": referentiel.caisses(actifs=False),
+        "pages": referentiel.pages(actifs=False),
     }
     return render(request, "charges/charges_list.html", context)
 
@@ -9,6 +9,7 @@ from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 from django.db import IntegrityError, transaction
 from django.http import QueryDict
+from common import referentiel
 from common.decorators import admin_required
 from common.utils import is_admin, resolve_display_mode
 from livraison.models import Livraison
@@ -48,7 +49,7 @@ def _build_clients_context(request):
 
     return {
         "clients": page_obj.object_list,
-        "lieux": Livraison.objects.all().order_by("lieu"),
+        "lieux": referentiel.lieux(),
         "nom_query": nom,               
         "lieu_query": lieu,
         "contact_query": contact,
@@ -0,0 +1,112 @@
+# common/backfill.py
+"""
+Rattrapages de données par lots (backfill).
+
+Au lieu de charger chaque ligne et d'appeler `save()` une à une, on découpe
+le queryset en lots de clés primaires (pagination par curseur `pk > dernier`)
+et on applique un `UPDATE ... SET champ = (SELECT ...)` par lot.
+
+Le curseur est affiché à chaque lot : une exécution interrompue reprend avec
+`--start-after <id>`.
+"""
+from dataclasses import dataclass
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class BackfillResult:
+    total: int = 0        # lignes candidates au départ
+    updated: int = 0      # lignes effectivement modifiées
+    batches: int = 0
+    last_pk: int = 0      # curseur de reprise
+
+
+def iter_pk_batches(queryset, batch_size=DEFAULT_BATCH_SIZE, start_after=0):
+    """Produit des listes de pk croissantes, sans OFFSET (stable et indexé)."""
+    last = start_after or 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def backfill_update(queryset, updates, batch_size=DEFAULT_BATCH_SIZE, start_after=0,
+                    dry_run=False, progress=None):
+    """
+    Applique `queryset.filter(pk__in=lot).update(**updates)` lot par lot.
+    `updates` peut contenir des expressions (F, Subquery, Case...) : tout est
+    calculé côté SQL.
+    """
+    result = BackfillResult(total=queryset.filter(pk__gt=start_after or 0).count(),
+                            last_pk=start_after or 0)
+    if dry_run or not result.total:
+        return result
+
+    model = queryset.model
+    for pks in iter_pk_batches(queryset, batch_size, start_after):
+        with transaction.atomic():
+            result.updated += model._base_manager.filter(pk__in=pks).update(**updates)
+        result.batches += 1
+        result.last_pk = pks[-1]
+        if progress:
+            progress(result)
+    return result
+
+
+class BackfillCommand(BaseCommand):
+    """
+    Base des commandes de rattrapage : options communes (--batch-size,
+    --start-after, --dry-run) et affichage de la progression.
+
+    Une sous-classe définit `get_queryset()` et `get_updates()` -> dict
+    champ: expression (UPDATE ensembliste).
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--start-after", type=int, default=0,
+                            help="Reprendre après cet id (curseur affiché à chaque lot)")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Compte seulement les lignes concernées, sans rien écrire")
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_updates(self):
+        raise NotImplementedError
+
+    def _progress(self, result):
+        self.stdout.write(
+            f"  lot {result.batches} : {result.updated}/{result.total} "
+            f"(curseur id={result.last_pk})"
+        )
+
+    def handle(self, *args, **options):
+        result = backfill_update(
+            self.get_queryset(), self.get_updates(),
+            batch_size=options["batch_size"],
+            start_after=options["start_after"],
+            dry_run=options["dry_run"],
+            progress=self._progress,
+        )
+
+        if not result.total:
+            self.stdout.write(self.style.SUCCESS("Aucune ligne à mettre à jour."))
+        elif options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"[dry-run] {result.total} ligne(s) à mettre à jour."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{result.updated} lignes mises à jour sur {result.total} "
+                f"({result.batches} lot(s), dernier id={result.last_pk})."
+            ))
+        return None
@@ -0,0 +1,134 @@
+# common/backup.py
+"""
+Sauvegarde / restauration en flux (JSONL gzip, un fichier par modèle).
+
+Contrairement à `dumpdata` qui produit un seul gros JSON à charger en
+mémoire, chaque modèle est écrit ligne par ligne via `.iterator()` et relu
+par paquets : la mémoire reste constante quelle que soit la taille de la base.
+"""
+import gzip
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_CHUNK_SIZE = 2000
+
+# Tables recréées automatiquement par Django (migrate) ou sans valeur métier.
+DEFAULT_EXCLUDES = (
+    "contenttypes",
+    "auth.permission",
+    "admin.logentry",
+    "sessions",
+)
+
+
+def model_label(model):
+    return model._meta.label_lower  # ex: 'ventes.commande'
+
+
+def model_filename(model):
+    return f"{model_label(model)}.jsonl.gz"
+
+
+def _is_excluded(model, excludes):
+    label = model_label(model)
+    return label in excludes or model._meta.app_label in excludes
+
+
+def ordered_models(excludes=DEFAULT_EXCLUDES):
+    """
+    Modèles concrets triés pour que les FK pointent toujours vers un modèle
+    déjà restauré (même tri que `dumpdata`).
+    """
+    app_list = {}
+    for model in apps.get_models():
+        meta = model._meta
+        if meta.proxy or not meta.managed or _is_excluded(model, excludes):
+            continue
+        app_list.setdefault(meta.app_config, []).append(model)
+    return serializers.sort_dependencies(app_list.items(), allow_cycles=True)
+
+
+def has_updated_at(model):
+    return any(f.name == "updated_at" for f in model._meta.concrete_fields)
+
+
+def write_model(model, directory: Path, since=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Écrit `<app>.<model>.jsonl.gz` : une ligne JSON par objet (format 'python'
+    de Django : model / pk / fields). Retourne le nombre de lignes écrites.
+    """
+    qs = model._base_manager.order_by("pk")
+    if since is not None and has_updated_at(model):
+        qs = qs.filter(updated_at__gte=since)
+
+    count = 0
+    with gzip.open(directory / model_filename(model), "wt", encoding="utf-8") as fh:
+        # sérialisation par paquets : un seul appel serializer par chunk
+        chunk = []
+        for obj in qs.iterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                count += _write_chunk(fh, chunk)
+                chunk = []
+        if chunk:
+            count += _write_chunk(fh, chunk)
+    return count
+
+
+def _write_chunk(fh, objects):
+    rows = serializers.serialize("python", objects)
+    for row in rows:
+        fh.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+        fh.write("\n")
+    return len(rows)
+
+
+def read_chunks(path: Path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Relit un fichier JSONL gzip par listes de `chunk_size` dictionnaires."""
+    chunk = []
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_manifest(directory: Path, manifest: dict):
+    with open(directory / MANIFEST_NAME, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2)
+
+
+def read_manifest(directory: Path) -> dict:
+    with open(directory / MANIFEST_NAME, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+@contextmanager
+def preserved_timestamps(model):
+    """
+    `bulk_create` appelle `pre_save()` : sans ce garde-fou, auto_now /
+    auto_now_add écraseraient created_at / updated_at sauvegardés.
+    """
+    toggled = []
+    for field in model._meta.concrete_fields:
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+            toggled.append((field, field.auto_now, field.auto_now_add))
+            field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in toggled:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
@@ -1,10 +1,10 @@
 from django.shortcuts import redirect
 from django.core.exceptions import PermissionDenied
-from common.utils import is_admin
+from common.permissions import ADMIN, a_droit
 
 def admin_required(view_func):
     def wrapper(request, *args, **kwargs):
-        if not is_admin(request.user):
+        if not a_droit(request.user, ADMIN):
             if not request.user.is_authenticated:
                 return redirect('login')  # ou une autre vue de connexion
             raise PermissionDenied
@@ -0,0 +1,92 @@
+# common/management/commands/backup_stream.py
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from common.backup import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_EXCLUDES,
+    model_filename, model_label, ordered_models, has_updated_at,
+    write_model, write_manifest,
+)
+
+
+def _parse_since(value):
+    """Accepte 'AAAA-MM-JJ' ou un datetime ISO ; retourne un datetime aware."""
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            return None
+        dt = timezone.datetime(d.year, d.month, d.day)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+class Command(BaseCommand):
+    help = (
+        "Sauvegarde la base en JSONL gzip (un fichier par modèle) en lecture par paquets. "
+        "Avec --since, seules les lignes dont updated_at a changé sont exportées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "destination", nargs="?",
+            help="Dossier de sortie (défaut : backups/<horodatage>)",
+        )
+        parser.add_argument(
+            "--since",
+            help="Sauvegarde incrémentale : lignes modifiées depuis cette date (AAAA-MM-JJ ou ISO)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--exclude", action="append", default=[],
+            help="app ou app.modele à ignorer (répétable), en plus des exclusions par défaut",
+        )
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+
+        since = None
+        if options["since"]:
+            since = _parse_since(options["since"])
+            if since is None:
+                raise CommandError(f"Date --since invalide : {options['since']}")
+
+        destination = options["destination"] or (
+            Path(settings.BASE_DIR) / "backups" / started_at.strftime("%Y%m%d-%H%M%S")
+        )
+        directory = Path(destination)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        excludes = tuple(DEFAULT_EXCLUDES) + tuple(e.lower() for e in options["exclude"])
+        models = ordered_models(excludes)
+
+        manifest = {
+            "generated_at": started_at,
+            "since": since,
+            "chunk_size": options["chunk_size"],
+            "models": [],
+        }
+        total = 0
+        for model in models:
+            count = write_model(model, directory, since=since, chunk_size=options["chunk_size"])
+            total += count
+            manifest["models"].append({
+                "model": model_label(model),
+                "file": model_filename(model),
+                "count": count,
+                # sans updated_at, la table est toujours exportée en entier
+                "incremental": bool(since and has_updated_at(model)),
+            })
+            self.stdout.write(f"  {model_label(model)} : {count}")
+
+        write_manifest(directory, manifest)
+
+        mode = f"incrémentale depuis {since:%Y-%m-%d %H:%M}" if since else "complète"
+        self.stdout.write(self.style.SUCCESS(
+            f"Sauvegarde {mode} terminée : {total} lignes, {len(models)} modèles → {directory}"
+        ))
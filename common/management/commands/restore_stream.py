@@ -0,0 +1,117 @@
+# common/management/commands/restore_stream.py
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from common.backup import (
+    DEFAULT_CHUNK_SIZE, MANIFEST_NAME,
+    preserved_timestamps, read_chunks, read_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Restaure une sauvegarde backup_stream : bulk_create par paquets, dans l'ordre des "
+        "dépendances FK, puis remise à niveau des séquences. Une sauvegarde incrémentale "
+        "(--since) est appliquée en upsert."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Dossier produit par backup_stream")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--upsert", action="store_true",
+            help="Met à jour les lignes existantes (automatique pour une sauvegarde incrémentale)",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        directory = Path(options["source"])
+        if not (directory / MANIFEST_NAME).exists():
+            raise CommandError(f"{MANIFEST_NAME} introuvable dans {directory}")
+
+        manifest = read_manifest(directory)
+        using = options["database"]
+        connection = connections[using]
+        upsert = options["upsert"] or bool(manifest.get("since"))
+        chunk_size = options["chunk_size"]
+
+        restored_models = []
+        total = 0
+        # Même stratégie que loaddata : contraintes vérifiées en fin de transaction
+        with transaction.atomic(using=using):
+            with connection.constraint_checks_disabled():
+                for entry in manifest["models"]:
+                    try:
+                        model = apps.get_model(entry["model"])
+                    except LookupError:
+                        self.stderr.write(f"  Modèle inconnu ignoré : {entry['model']}")
+                        continue
+                    path = directory / entry["file"]
+                    if not path.exists():
+                        continue
+
+                    count = self._restore_model(model, path, using, upsert, chunk_size)
+                    if count:
+                        restored_models.append(model)
+                    total += count
+                    self.stdout.write(f"  {entry['model']} : {count}")
+
+            table_names = [m._meta.db_table for m in restored_models]
+            connection.check_constraints(table_names=table_names)
+
+            # Les pk ont été insérées explicitement : recaler les auto-incréments
+            sequence_sql = connection.ops.sequence_reset_sql(no_style(), restored_models)
+            if sequence_sql:
+                with connection.cursor() as cursor:
+                    for sql in sequence_sql:
+                        cursor.execute(sql)
+
+        mode = "upsert" if upsert else "insertion"
+        self.stdout.write(self.style.SUCCESS(
+            f"Restauration ({mode}) terminée : {total} lignes, {len(restored_models)} modèles."
+        ))
+
+    def _restore_model(self, model, path, using, upsert, chunk_size):
+        connection = connections[using]
+        meta = model._meta
+        bulk_kwargs = {"batch_size": chunk_size}
+        if upsert:
+            bulk_kwargs["update_conflicts"] = True
+            bulk_kwargs["update_fields"] = [
+                f.name for f in meta.concrete_fields if not f.primary_key
+            ]
+            # MySQL ne supporte pas la cible explicite (ON DUPLICATE KEY UPDATE)
+            if connection.features.supports_update_conflicts_with_target:
+                bulk_kwargs["unique_fields"] = [meta.pk.name]
+
+        count = 0
+        with preserved_timestamps(model):
+            for rows in read_chunks(path, chunk_size):
+                deserialized = list(serializers.deserialize(
+                    "python", rows, using=using, ignorenonexistent=True,
+                ))
+                objs = [d.object for d in deserialized]
+                model._base_manager.using(using).bulk_create(objs, **bulk_kwargs)
+                self._restore_m2m(model, deserialized, using)
+                count += len(objs)
+        return count
+
+    def _restore_m2m(self, model, deserialized, using):
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue  # table intermédiaire explicite : sauvegardée comme un modèle
+            source = field.m2m_field_name() + "_id"
+            target = field.m2m_reverse_field_name() + "_id"
+            links = [
+                through(**{source: d.object.pk, target: target_pk})
+                for d in deserialized
+                for target_pk in (d.m2m_data or {}).get(field.name, [])
+            ]
+            if links:
+                through._base_manager.using(using).bulk_create(links, ignore_conflicts=True)
@@ -1,5 +1,9 @@
 import threading
 
+from django.utils.functional import SimpleLazyObject
+
+from common.permissions import permissions
+
 _user = threading.local()
 
 def get_current_user():
@@ -17,3 +21,17 @@ class CurrentUserMiddleware:
         finally:
             _user.value = None  # Nettoyage important !
         return response
+
+
+class PermissionsMiddleware:
+    """
+    Expose les droits de l'utilisateur en `request.permissions` (calculés au
+    premier accès, une fois par requête, sans requête SQL : voir
+    common.permissions). À placer après AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.permissions = SimpleLazyObject(lambda: permissions(request.user))
+        return self.get_response(request)
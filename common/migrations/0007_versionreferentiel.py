@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:51
+
+from django.db import migrations, models
+
+# Tables en cache à la création (common.referentiel.TABLES peut s'étendre :
+# invalider() crée la ligne d'une nouvelle table à sa première écriture)
+TABLES = [
+    'common.Pages',
+    'common.Caisse',
+    'common.PlanDesComptes',
+    'livraison.Livreur',
+    'livraison.Livraison',
+    'articles.Categorie',
+    'articles.Taille',
+    'articles.Couleur',
+]
+
+
+def creer_versions(apps, schema_editor):
+    VersionReferentiel = apps.get_model('common', 'VersionReferentiel')
+    VersionReferentiel.objects.bulk_create([VersionReferentiel(table=label) for label in TABLES])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0006_pages_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionReferentiel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(creer_versions, migrations.RunPython.noop),
+    ]
@@ -37,3 +37,15 @@ class PlanDesComptes(AuditMixin):
 
     def __str__(self):
         return f"{self.compte_numero} - {self.libelle}"
+
+class VersionReferentiel(models.Model):
+    """
+    Version partagée d'une table de référence (common.referentiel) :
+    incrémentée à chaque écriture, relue par chaque worker pour savoir si
+    sa copie en mémoire est encore bonne.
+    """
+    table = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
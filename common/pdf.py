@@ -1,7 +1,12 @@
 # common/pdf.py
+import mimetypes
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
 from django.template.loader import render_to_string
 from django.http import HttpResponse
-from weasyprint import HTML, CSS
+from weasyprint import HTML, CSS, default_url_fetcher
 
 def render_html_to_pdf(template_name: str, context: dict, request, filename: str = "document.pdf"):
     """
@@ -16,6 +21,24 @@ def render_html_to_pdf(template_name: str, context: dict, request, filename: str
     response["Content-Disposition"] = f'inline; filename="{filename}"'
     return response
 
+def _fetcher_statiques(url):
+    """Sert /static/... depuis le disque : pas de serveur web à interroger hors requête."""
+    chemin = unquote(urlparse(url).path)
+    if chemin.startswith(settings.STATIC_URL):
+        fichier = finders.find(chemin[len(settings.STATIC_URL):])
+        if fichier:
+            with open(fichier, "rb") as f:
+                return {"string": f.read(), "mime_type": mimetypes.guess_type(fichier)[0]}
+    return default_url_fetcher(url)
+
+def pdf_hors_requete(template_name: str, context: dict) -> bytes:
+    """
+    Rend un template HTML -> PDF (bytes) sans requête (commandes de gestion,
+    traitements en différé) : les {% static %} sont lus sur le disque.
+    """
+    html_str = render_to_string(template_name, context)
+    return HTML(string=html_str, base_url="file:///", url_fetcher=_fetcher_statiques).write_pdf()
+
 def render_single_page_pdf(
     template_name,
     context,
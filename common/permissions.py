@@ -0,0 +1,58 @@
+# common/permissions.py
+"""
+Droits de l'utilisateur, résolus une fois par requête.
+
+Le rôle est lu dans le cache du référentiel (common.referentiel, invalidé
+par version à chaque modification d'un rôle) : déterminer les droits ne
+coûte aucune requête une fois l'utilisateur chargé par l'authentification.
+L'ensemble calculé est mémorisé sur l'objet utilisateur, que Django
+partage entre la vue, les décorateurs et les context processors ;
+PermissionsMiddleware l'expose aussi en `request.permissions`.
+"""
+from common import referentiel
+
+# Droits
+ADMIN = "admin"                  # rôle « Admin » : vues réservées (admin_required, is_admin)
+GESTION = "gestion"              # superuser, staff ou rôle d'administration : menus de gestion
+CONFIGURATION = "configuration"  # superuser ou rôle d'administration : rôles et utilisateurs
+
+ROLES_ADMINISTRATION = {"admin", "administrateur", "superadmin"}
+
+_CACHE = "_permissions_cache"
+
+
+def role_de(user):
+    """Rôle de `user` depuis le référentiel (None si aucun)."""
+    role_id = getattr(user, "role_id", None)
+    return referentiel.role(role_id) if role_id else None
+
+
+def _calculer(user):
+    if not getattr(user, "is_authenticated", False):
+        return frozenset()
+    libelle = getattr(role_de(user), "role", "") or ""
+    administration = libelle.strip().lower() in ROLES_ADMINISTRATION
+    droits = set()
+    if libelle == "Admin":
+        droits.add(ADMIN)
+    if user.is_superuser or user.is_staff or administration:
+        droits.add(GESTION)
+    if user.is_superuser or administration:
+        droits.add(CONFIGURATION)
+    return frozenset(droits)
+
+
+def permissions(user):
+    """Droits de `user` (frozenset), calculés une seule fois par objet utilisateur."""
+    if user is None:
+        return frozenset()
+    droits = getattr(user, _CACHE, None)
+    if droits is None:
+        droits = _calculer(user)
+        if getattr(user, "is_authenticated", False):
+            setattr(user, _CACHE, droits)
+    return droits
+
+
+def a_droit(user, droit):
+    return droit in permissions(user)
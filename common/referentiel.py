@@ -0,0 +1,165 @@
+# common/referentiel.py
+"""
+Cache des données de référence : pages, caisses, livreurs, lieux de
+livraison, plan des comptes, catégories / tailles / couleurs, rôles.
+
+Chaque table est chargée en entier une fois par processus et gardée en
+mémoire avec sa version (VersionReferentiel). Toute écriture (post_save /
+post_delete, common.signals) incrémente la version une fois sa transaction
+validée ; chaque worker relit les versions de toutes les tables en une
+requête au plus toutes les VERIFICATION secondes et recharge celles qui ont
+changé. Entre deux vérifications, les accesseurs ne coûtent aucune requête.
+
+Les objets renvoyés sont partagés entre requêtes : à lire, jamais à
+modifier ni à enregistrer (recharger l'objet avant une écriture).
+"""
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+if TYPE_CHECKING:
+    from articles.models import Categorie, Couleur, Taille
+    from common.models import Caisse, Pages, PlanDesComptes
+    from livraison.models import Livraison, Livreur
+    from users.models import Role
+
+VERIFICATION = getattr(settings, "REFERENTIEL_VERIFICATION_SECONDES", 5)
+
+# Tables en cache -> ordre des listes
+TABLES = {
+    "common.Pages": ("pk",),
+    "common.Caisse": ("pk",),
+    "common.PlanDesComptes": ("compte_numero", "pk"),
+    "livraison.Livreur": ("pk",),
+    "livraison.Livraison": ("lieu", "pk"),
+    "articles.Categorie": ("categorie", "pk"),
+    "articles.Taille": ("taille", "pk"),
+    "articles.Couleur": ("couleur", "pk"),
+    "users.Role": ("role", "pk"),
+}
+
+_cache = {}  # label -> (version, lignes, {pk: objet})
+_etat = {"versions": {}, "verifie_a": float("-inf")}
+
+
+def _versions():
+    """Versions partagées, relues au plus toutes les VERIFICATION secondes."""
+    maintenant = time.monotonic()
+    if maintenant - _etat["verifie_a"] >= VERIFICATION:
+        VersionReferentiel = apps.get_model("common", "VersionReferentiel")
+        _etat["versions"] = dict(VersionReferentiel.objects.values_list("table", "version"))
+        _etat["verifie_a"] = maintenant
+    return _etat["versions"]
+
+
+def _table(label):
+    # Version lue avant les lignes : une écriture entre les deux sera revue à la vérification suivante
+    version = _versions().get(label, 0)
+    entree = _cache.get(label)
+    if entree is None or entree[0] != version:
+        lignes = list(apps.get_model(label)._base_manager.order_by(*TABLES[label]))
+        entree = _cache[label] = (version, lignes, {o.pk: o for o in lignes})
+    return entree
+
+
+def _lignes(label, actifs=False):
+    lignes = _table(label)[1]
+    if actifs:
+        return [o for o in lignes if o.statut_publication != "supprimé"]
+    return list(lignes)
+
+
+def _par_pk(label, pk):
+    try:
+        return _table(label)[2].get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def invalider(label):
+    """
+    Nouvelle version de la table `label` (modèle "app.Modele"), pour tous
+    les workers, à la validation de la transaction en cours : un worker ne
+    recharge jamais des lignes qu'un rollback annulera.
+    """
+    def publier():
+        VersionReferentiel = apps.get_model("common", "VersionReferentiel")
+        if not VersionReferentiel.objects.filter(table=label).update(version=F("version") + 1):
+            VersionReferentiel.objects.get_or_create(table=label, defaults={"version": 1})
+        _cache.pop(label, None)
+        _etat["verifie_a"] = float("-inf")
+
+    transaction.on_commit(publier)
+
+
+def vider():
+    """Oublie tout le cache du processus (tests, commandes de reprise)."""
+    _cache.clear()
+    _etat["verifie_a"] = float("-inf")
+
+
+# ---------- Accesseurs ----------
+
+def pages(type: str | None = None, actifs: bool = True) -> list[Pages]:
+    """Pages (VENTE / SERVICE si `type`), hors supprimées si `actifs`."""
+    return [p for p in _lignes("common.Pages", actifs) if type is None or p.type == type]
+
+
+def page(pk) -> Pages | None:
+    return _par_pk("common.Pages", pk)
+
+
+def caisses(actifs: bool = True) -> list[Caisse]:
+    return _lignes("common.Caisse", actifs)
+
+
+def caisse(pk) -> Caisse | None:
+    return _par_pk("common.Caisse", pk)
+
+
+def comptes() -> list[PlanDesComptes]:
+    """Plan des comptes, par numéro de compte."""
+    return _lignes("common.PlanDesComptes")
+
+
+def compte(pk) -> PlanDesComptes | None:
+    return _par_pk("common.PlanDesComptes", pk)
+
+
+def livreurs(actifs: bool = False) -> list[Livreur]:
+    return _lignes("livraison.Livreur", actifs)
+
+
+def livreur(pk) -> Livreur | None:
+    return _par_pk("livraison.Livreur", pk)
+
+
+def lieux(actifs: bool = False) -> list[Livraison]:
+    """Lieux de livraison, par nom."""
+    return _lignes("livraison.Livraison", actifs)
+
+
+def lieu(pk) -> Livraison | None:
+    return _par_pk("livraison.Livraison", pk)
+
+
+def categories() -> list[Categorie]:
+    return _lignes("articles.Categorie")
+
+
+def tailles() -> list[Taille]:
+    return _lignes("articles.Taille")
+
+
+def couleurs() -> list[Couleur]:
+    return _lignes("articles.Couleur")
+
+
+def role(pk) -> Role | None:
+    return _par_pk("users.Role", pk)
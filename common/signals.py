@@ -1,8 +1,10 @@
 # common/signals.py
-from django.db.models.signals import pre_save
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from common.middleware import get_current_user
 from common.mixins import AuditMixin 
+from common.referentiel import TABLES, invalider
 
 @receiver(pre_save)
 def audit_fields_handler(sender, instance, **kwargs):
@@ -18,3 +20,13 @@ def audit_fields_handler(sender, instance, **kwargs):
     else:
         if hasattr(instance, 'updated_by'):
             instance.updated_by = user
+
+
+def invalider_referentiel(sender, **kwargs):
+    invalider(sender._meta.label)
+
+
+for label in TABLES:
+    modele = apps.get_model(label)
+    post_save.connect(invalider_referentiel, sender=modele, dispatch_uid=f"referentiel_save_{label}")
+    post_delete.connect(invalider_referentiel, sender=modele, dispatch_uid=f"referentiel_delete_{label}")
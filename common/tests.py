@@ -1,3 +1,36 @@
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from . import referentiel
+from .models import Caisse, VersionReferentiel
+
+
+def version(label):
+    return VersionReferentiel.objects.filter(table=label).values_list("version", flat=True).first()
+
+
+class ReferentielTests(TestCase):
+    def setUp(self):
+        referentiel.vider()
+
+    def test_ecriture_validee_visible_par_le_cache(self):
+        self.assertEqual(referentiel.caisses(), [])
+        avant = version("common.Caisse")
+        with self.captureOnCommitCallbacks(execute=True):
+            caisse = Caisse.objects.create(nom="Caisse", responsable="R")
+        self.assertEqual(version("common.Caisse"), avant + 1)
+        self.assertEqual(referentiel.caisses(), [caisse])
+        self.assertEqual(referentiel.caisse(caisse.pk), caisse)
+
+    def test_ecriture_annulee_ne_publie_rien(self):
+        avant = version("common.Caisse")
+        with self.captureOnCommitCallbacks(execute=True) as rappels:
+            try:
+                with transaction.atomic():
+                    Caisse.objects.create(nom="Caisse", responsable="R")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(rappels, [])
+        self.assertEqual(version("common.Caisse"), avant)
+        self.assertEqual(referentiel.caisses(), [])
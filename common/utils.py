@@ -1,7 +1,15 @@
 # zarastore/common/utils.py
+from datetime import date, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from common.permissions import ADMIN, a_droit
+
 
 def is_admin(user):
-    return user.is_authenticated and getattr(user.role, "role", "") == "Admin"
+    return a_droit(user, ADMIN)
 
 DISPLAY_CHOICES = ("table", "cards")
 
@@ -20,3 +28,157 @@ def resolve_display_mode(request, session_key="display_mode", default="cards"):
     else:
         display = request.session.get(session_key, default)
     return display
+
+def lire_date(valeur, defaut=None):
+    """
+    Date AAAA-MM-JJ d'un paramètre de requête ; `defaut` si elle est vide, mal
+    formée ou impossible (« 2024-02-31 » : parse_date lève ValueError).
+    """
+    try:
+        jour = parse_date(valeur or "")
+    except (TypeError, ValueError):
+        jour = None
+    return jour or defaut
+
+def lire_pk(valeur):
+    """Clé primaire reçue en texte ou en entier ; None sinon (isdecimal : « ² » passe isdigit mais pas int())."""
+    if isinstance(valeur, bool) or not isinstance(valeur, (str, int)):
+        return None
+    return int(valeur) if str(valeur).isdecimal() else None
+
+def filtrer_periode(queryset, champ, depuis=None, avant=None):
+    """Filtre demi-ouvert [depuis, avant) sur `champ` (bornes ignorées si None)."""
+    if depuis:
+        queryset = queryset.filter(**{f"{champ}__gte": depuis})
+    if avant:
+        queryset = queryset.filter(**{f"{champ}__lt": avant})
+    return queryset
+
+
+class Periode:
+    """
+    Intervalle de dates demi-ouvert [debut, fin) ; une borne à None n'est pas filtrée.
+
+    Toujours traduit en `champ >= debut AND champ < fin` (jamais __year / __month,
+    qui compilent en EXTRACT() et ignorent les index). Plusieurs périodes
+    s'assemblent par OR (ex. « mars de chaque année »).
+    """
+
+    def __init__(self, debut=None, fin=None):
+        self.debut = debut
+        self.fin = fin
+
+    def __repr__(self):
+        return f"Periode({self.debut!r}, {self.fin!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Periode) and (self.debut, self.fin) == (other.debut, other.fin)
+
+    def __bool__(self):
+        return bool(self.debut or self.fin)
+
+    # --- Constructeurs ---
+    @classmethod
+    def jour(cls, jour):
+        return cls(jour, jour + timedelta(days=1))
+
+    @classmethod
+    def semaine(cls, jour):
+        """Semaine du lundi au dimanche contenant `jour`."""
+        lundi = jour - timedelta(days=jour.weekday())
+        return cls(lundi, lundi + timedelta(days=7))
+
+    @classmethod
+    def mois(cls, annee, mois):
+        annee, mois = int(annee), int(mois)
+        fin = date(annee + 1, 1, 1) if mois == 12 else date(annee, mois + 1, 1)
+        return cls(date(annee, mois, 1), fin)
+
+    @classmethod
+    def lire_mois(cls, annee, mois, defaut=None):
+        """Periode.mois depuis des paramètres de requête ; `defaut` si invalides (?mois=13, ?annee=abc)."""
+        try:
+            return cls.mois(annee, mois)
+        except (TypeError, ValueError):
+            return defaut
+
+    @classmethod
+    def annee(cls, annee):
+        annee = int(annee)
+        return cls(date(annee, 1, 1), date(annee + 1, 1, 1))
+
+    @classmethod
+    def entre(cls, debut=None, fin_incluse=None):
+        """Bornes incluses d'un formulaire (du ... au ...)."""
+        return cls(debut, fin_incluse + timedelta(days=1) if fin_incluse else None)
+
+    @classmethod
+    def glissante(cls, jours, jusqu_au=None):
+        """Les `jours` derniers jours, `jusqu_au` (aujourd'hui par défaut) compris."""
+        jusqu_au = jusqu_au or timezone.localdate()
+        return cls(jusqu_au - timedelta(days=int(jours) - 1), jusqu_au + timedelta(days=1))
+
+    @classmethod
+    def depuis_filtres(cls, annee=None, mois=None, annees=None):
+        """
+        Filtres Année / Mois des rapports. Mois sans année : ce mois pour chaque
+        année de `annees`. Retourne une liste de périodes ([] = pas de filtre,
+        comme pour une valeur invalide : ?mois=13, ?annee=abc).
+        """
+        try:
+            if annee and mois:
+                return [cls.mois(annee, mois)]
+            if annee:
+                return [cls.annee(annee)]
+            if mois:
+                return [cls.mois(a, mois) for a in (annees or [])]
+        except (TypeError, ValueError):
+            pass
+        return []
+
+    # --- Lecture ---
+    @property
+    def dernier_jour(self):
+        """Dernier jour inclus (pour l'affichage et les champs « au »)."""
+        return self.fin - timedelta(days=1) if self.fin else None
+
+    def __contains__(self, jour):
+        return (self.debut is None or jour >= self.debut) and (self.fin is None or jour < self.fin)
+
+    def q(self, champ):
+        """Q(champ >= debut, champ < fin) pour n'importe quel chemin de champ date."""
+        conditions = {}
+        if self.debut:
+            conditions[f"{champ}__gte"] = self.debut
+        if self.fin:
+            conditions[f"{champ}__lt"] = self.fin
+        return Q(**conditions)
+
+    def filtrer(self, queryset, champ):
+        return filtrer_periode(queryset, champ, self.debut, self.fin)
+
+
+def q_periodes(champ, periodes):
+    """OR des intervalles de `periodes` sur `champ` (Q() vide si aucune période)."""
+    q = Q()
+    for periode in periodes:
+        q |= periode.q(champ)
+    return q
+
+
+def filtrer_periodes(queryset, champ, periodes):
+    periodes = list(periodes)
+    if not periodes:
+        return queryset
+    if len(periodes) == 1:
+        return periodes[0].filtrer(queryset, champ)
+    return queryset.filter(q_periodes(champ, periodes))
+
+
+def annees_de(queryset, champ):
+    """Années couvertes par `champ` (première et dernière valeurs lues par l'index)."""
+    dates = queryset.exclude(**{f"{champ}__isnull": True}).order_by(champ).values_list(champ, flat=True)
+    premiere, derniere = dates.first(), dates.last()
+    if premiere is None:
+        return []
+    return list(range(premiere.year, derniere.year + 1))
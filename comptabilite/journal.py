@@ -0,0 +1,220 @@
+# comptabilite/journal.py
+"""
+Génération des écritures à partir des pièces de gestion.
+
+Chaque pièce (vente, achat, charge, versement, mouvement de caisse) produit
+un groupe de lignes équilibré, identifié par (source_type, source_id).
+L'écriture incrémentale remplace ce groupe à chaque enregistrement
+(comptabilite.signals) ; `reconstruire()` régénère tout le journal par lots.
+
+Plan de comptes utilisé pour les contreparties :
+  53  caisse (ventilé par caisse)     70  ventes
+  60  achats de marchandises          40  fournisseurs (achat sans caisse)
+  58  versements                      47  compte d'attente
+"""
+from contextlib import contextmanager
+
+from django.apps import apps as global_apps
+from django.db import transaction
+
+from common.backfill import DEFAULT_BATCH_SIZE, iter_pk_batches
+
+COMPTE_CAISSE = "53"
+COMPTE_VENTES = "70"
+COMPTE_ACHATS = "60"
+COMPTE_FOURNISSEURS = "40"
+COMPTE_VERSEMENTS = "58"
+COMPTE_ATTENTE = "47"
+
+# Seules les ventes des commandes payées sont comptabilisées (une commande
+# payée puis annulée ou remise en attente garde sa Vente)
+STATUT_ENCAISSE = "Payée"
+
+
+def _vente(vente):
+    if vente.commande.statut_vente != STATUT_ENCAISSE:
+        return []
+    libelle = f"Vente {vente.commande.numero_facture or vente.commande_id}"
+    page_id = vente.commande.page_id
+    return [
+        dict(date=vente.date_encaissement, compte=COMPTE_CAISSE, debit=vente.montant,
+             caisse_id=vente.paiement_id, page_id=page_id, libelle=libelle),
+        dict(date=vente.date_encaissement, compte=COMPTE_VENTES, credit=vente.montant,
+             page_id=page_id, libelle=libelle),
+    ]
+
+
+def _achat(achat):
+    libelle = f"Achat {achat.num_facture or achat.pk}"
+    if achat.paiement_id:
+        contrepartie = dict(compte=COMPTE_CAISSE, caisse_id=achat.paiement_id)
+    else:
+        contrepartie = dict(compte=COMPTE_FOURNISSEURS)
+    return [
+        dict(date=achat.date, compte=COMPTE_ACHATS, debit=achat.total, libelle=libelle),
+        dict(date=achat.date, credit=achat.total, libelle=libelle, **contrepartie),
+    ]
+
+
+def _charge(charge):
+    compte = (charge.libelle.compte_numero or "").strip() or COMPTE_ATTENTE
+    # Comme l'état des caisses : seules les charges de classe 6 sortent de la caisse
+    if compte.startswith("6"):
+        contrepartie = dict(compte=COMPTE_CAISSE, caisse_id=charge.paiement_id)
+    else:
+        contrepartie = dict(compte=COMPTE_ATTENTE)
+    return [
+        dict(date=charge.date, compte=compte, debit=charge.montant,
+             page_id=charge.page_id, libelle=charge.libelle.libelle),
+        dict(date=charge.date, credit=charge.montant,
+             page_id=charge.page_id, libelle=charge.libelle.libelle, **contrepartie),
+    ]
+
+
+def _versement(versement):
+    libelle = versement.remarque or "Versement"
+    return [
+        dict(date=versement.date, compte=COMPTE_VERSEMENTS, debit=versement.montant,
+             page_id=versement.page_id, libelle=libelle),
+        dict(date=versement.date, compte=COMPTE_CAISSE, credit=versement.montant,
+             caisse_id=versement.caisse_id, page_id=versement.page_id, libelle=libelle),
+    ]
+
+
+def _mouvement(mouvement):
+    libelle = mouvement.reference or "Mouvement de caisse"
+    return [
+        dict(date=mouvement.date, compte=COMPTE_CAISSE, debit=mouvement.montant,
+             caisse_id=mouvement.caisse_credit_id, libelle=libelle),
+        dict(date=mouvement.date, compte=COMPTE_CAISSE, credit=mouvement.montant,
+             caisse_id=mouvement.caisse_debit_id, libelle=libelle),
+    ]
+
+
+# source_type -> (modèle, select_related, générateur de lignes)
+SOURCES = {
+    "vente": ("ventes.Vente", ("commande",), _vente),
+    "achat": ("achats.Achat", (), _achat),
+    "charge": ("charges.Charge", ("libelle",), _charge),
+    "versement": ("caisses.Versement", (), _versement),
+    "mouvement": ("caisses.MouvementCaisse", (), _mouvement),
+}
+
+
+def source_type_de(model):
+    label = model._meta.label
+    for source_type, (source_label, _, _) in SOURCES.items():
+        if source_label == label:
+            return source_type
+    return None
+
+
+def _lignes(Ecriture, source_type, objs):
+    generer = SOURCES[source_type][2]
+    return [
+        Ecriture(source_type=source_type, source_id=obj.pk, **ligne)
+        for obj in objs
+        if obj.statut_publication != "supprimé"
+        for ligne in generer(obj)
+        if ligne.get("debit") or ligne.get("credit")
+    ]
+
+
+@transaction.atomic
+def comptabiliser(source_type, ids):
+    """
+    Remplace les écritures des pièces `ids` (supprimées ou absentes : écritures
+    retirées) puis met à jour les soldes journaliers des jours de caisse touchés.
+    """
+    from .soldes import maj_soldes
+
+    Ecriture = global_apps.get_model("comptabilite", "Ecriture")
+    label, related, _ = SOURCES[source_type]
+    model = global_apps.get_model(label)
+    ids = list(ids)
+    anciennes = Ecriture.objects.filter(source_type=source_type, source_id__in=ids)
+    jours = set(anciennes.filter(caisse__isnull=False).values_list("caisse_id", "date"))
+    anciennes.delete()
+    objs = model._base_manager.filter(pk__in=ids).select_related(*related)
+    lignes = Ecriture.objects.bulk_create(_lignes(Ecriture, source_type, objs))
+    jours.update((l.caisse_id, l.date) for l in lignes if l.caisse_id)
+    maj_soldes(jours)
+
+
+def signature_vente(commande):
+    """Ce que l'écriture d'une vente reprend de sa commande (None si la commande n'est pas payée)."""
+    if commande.statut_vente != STATUT_ENCAISSE:
+        return None
+    return (commande.page_id, commande.numero_facture)
+
+
+def signatures_ventes(commande_ids):
+    """{commande_id: signature_vente} des `commande_ids` qui ont une vente."""
+    Commande = global_apps.get_model("ventes", "Commande")
+    commandes = (
+        Commande._base_manager.filter(pk__in=commande_ids, vente__isnull=False)
+        .only("statut_vente", "page", "numero_facture")
+    )
+    return {commande.pk: signature_vente(commande) for commande in commandes}
+
+
+def verifier_cloture_ventes(commande_ids):
+    """Lève PeriodeCloturee si l'une des ventes des `commande_ids` est datée dans un mois clôturé."""
+    from statistiques.cloture import verifier_dates
+    from statistiques.models import Cloture
+
+    limite = Cloture.date_limite()
+    if limite is None or not commande_ids:
+        return
+    Vente = global_apps.get_model("ventes", "Vente")
+    dates = (
+        Vente._base_manager.filter(commande_id__in=commande_ids, date_encaissement__lt=limite)
+        .exclude(statut_publication="supprimé")
+        .values_list("date_encaissement", flat=True)[:1]
+    )
+    verifier_dates(*dates, libelle="Changement de statut de commande", limite=limite)
+
+
+@contextmanager
+def suivi_ventes(commande_ids):
+    """
+    Pour les changements de statut en masse (update() sans signal) :
+    recomptabilise après le bloc les ventes des commandes modifiées, après
+    avoir refusé (PeriodeCloturee) celles datées dans un mois clôturé.
+    """
+    commande_ids = list(commande_ids)
+    avant = signatures_ventes(commande_ids)
+    yield
+    apres = signatures_ventes(commande_ids)
+    modifiees = [pk for pk, signature in apres.items() if signature != avant.get(pk)]
+    if not modifiees:
+        return
+    verifier_cloture_ventes(modifiees)
+    Vente = global_apps.get_model("ventes", "Vente")
+    comptabiliser("vente", Vente._base_manager.filter(commande_id__in=modifiees).values_list("pk", flat=True))
+
+
+def reconstruire(sources=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Régénère le journal des `sources` (toutes par défaut), par lots de pk.
+    Les soldes journaliers des caisses sont à reconstruire ensuite.
+    Retourne {source_type: nombre de lignes écrites}.
+    """
+    Ecriture = global_apps.get_model("comptabilite", "Ecriture")
+    resultat = {}
+    for source_type in sources or SOURCES:
+        label, related, _ = SOURCES[source_type]
+        model = global_apps.get_model(label)
+        queryset = model._base_manager.exclude(statut_publication="supprimé")
+        total = 0
+        with transaction.atomic():
+            Ecriture.objects.filter(source_type=source_type).delete()
+            for pks in iter_pk_batches(queryset, batch_size):
+                objs = queryset.filter(pk__in=pks).select_related(*related)
+                total += len(Ecriture.objects.bulk_create(
+                    _lignes(Ecriture, source_type, objs), batch_size=batch_size,
+                ))
+                if progress:
+                    progress(source_type, total, pks[-1])
+        resultat[source_type] = total
+    return resultat
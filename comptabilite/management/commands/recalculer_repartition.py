@@ -0,0 +1,15 @@
+# comptabilite/management/commands/recalculer_repartition.py
+from django.core.management.base import BaseCommand
+
+from comptabilite.repartition import mettre_a_jour, reconstruire
+
+
+class Command(BaseCommand):
+    help = "Recalcule la répartition des charges communes (mois marqués, ou tous avec --tout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tout", action="store_true", help="Recalculer tous les mois")
+
+    def handle(self, *args, **options):
+        total = reconstruire() if options["tout"] else mettre_a_jour()
+        self.stdout.write(self.style.SUCCESS(f"{total} mois recalculés."))
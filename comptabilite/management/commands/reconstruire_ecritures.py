@@ -0,0 +1,42 @@
+# comptabilite/management/commands/reconstruire_ecritures.py
+from django.core.management.base import BaseCommand, CommandError
+
+from common.backfill import DEFAULT_BATCH_SIZE
+from comptabilite.journal import SOURCES, reconstruire
+from comptabilite.soldes import reconstruire_soldes
+
+
+class Command(BaseCommand):
+    help = (
+        "Régénère le journal des écritures à partir des ventes, achats, charges, "
+        "versements et mouvements de caisse (par lots, source par source), "
+        "puis les soldes journaliers des caisses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "sources", nargs="*",
+            help=f"Sources à reconstruire parmi : {', '.join(SOURCES)} (toutes par défaut)",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def _progress(self, source_type, total, last_pk):
+        self.stdout.write(f"  {source_type} : {total} lignes (curseur id={last_pk})")
+
+    def handle(self, *args, **options):
+        inconnues = set(options["sources"]) - set(SOURCES)
+        if inconnues:
+            raise CommandError(f"Source(s) inconnue(s) : {', '.join(sorted(inconnues))}")
+
+        resultat = reconstruire(
+            sources=options["sources"] or None,
+            batch_size=options["batch_size"],
+            progress=self._progress,
+        )
+        for source_type, total in resultat.items():
+            self.stdout.write(f"{source_type} : {total} lignes")
+        jours = reconstruire_soldes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Journal reconstruit : {sum(resultat.values())} écritures, "
+            f"{jours} soldes journaliers de caisse."
+        ))
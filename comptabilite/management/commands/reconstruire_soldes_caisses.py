@@ -0,0 +1,15 @@
+# comptabilite/management/commands/reconstruire_soldes_caisses.py
+from django.core.management.base import BaseCommand
+
+from comptabilite.soldes import reconstruire_soldes
+
+
+class Command(BaseCommand):
+    help = "Recalcule les soldes journaliers des caisses à partir du journal des écritures."
+
+    def add_arguments(self, parser):
+        parser.add_argument("caisses", nargs="*", type=int, help="Id des caisses (toutes par défaut)")
+
+    def handle(self, *args, **options):
+        total = reconstruire_soldes(options["caisses"] or None)
+        self.stdout.write(self.style.SUCCESS(f"{total} soldes journaliers recalculés."))
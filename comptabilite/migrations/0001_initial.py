@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('common', '0006_pages_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ecriture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('compte', models.CharField(max_length=20)),
+                ('libelle', models.CharField(blank=True, max_length=255)),
+                ('debit', models.BigIntegerField(default=0)),
+                ('credit', models.BigIntegerField(default=0)),
+                ('source_type', models.CharField(choices=[('vente', 'Vente'), ('achat', 'Achat'), ('charge', 'Charge'), ('versement', 'Versement'), ('mouvement', 'Mouvement de caisse')], max_length=12)),
+                ('source_id', models.PositiveBigIntegerField()),
+                ('caisse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ecritures', to='common.caisse')),
+                ('page', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ecritures', to='common.pages')),
+            ],
+            options={
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['compte', 'date', 'caisse', 'page'], name='ecriture_compte_date_idx'), models.Index(fields=['caisse', 'date'], name='ecriture_caisse_date_idx'), models.Index(fields=['source_type', 'source_id'], name='ecriture_source_idx')],
+            },
+        ),
+    ]
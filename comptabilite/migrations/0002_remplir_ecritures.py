@@ -0,0 +1,113 @@
+from django.db import migrations
+
+# Règles du journal figées à la date de la migration (comptabilite.journal
+# peut évoluer avec le schéma courant ; celles-ci lisent le schéma de 0002)
+CAISSE, VENTES, ACHATS, FOURNISSEURS, VERSEMENTS, ATTENTE = "53", "70", "60", "40", "58", "47"
+
+
+def _vente(vente):
+    if vente.commande.statut_vente != "Payée":
+        return []
+    libelle = f"Vente {vente.commande.numero_facture or vente.commande_id}"
+    page_id = vente.commande.page_id
+    return [
+        dict(date=vente.date_encaissement, compte=CAISSE, debit=vente.montant,
+             caisse_id=vente.paiement_id, page_id=page_id, libelle=libelle),
+        dict(date=vente.date_encaissement, compte=VENTES, credit=vente.montant,
+             page_id=page_id, libelle=libelle),
+    ]
+
+
+def _achat(achat):
+    libelle = f"Achat {achat.num_facture or achat.pk}"
+    if achat.paiement_id:
+        contrepartie = dict(compte=CAISSE, caisse_id=achat.paiement_id)
+    else:
+        contrepartie = dict(compte=FOURNISSEURS)
+    return [
+        dict(date=achat.date, compte=ACHATS, debit=achat.total, libelle=libelle),
+        dict(date=achat.date, credit=achat.total, libelle=libelle, **contrepartie),
+    ]
+
+
+def _charge(charge):
+    compte = (charge.libelle.compte_numero or "").strip() or ATTENTE
+    if compte.startswith("6"):
+        contrepartie = dict(compte=CAISSE, caisse_id=charge.paiement_id)
+    else:
+        contrepartie = dict(compte=ATTENTE)
+    return [
+        dict(date=charge.date, compte=compte, debit=charge.montant,
+             page_id=charge.page_id, libelle=charge.libelle.libelle),
+        dict(date=charge.date, credit=charge.montant,
+             page_id=charge.page_id, libelle=charge.libelle.libelle, **contrepartie),
+    ]
+
+
+def _versement(versement):
+    libelle = versement.remarque or "Versement"
+    return [
+        dict(date=versement.date, compte=VERSEMENTS, debit=versement.montant,
+             page_id=versement.page_id, libelle=libelle),
+        dict(date=versement.date, compte=CAISSE, credit=versement.montant,
+             caisse_id=versement.caisse_id, page_id=versement.page_id, libelle=libelle),
+    ]
+
+
+def _mouvement(mouvement):
+    libelle = mouvement.reference or "Mouvement de caisse"
+    return [
+        dict(date=mouvement.date, compte=CAISSE, debit=mouvement.montant,
+             caisse_id=mouvement.caisse_credit_id, libelle=libelle),
+        dict(date=mouvement.date, compte=CAISSE, credit=mouvement.montant,
+             caisse_id=mouvement.caisse_debit_id, libelle=libelle),
+    ]
+
+
+SOURCES = [
+    ("vente", "ventes", "Vente", ("commande",), _vente),
+    ("achat", "achats", "Achat", (), _achat),
+    ("charge", "charges", "Charge", ("libelle",), _charge),
+    ("versement", "caisses", "Versement", (), _versement),
+    ("mouvement", "caisses", "MouvementCaisse", (), _mouvement),
+]
+
+
+def remplir_ecritures(apps, schema_editor):
+    Ecriture = apps.get_model("comptabilite", "Ecriture")
+    for source_type, app_label, model_name, related, generer in SOURCES:
+        model = apps.get_model(app_label, model_name)
+        pieces = (
+            model._base_manager.exclude(statut_publication="supprimé")
+            .select_related(*related).order_by("pk").iterator(chunk_size=1000)
+        )
+        lignes = []
+        for piece in pieces:
+            lignes.extend(
+                Ecriture(source_type=source_type, source_id=piece.pk, **ligne)
+                for ligne in generer(piece)
+                if ligne.get("debit") or ligne.get("credit")
+            )
+            if len(lignes) >= 1000:
+                Ecriture.objects.bulk_create(lignes)
+                lignes = []
+        Ecriture.objects.bulk_create(lignes)
+
+
+def vider_ecritures(apps, schema_editor):
+    apps.get_model("comptabilite", "Ecriture").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comptabilite', '0001_initial'),
+        ('ventes', '0035_alter_vente_paiement'),
+        ('achats', '0007_achat_total'),
+        ('charges', '0006_charge_compte_prefixe'),
+        ('caisses', '0006_alter_mouvementcaisse_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_ecritures, vider_ecritures),
+    ]
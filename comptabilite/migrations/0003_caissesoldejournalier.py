@@ -0,0 +1,56 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:10
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def remplir_soldes(apps, schema_editor):
+    # Une ligne par caisse et par jour du compte caisse (53), solde initial compris
+    Caisse = apps.get_model("common", "Caisse")
+    Ecriture = apps.get_model("comptabilite", "Ecriture")
+    CaisseSoldeJournalier = apps.get_model("comptabilite", "CaisseSoldeJournalier")
+    soldes = dict(Caisse.objects.values_list("pk", "solde_initial"))
+    jours = (
+        Ecriture.objects.filter(compte="53", caisse__isnull=False).order_by()
+        .values_list("caisse_id", "date").annotate(e=Sum("debit"), s=Sum("credit"))
+        .order_by("caisse_id", "date")
+    )
+    lignes = []
+    for caisse_id, jour, entrees, sorties in jours:
+        soldes[caisse_id] = soldes.get(caisse_id, 0) + (entrees or 0) - (sorties or 0)
+        lignes.append(CaisseSoldeJournalier(
+            caisse_id=caisse_id, date=jour, entrees=entrees or 0, sorties=sorties or 0,
+            solde=soldes[caisse_id],
+        ))
+    CaisseSoldeJournalier.objects.bulk_create(lignes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0006_pages_type'),
+        ('comptabilite', '0002_remplir_ecritures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaisseSoldeJournalier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('entrees', models.BigIntegerField(default=0)),
+                ('sorties', models.BigIntegerField(default=0)),
+                ('solde', models.BigIntegerField(default=0)),
+                ('caisse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soldes_journaliers', to='common.caisse')),
+            ],
+            options={
+                'ordering': ['caisse', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='caissesoldejournalier',
+            constraint=models.UniqueConstraint(fields=('caisse', 'date'), name='caisse_solde_jour_unique'),
+        ),
+        migrations.RunPython(remplir_soldes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def marquer_mois_existants(apps, schema_editor):
+    # Les mois sont seulement marqués : le calcul se fait à la première lecture
+    Charge = apps.get_model("charges", "Charge")
+    Commande = apps.get_model("ventes", "Commande")
+    RepartitionMois = apps.get_model("comptabilite", "RepartitionMois")
+    mois = set(Charge.objects.filter(page__isnull=True).dates("date", "month"))
+    mois |= set(Commande.objects.filter(statut_vente="Payée").dates("date_commande", "month"))
+    RepartitionMois.objects.bulk_create([RepartitionMois(mois=m) for m in sorted(mois)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0006_pages_type'),
+        ('comptabilite', '0003_caissesoldejournalier'),
+        ('charges', '0006_charge_compte_prefixe'),
+        ('ventes', '0035_alter_vente_paiement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepartitionMois',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(unique=True)),
+                ('charges', models.BigIntegerField(default=0)),
+                ('a_recalculer', models.BooleanField(default=True)),
+                ('calcule_le', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['mois'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RepartitionCharge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField()),
+                ('methode', models.CharField(choices=[('quantite', 'Quantité vendue'), ('chiffre_affaires', "Chiffre d'affaires"), ('marge', 'Marge')], max_length=20)),
+                ('montant', models.BigIntegerField(default=0)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='repartitions_charges', to='common.pages')),
+            ],
+            options={
+                'ordering': ['mois', 'page'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CleRepartition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField()),
+                ('quantite', models.BigIntegerField(default=0)),
+                ('chiffre_affaires', models.BigIntegerField(default=0)),
+                ('marge', models.BigIntegerField(default=0)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cles_repartition', to='common.pages')),
+            ],
+            options={
+                'ordering': ['mois', 'page'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='repartitioncharge',
+            constraint=models.UniqueConstraint(fields=('methode', 'mois', 'page'), name='repartition_charge_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='clerepartition',
+            constraint=models.UniqueConstraint(fields=('mois', 'page'), name='cle_repartition_unique'),
+        ),
+        migrations.RunPython(marquer_mois_existants, migrations.RunPython.noop),
+    ]
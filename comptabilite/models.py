@@ -0,0 +1,125 @@
+from django.db import models
+from common.models import Caisse, Pages
+
+
+class Ecriture(models.Model):
+    """
+    Ligne du journal en partie double, générée à partir des ventes, achats,
+    charges, versements et mouvements de caisse (voir comptabilite.journal).
+    Ne se saisit jamais à la main : une pièce source = un groupe de lignes
+    équilibré (somme des débits = somme des crédits).
+    """
+    SOURCES = [
+        ("vente", "Vente"),
+        ("achat", "Achat"),
+        ("charge", "Charge"),
+        ("versement", "Versement"),
+        ("mouvement", "Mouvement de caisse"),
+    ]
+
+    date = models.DateField()
+    compte = models.CharField(max_length=20)
+    caisse = models.ForeignKey(Caisse, null=True, blank=True, on_delete=models.CASCADE, related_name="ecritures")
+    page = models.ForeignKey(Pages, null=True, blank=True, on_delete=models.SET_NULL, related_name="ecritures")
+    libelle = models.CharField(max_length=255, blank=True)
+    # Signés (BIGINT) : debit - credit ne doit pas déborder en non signé sous MySQL
+    debit = models.BigIntegerField(default=0)
+    credit = models.BigIntegerField(default=0)
+    source_type = models.CharField(max_length=12, choices=SOURCES)
+    source_id = models.PositiveBigIntegerField()
+
+    class Meta:
+        ordering = ["date", "id"]
+        indexes = [
+            models.Index(fields=["compte", "date", "caisse", "page"], name="ecriture_compte_date_idx"),
+            models.Index(fields=["caisse", "date"], name="ecriture_caisse_date_idx"),
+            models.Index(fields=["source_type", "source_id"], name="ecriture_source_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.compte} D {self.debit} / C {self.credit}"
+
+    @property
+    def solde(self):
+        return self.debit - self.credit
+
+
+class CaisseSoldeJournalier(models.Model):
+    """
+    Une ligne par caisse et par jour mouvementé : entrées, sorties et solde
+    de fin de journée (solde initial compris). Dérivée des écritures du
+    compte caisse et tenue à jour par comptabilite.soldes.
+    """
+    caisse = models.ForeignKey(Caisse, on_delete=models.CASCADE, related_name="soldes_journaliers")
+    date = models.DateField()
+    entrees = models.BigIntegerField(default=0)
+    sorties = models.BigIntegerField(default=0)
+    solde = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["caisse", "date"]
+        constraints = [
+            models.UniqueConstraint(fields=["caisse", "date"], name="caisse_solde_jour_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.caisse} {self.date} : {self.solde}"
+
+
+class RepartitionMois(models.Model):
+    """
+    État de la répartition des charges communes d'un mois : total à répartir
+    et indicateur de recalcul, levé par comptabilite.signals dès qu'une
+    donnée d'entrée du mois change (charge, commande, ligne, vente).
+    """
+    mois = models.DateField(unique=True)
+    charges = models.BigIntegerField(default=0)
+    a_recalculer = models.BooleanField(default=True)
+    calcule_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["mois"]
+
+    def __str__(self):
+        return f"{self.mois:%Y-%m} : {self.charges}"
+
+
+class CleRepartition(models.Model):
+    """Clés mensuelles d'une page : quantité vendue, chiffre d'affaires et marge."""
+    mois = models.DateField()
+    page = models.ForeignKey(Pages, on_delete=models.CASCADE, related_name="cles_repartition")
+    quantite = models.BigIntegerField(default=0)
+    chiffre_affaires = models.BigIntegerField(default=0)
+    marge = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["mois", "page"]
+        constraints = [
+            models.UniqueConstraint(fields=["mois", "page"], name="cle_repartition_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.mois:%Y-%m} {self.page}"
+
+
+class RepartitionCharge(models.Model):
+    """Part des charges communes du mois attribuée à une page, pour chaque clé."""
+    METHODES = [
+        ("quantite", "Quantité vendue"),
+        ("chiffre_affaires", "Chiffre d'affaires"),
+        ("marge", "Marge"),
+    ]
+
+    mois = models.DateField()
+    page = models.ForeignKey(Pages, on_delete=models.CASCADE, related_name="repartitions_charges")
+    methode = models.CharField(max_length=20, choices=METHODES)
+    montant = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["mois", "page"]
+        constraints = [
+            models.UniqueConstraint(fields=["methode", "mois", "page"], name="repartition_charge_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.mois:%Y-%m} {self.page} ({self.methode}) : {self.montant}"
@@ -0,0 +1,221 @@
+# comptabilite/repartition.py
+"""
+Répartition des charges communes (charges de classe 6 sans page) entre les
+pages de vente, mois par mois.
+
+Les clés (quantité vendue, chiffre d'affaires, marge par page) et les parts
+de chaque méthode sont calculées une fois par mois et stockées
+(CleRepartition, RepartitionCharge). Les signaux marquent « à recalculer »
+les mois dont une donnée d'entrée a changé ; les lectures ne recalculent
+que ces mois-là.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils.timezone import now
+
+from common.utils import Periode, filtrer_periode, filtrer_periodes
+from statistiques.models import debut_mois, mois_suivant
+from .models import CleRepartition, RepartitionCharge, RepartitionMois
+
+METHODES = [code for code, _ in RepartitionCharge.METHODES]
+METHODE_DEFAUT = getattr(settings, "REPARTITION_CHARGES_METHODE", "quantite")
+
+
+def methode_valide(methode):
+    return methode if methode in METHODES else METHODE_DEFAUT
+
+
+def marquer_mois(dates):
+    """Marque à recalculer les mois des `dates` (crée l'état du mois au besoin)."""
+    mois = {debut_mois(d) for d in dates if d}
+    if not mois:
+        return
+    RepartitionMois.objects.bulk_create(
+        [RepartitionMois(mois=m) for m in mois], ignore_conflicts=True,
+    )
+    RepartitionMois.objects.filter(mois__in=mois, a_recalculer=False).update(a_recalculer=True)
+
+
+def _dates_commandes(commande_ids):
+    from ventes.models import Commande
+
+    return set(Commande._base_manager.filter(pk__in=commande_ids).values_list("date_commande", flat=True))
+
+
+@contextmanager
+def suivi_repartition(commande_ids):
+    """
+    Pour les écritures en masse sur des commandes (update, bulk_create), qui
+    n'émettent pas de signal : marque à recalculer les mois des `commande_ids`
+    avant et après le bloc.
+    """
+    commande_ids = list(commande_ids)
+    avant = _dates_commandes(commande_ids)
+    yield
+    marquer_mois(avant | _dates_commandes(commande_ids))
+
+
+def _charges_communes(debut, fin):
+    from charges.models import Charge
+
+    return filtrer_periode(
+        Charge.actifs.filter(page__isnull=True, libelle__compte_numero__startswith="6"),
+        "date", debut, fin,
+    ).aggregate(total=Sum("montant"))["total"] or 0
+
+
+def _cles(debut, fin):
+    """{page_id: {"quantite", "chiffre_affaires", "marge"}} des commandes payées du mois."""
+    from ventes.models import Commande, LigneCommande, Vente
+
+    commandes = filtrer_periode(
+        Commande.actifs.filter(statut_vente="Payée", vente__isnull=False, page__isnull=False),
+        "date_commande", debut, fin,
+    )
+    cles = defaultdict(lambda: {"quantite": 0, "chiffre_affaires": 0, "cout": 0})
+    for page_id, qte, cout in (
+        LigneCommande.actifs.filter(commande__in=commandes)
+        .order_by()
+        .values_list("commande__page_id")
+        .annotate(qte=Sum("quantite"), cout=Sum(F("quantite") * F("prix_achat")))
+    ):
+        cles[page_id]["quantite"] = qte or 0
+        cles[page_id]["cout"] = cout or 0
+    for page_id, ca in (
+        Vente.actifs.filter(commande__in=commandes)
+        .order_by()
+        .values_list("commande__page_id")
+        .annotate(ca=Sum("montant"))
+    ):
+        cles[page_id]["chiffre_affaires"] = ca or 0
+    return {
+        page_id: {
+            "quantite": c["quantite"],
+            "chiffre_affaires": c["chiffre_affaires"],
+            "marge": c["chiffre_affaires"] - c["cout"],
+        }
+        for page_id, c in cles.items()
+    }
+
+
+def _parts(montant, poids):
+    """Prorata de `montant` selon `poids` (négatifs ignorés), arrondi à la centaine."""
+    poids = {page_id: p for page_id, p in poids.items() if p > 0}
+    total = sum(poids.values())
+    if not montant or not total:
+        return {}
+    return {page_id: int(round(p / total * montant, -2)) for page_id, p in poids.items()}
+
+
+@transaction.atomic
+def recalculer_mois(mois):
+    """Recalcule clés et parts d'un mois et le marque à jour."""
+    debut = debut_mois(mois)
+    fin = mois_suivant(debut)
+    charges = _charges_communes(debut, fin)
+    cles = _cles(debut, fin)
+
+    CleRepartition.objects.filter(mois=debut).delete()
+    RepartitionCharge.objects.filter(mois=debut).delete()
+    CleRepartition.objects.bulk_create([
+        CleRepartition(mois=debut, page_id=page_id, **valeurs)
+        for page_id, valeurs in cles.items()
+    ])
+    RepartitionCharge.objects.bulk_create([
+        RepartitionCharge(mois=debut, page_id=page_id, methode=methode, montant=montant)
+        for methode in METHODES
+        for page_id, montant in _parts(
+            charges, {page_id: valeurs[methode] for page_id, valeurs in cles.items()}
+        ).items()
+    ])
+    RepartitionMois.objects.update_or_create(
+        mois=debut, defaults={"charges": charges, "a_recalculer": False, "calcule_le": now()},
+    )
+
+
+def mettre_a_jour(periodes=()):
+    """Recalcule les mois marqués des `periodes` (tous si aucune) ; retourne le nombre de mois traités."""
+    mois = list(
+        filtrer_periodes(RepartitionMois.objects.filter(a_recalculer=True), "mois", _en_mois(periodes))
+        .values_list("mois", flat=True)
+    )
+    for m in mois:
+        recalculer_mois(m)
+    return len(mois)
+
+
+def _en_mois(periodes):
+    """Étend chaque période aux mois entiers (les tables sont au mois : 1er du mois)."""
+    return [Periode(debut_mois(p.debut) if p.debut else None, p.fin) for p in periodes]
+
+
+def reconstruire():
+    """Marque et recalcule tous les mois ayant des charges communes ou des ventes."""
+    from charges.models import Charge
+    from ventes.models import Commande
+
+    dates = set(Charge.actifs.filter(page__isnull=True).dates("date", "month"))
+    dates |= set(Commande.actifs.filter(statut_vente="Payée").dates("date_commande", "month"))
+    marquer_mois(dates)
+    RepartitionMois.objects.update(a_recalculer=True)
+    return mettre_a_jour()
+
+
+def repartition(periodes=(), methode=None):
+    """
+    Parts stockées sur les `periodes` (liste de common.utils.Periode, toutes
+    si vide), après recalcul des seuls mois marqués. Retourne
+    ([{"mois", "parts": {page_id: montant}, "total"}], {page_id: total}, total).
+    """
+    methode = methode_valide(methode)
+    periodes = _en_mois(periodes)
+    mettre_a_jour(periodes)
+
+    etats = filtrer_periodes(RepartitionMois.objects.filter(charges__gt=0), "mois", periodes)
+    parts = filtrer_periodes(RepartitionCharge.objects.filter(methode=methode), "mois", periodes)
+
+    par_mois = defaultdict(dict)
+    totaux = defaultdict(int)
+    for m, page_id, montant in parts.values_list("mois", "page_id", "montant"):
+        par_mois[m][page_id] = montant
+        totaux[page_id] += montant
+
+    lignes = [
+        {"mois": m, "parts": par_mois.get(m, {}), "total": charges}
+        for m, charges in etats.order_by("mois").values_list("mois", "charges")
+    ]
+    return lignes, dict(totaux), sum(l["total"] for l in lignes)
+
+
+def resultat_par_page(periode=None, methode=None):
+    """
+    Marge par page après quote-part des charges communes, lue dans les tables
+    pré-calculées (mois entiers couvrant la `periode`).
+    Retourne [{"page_id", "quantite", "chiffre_affaires", "marge", "quote_part", "marge_nette"}].
+    """
+    methode = methode_valide(methode)
+    periodes = _en_mois([periode or Periode()])
+    mettre_a_jour(periodes)
+
+    lignes = {
+        page_id: {"page_id": page_id, "quantite": q or 0, "chiffre_affaires": ca or 0, "marge": m or 0, "quote_part": 0}
+        for page_id, q, ca, m in filtrer_periodes(CleRepartition.objects.all(), "mois", periodes)
+        .order_by()
+        .values_list("page_id")
+        .annotate(q=Sum("quantite"), ca=Sum("chiffre_affaires"), m=Sum("marge"))
+    }
+    for page_id, montant in (
+        filtrer_periodes(RepartitionCharge.objects.filter(methode=methode), "mois", periodes)
+        .order_by()
+        .values_list("page_id")
+        .annotate(total=Sum("montant"))
+    ):
+        lignes.setdefault(page_id, {"page_id": page_id, "quantite": 0, "chiffre_affaires": 0, "marge": 0})
+        lignes[page_id]["quote_part"] = montant or 0
+    for ligne in lignes.values():
+        ligne["marge_nette"] = ligne["marge"] - ligne["quote_part"]
+    return sorted(lignes.values(), key=lambda l: -l["chiffre_affaires"])
@@ -0,0 +1,98 @@
+# comptabilite/signals.py
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from achats.models import LigneAchat
+from charges.models import Charge
+from common.models import Caisse, PlanDesComptes
+from ventes.models import Commande, LigneCommande, Vente
+from .journal import (
+    SOURCES, comptabiliser, signature_vente, signatures_ventes, source_type_de, verifier_cloture_ventes,
+)
+from .repartition import marquer_mois
+from .soldes import reconstruire_soldes
+
+
+def maj_ecritures(sender, instance, **kwargs):
+    # Écriture incrémentale : seul le groupe de lignes de la pièce est remplacé
+    comptabiliser(source_type_de(sender), [instance.pk])
+
+
+for label, _, _ in SOURCES.values():
+    modele = apps.get_model(label)
+    post_save.connect(maj_ecritures, sender=modele, dispatch_uid=f"ecritures_save_{label}")
+    post_delete.connect(maj_ecritures, sender=modele, dispatch_uid=f"ecritures_delete_{label}")
+
+
+@receiver(post_save, sender=LigneAchat)
+@receiver(post_delete, sender=LigneAchat)
+def maj_ecritures_achat(sender, instance, **kwargs):
+    # Achat.total vient d'être recalculé par achats.signals (UPDATE sans signal)
+    comptabiliser("achat", [instance.achat_id])
+
+
+@receiver(post_save, sender=PlanDesComptes)
+def maj_ecritures_compte(sender, instance, created, **kwargs):
+    if created:
+        return
+    ids = Charge.objects.filter(libelle=instance).values_list("pk", flat=True)
+    comptabiliser("charge", ids)
+    # Le numéro de compte décide si la charge est une charge commune à répartir
+    marquer_mois(Charge.objects.filter(libelle=instance, page__isnull=True).dates("date", "month"))
+
+
+@receiver(pre_save, sender=Commande)
+def proteger_ventes_cloturees(sender, instance, **kwargs):
+    # Le statut, la page ou le numéro de facture d'une commande réécrivent
+    # l'écriture de sa vente : refusé si la vente tombe dans un mois clôturé
+    if not instance.pk:
+        return
+    enregistree = signatures_ventes([instance.pk])
+    if not enregistree:
+        return
+    if signature_vente(instance) != enregistree[instance.pk]:
+        verifier_cloture_ventes([instance.pk])
+
+
+@receiver(post_save, sender=Commande)
+def maj_ecritures_commande(sender, instance, created, update_fields=None, **kwargs):
+    # La vente reprend la page, le numéro de facture et le statut (payée ou non) de sa commande
+    if created or (update_fields is not None and not {"page", "numero_facture", "statut_vente"} & set(update_fields)):
+        return
+    ids = Vente.objects.filter(commande_id=instance.pk).values_list("pk", flat=True)
+    if ids:
+        comptabiliser("vente", ids)
+
+
+@receiver(post_save, sender=Caisse)
+def maj_soldes_caisse(sender, instance, created, **kwargs):
+    # Le solde initial entre dans tous les soldes journaliers de la caisse
+    if not created:
+        reconstruire_soldes([instance.pk])
+
+
+# Entrées de la répartition des charges communes : modèle -> date qui fixe le mois
+CHAMPS_MOIS = {
+    Charge: "date",
+    Commande: "date_commande",
+    LigneCommande: "commande__date_commande",
+    Vente: "commande__date_commande",
+}
+
+
+def marquer_repartition(sender, instance, **kwargs):
+    # Mois d'arrivée et, si la pièce change de mois, mois de départ
+    if sender in (LigneCommande, Vente):
+        courante = Commande._base_manager.filter(pk=instance.commande_id).values_list("date_commande", flat=True).first()
+    else:
+        courante = getattr(instance, CHAMPS_MOIS[sender])
+    enregistree = None
+    if instance.pk:
+        enregistree = sender._base_manager.filter(pk=instance.pk).values_list(CHAMPS_MOIS[sender], flat=True).first()
+    marquer_mois([courante, enregistree])
+
+
+for modele in CHAMPS_MOIS:
+    pre_save.connect(marquer_repartition, sender=modele, dispatch_uid=f"repartition_save_{modele.__name__}")
+    pre_delete.connect(marquer_repartition, sender=modele, dispatch_uid=f"repartition_delete_{modele.__name__}")
@@ -0,0 +1,109 @@
+# comptabilite/soldes.py
+"""
+Soldes journaliers des caisses (CaisseSoldeJournalier).
+
+Le solde d'une caisse à une date se lit en une requête (dernière ligne
+antérieure) au lieu de ré-agréger toutes les pièces depuis l'origine.
+
+Mise à jour incrémentale : pour chaque jour touché par une écriture, on
+recalcule les entrées/sorties du jour depuis le journal, puis on décale
+d'un seul UPDATE le solde des jours suivants de la différence.
+"""
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F, Sum
+
+from common.models import Caisse
+from .journal import COMPTE_CAISSE
+from .models import CaisseSoldeJournalier, Ecriture
+
+
+def _mouvements_caisse(Ecriture, caisse_id, dates=None):
+    """{date: (entrees, sorties)} du compte caisse, en un GROUP BY date."""
+    qs = Ecriture.objects.filter(compte=COMPTE_CAISSE, caisse_id=caisse_id)
+    if dates is not None:
+        qs = qs.filter(date__in=dates)
+    rows = qs.order_by().values_list("date").annotate(e=Sum("debit"), s=Sum("credit"))
+    return {jour: (e or 0, s or 0) for jour, e, s in rows}
+
+
+@transaction.atomic
+def maj_soldes(jours_par_caisse):
+    """`jours_par_caisse` : {caisse_id: {dates touchées}} (ou itérable de couples)."""
+    if not isinstance(jours_par_caisse, dict):
+        regroupes = defaultdict(set)
+        for caisse_id, jour in jours_par_caisse:
+            regroupes[caisse_id].add(jour)
+        jours_par_caisse = regroupes
+
+    for caisse_id, jours in jours_par_caisse.items():
+        if caisse_id is None or not jours:
+            continue
+        lignes = CaisseSoldeJournalier.objects.filter(caisse_id=caisse_id)
+        nouveaux = _mouvements_caisse(Ecriture, caisse_id, jours)
+        anciens = {l.date: l for l in lignes.filter(date__in=jours)}
+        solde_initial = None
+
+        for jour in sorted(jours):
+            entrees, sorties = nouveaux.get(jour, (0, 0))
+            ancien = anciens.get(jour)
+            delta = (entrees - sorties) - ((ancien.entrees - ancien.sorties) if ancien else 0)
+            if delta:
+                lignes.filter(date__gt=jour).update(solde=F("solde") + delta)
+
+            if not entrees and not sorties:
+                if ancien:
+                    ancien.delete()
+                continue
+
+            precedent = lignes.filter(date__lt=jour).order_by("-date").values_list("solde", flat=True).first()
+            if precedent is None:
+                if solde_initial is None:
+                    solde_initial = Caisse.objects.filter(pk=caisse_id).values_list("solde_initial", flat=True).first() or 0
+                precedent = solde_initial
+            CaisseSoldeJournalier.objects.update_or_create(
+                caisse_id=caisse_id, date=jour,
+                defaults={"entrees": entrees, "sorties": sorties, "solde": precedent + entrees - sorties},
+            )
+
+
+def reconstruire_soldes(caisse_ids=None):
+    """Recalcule entièrement les soldes journaliers (toutes les caisses par défaut)."""
+    Ecriture = global_apps.get_model("comptabilite", "Ecriture")
+    CaisseSoldeJournalier = global_apps.get_model("comptabilite", "CaisseSoldeJournalier")
+
+    caisses = global_apps.get_model("common", "Caisse").objects.all()
+    if caisse_ids is not None:
+        caisses = caisses.filter(pk__in=caisse_ids)
+
+    total = 0
+    for caisse_id, solde_initial in caisses.values_list("pk", "solde_initial"):
+        solde = solde_initial
+        lignes = []
+        for jour, (entrees, sorties) in sorted(_mouvements_caisse(Ecriture, caisse_id).items()):
+            solde += entrees - sorties
+            lignes.append(CaisseSoldeJournalier(
+                caisse_id=caisse_id, date=jour, entrees=entrees, sorties=sorties, solde=solde,
+            ))
+        with transaction.atomic():
+            CaisseSoldeJournalier.objects.filter(caisse_id=caisse_id).delete()
+            CaisseSoldeJournalier.objects.bulk_create(lignes, batch_size=1000)
+        total += len(lignes)
+    return total
+
+
+def solde_au(caisse, jour):
+    """Solde de fin de journée de `caisse` au `jour` : une seule lecture indexée."""
+    solde = (
+        CaisseSoldeJournalier.objects.filter(caisse=caisse, date__lte=jour)
+        .order_by("-date").values_list("solde", flat=True).first()
+    )
+    return caisse.solde_initial if solde is None else solde
+
+
+def soldes_au(jour, caisses=None):
+    """{caisse_id: solde} de toutes les caisses au `jour` (une lecture par caisse, indexée)."""
+    caisses = Caisse.objects.all() if caisses is None else caisses
+    return {caisse.pk: solde_au(caisse, jour) for caisse in caisses}
@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.db.models import Sum
+from django.test import TestCase
+
+from achats.models import Achat, LigneAchat
+from articles.models import Article
+from caisses.models import MouvementCaisse, Versement
+from charges.models import Charge
+from clients.models import Client
+from common.models import Caisse, PlanDesComptes
+from ventes.models import Commande, Vente
+from .journal import COMPTE_CAISSE, reconstruire
+from .models import CaisseSoldeJournalier, Ecriture
+
+
+class JournalTests(TestCase):
+    def setUp(self):
+        self.caisse = Caisse.objects.create(nom="Caisse", responsable="R", solde_initial=1000)
+        self.banque = Caisse.objects.create(nom="Banque", responsable="R")
+        client = Client.objects.create(nom="Client", contact="0340000000")
+        self.commande = Commande.objects.create(client=client, page=None, statut_vente="Payée")
+        Vente.objects.create(commande=self.commande, date_encaissement=date(2024, 1, 4), paiement=self.caisse, montant=400)
+
+        article = Article.objects.create(reference="VELO", nom="Vélo", prix_achat=100, prix_vente=200)
+        achat = Achat.objects.create(date=date(2024, 1, 2), paiement=self.caisse)
+        LigneAchat.objects.create(achat=achat, article=article, pu=100, quantite=3)
+
+        telephone = PlanDesComptes.objects.create(compte_numero="626", libelle="Téléphone")
+        salaire = PlanDesComptes.objects.create(compte_numero="421", libelle="Salaire")
+        Charge.objects.create(date=date(2024, 1, 6), libelle=telephone, pu=50, quantite=1, montant=50, paiement=self.caisse)
+        Charge.objects.create(date=date(2024, 1, 6), libelle=salaire, pu=70, quantite=1, montant=70, paiement=self.banque)
+        Versement.objects.create(date=date(2024, 1, 7), montant=100, caisse=self.caisse)
+        MouvementCaisse.objects.create(date=date(2024, 1, 7), caisse_debit=self.caisse, caisse_credit=self.banque, montant=30)
+
+    def assertEquilibre(self):
+        groupes = Ecriture.objects.values("source_type", "source_id").annotate(d=Sum("debit"), c=Sum("credit"))
+        self.assertTrue(groupes)
+        for groupe in groupes:
+            self.assertEqual(groupe["d"], groupe["c"], groupe)
+
+    def test_chaque_piece_est_equilibree(self):
+        self.assertEqual(
+            set(Ecriture.objects.values_list("source_type", flat=True)),
+            {"vente", "achat", "charge", "versement", "mouvement"},
+        )
+        self.assertEquilibre()
+
+    def test_reconstruction_identique_et_equilibree(self):
+        avant = sorted(Ecriture.objects.values_list("source_type", "source_id", "compte", "debit", "credit"))
+        reconstruire()
+        self.assertEqual(sorted(Ecriture.objects.values_list("source_type", "source_id", "compte", "debit", "credit")), avant)
+        self.assertEquilibre()
+
+    def test_vente_non_payee_sans_ecriture(self):
+        Commande.objects.filter(pk=self.commande.pk).update(statut_vente="En attente")
+        reconstruire(["vente"])
+        self.assertFalse(Ecriture.objects.filter(source_type="vente").exists())
+        self.assertEquilibre()
+
+    def test_solde_journalier_suit_le_compte_caisse(self):
+        for caisse in (self.caisse, self.banque):
+            dernier = CaisseSoldeJournalier.objects.filter(caisse=caisse).latest("date")
+            mouvements = Ecriture.objects.filter(compte=COMPTE_CAISSE, caisse=caisse).aggregate(d=Sum("debit"), c=Sum("credit"))
+            self.assertEqual(dernier.solde, caisse.solde_initial + (mouvements["d"] or 0) - (mouvements["c"] or 0))
@@ -0,0 +1,128 @@
+# comptabilite/utils.py
+"""Lectures du journal : chaque rapport est un parcours d'intervalle sur Ecriture."""
+from collections import defaultdict
+
+from django.db.models import F, Sum, Value, Window
+from django.db.models.functions import Coalesce
+
+from common.utils import filtrer_periode
+from .journal import COMPTE_ACHATS, COMPTE_CAISSE, COMPTE_VENTES
+from .models import Ecriture
+
+# Flux de caisse : (source, sens) -> rubrique de caisses.utils.FLUX_CAISSE
+RUBRIQUES_CAISSE = {
+    ("vente", "debit"): "ventes",
+    ("mouvement", "debit"): "mvt_entree",
+    ("achat", "credit"): "achats",
+    ("charge", "credit"): "charges",
+    ("versement", "credit"): "versements",
+    ("mouvement", "credit"): "mvt_sortie",
+}
+
+
+def ecritures(depuis=None, avant=None):
+    return filtrer_periode(Ecriture.objects.all(), "date", depuis, avant)
+
+
+def flux_par_caisse(depuis=None, avant=None):
+    """{caisse_id: {rubrique: montant}} en un seul GROUP BY sur le compte caisse."""
+    rows = (
+        ecritures(depuis, avant)
+        .filter(compte=COMPTE_CAISSE, caisse__isnull=False)
+        .order_by()
+        .values_list("caisse_id", "source_type")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+    )
+    flux = defaultdict(lambda: defaultdict(int))
+    for caisse_id, source_type, debit, credit in rows:
+        for sens, montant in (("debit", debit), ("credit", credit)):
+            rubrique = RUBRIQUES_CAISSE.get((source_type, sens))
+            if rubrique and montant:
+                flux[caisse_id][rubrique] += montant
+    return flux
+
+
+def totaux_resultat(depuis=None, avant=None):
+    """
+    CA, achats et charges (par compte) de la période en un GROUP BY :
+    {"ca": int, "achats": int, "charges": {compte: solde}}.
+    """
+    rows = (
+        ecritures(depuis, avant)
+        .filter(source_type__in=("vente", "achat", "charge"))
+        .exclude(caisse__isnull=False)
+        .order_by()
+        .values_list("source_type", "compte")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+    )
+    totaux = {"ca": 0, "achats": 0, "charges": defaultdict(int)}
+    for source_type, compte, debit, credit in rows:
+        if source_type == "vente" and compte == COMPTE_VENTES:
+            totaux["ca"] += credit - debit
+        elif source_type == "achat" and compte == COMPTE_ACHATS:
+            totaux["achats"] += debit - credit
+        elif source_type == "charge" and debit:
+            totaux["charges"][compte] += debit - credit
+    return totaux
+
+
+def balance_generale(depuis=None, avant=None):
+    """
+    Balance par compte : solde d'ouverture (avant `depuis`), mouvements de la
+    période et solde de clôture. Deux GROUP BY compte.
+    """
+    ouverture = {}
+    if depuis:
+        ouverture = dict(
+            Ecriture.objects.filter(date__lt=depuis)
+            .order_by()
+            .values_list("compte")
+            .annotate(solde=Sum(F("debit") - F("credit")))
+        )
+    mouvements = {
+        compte: (debit, credit)
+        for compte, debit, credit in ecritures(depuis, avant)
+        .order_by()
+        .values_list("compte")
+        .annotate(debit=Sum("debit"), credit=Sum("credit"))
+    }
+    lignes = []
+    for compte in sorted(set(ouverture) | set(mouvements)):
+        debit, credit = mouvements.get(compte, (0, 0))
+        solde_ouverture = ouverture.get(compte) or 0
+        lignes.append({
+            "compte": compte,
+            "ouverture": solde_ouverture,
+            "debit": debit,
+            "credit": credit,
+            "solde": solde_ouverture + debit - credit,
+        })
+    return lignes
+
+
+def grand_livre(compte, depuis=None, avant=None, caisse_id=None):
+    """
+    Lignes d'un compte (ou d'une racine : '6' -> tous les comptes de charges)
+    avec solde progressif calculé par fonction fenêtre (ouverture incluse).
+    Retourne (solde_ouverture, queryset annoté `cumul`).
+    """
+    base = Ecriture.objects.filter(compte__startswith=compte)
+    if caisse_id:
+        base = base.filter(caisse_id=caisse_id)
+
+    ouverture = 0
+    if depuis:
+        ouverture = base.filter(date__lt=depuis).aggregate(
+            s=Coalesce(Sum(F("debit") - F("credit")), 0)
+        )["s"]
+
+    lignes = (
+        filtrer_periode(base, "date", depuis, avant)
+        .select_related("caisse", "page")
+        .annotate(cumul=Window(
+            Sum(F("debit") - F("credit")),
+            order_by=[F("date").asc(), F("id").asc()],
+        ) + Value(ouverture))
+        .order_by("date", "id")
+    )
+    return ouverture, lignes
@@ -15,6 +15,7 @@ from django.contrib.auth.decorators import user_passes_test
 import json
 
 from common.decorators import admin_required
+from common.permissions import CONFIGURATION, ROLES_ADMINISTRATION, a_droit, role_de
 from common.models import Pages, Caisse, PlanDesComptes
 from articles.models import Categorie, Taille, Couleur
 
@@ -35,7 +36,7 @@ from livraison.forms import LivreurForm
 # -------------------------------
 # Normalisation & prédicats d'accès (UN SEUL point de vérité)
 # -------------------------------
-ADMIN_ROLE_ALIASES = {"admin", "administrateur", "superadmin"}
+ADMIN_ROLE_ALIASES = ROLES_ADMINISTRATION
 
 def _normalize_role_label(label: str) -> str:
     return (label or "").strip().lower()
@@ -46,13 +47,7 @@ def is_admin_user(user) -> bool:
       - is_staff est ignoré volontairement
       - 'Community Manager', 'Commercial', etc. NE sont PAS admin
     """
-    if not getattr(user, "is_authenticated", False):
-        return False
-    if getattr(user, "is_superuser", False):
-        return True
-    r = getattr(user, "role", None)
-    role_label = _normalize_role_label(getattr(r, "role", None))
-    return role_label in ADMIN_ROLE_ALIASES
+    return a_droit(user, CONFIGURATION)
 
 
 # -------------------------------
@@ -850,7 +845,7 @@ def config_user_delete(request, user_id: int):
         messages.warning(request, "Action refusée : superutilisateur.")
         return redirect(f"{reverse('configuration')}?tab=utilisateurs")
 
-    target_role = _normalize_role_label(getattr(getattr(target, "role", None), "role", ""))
+    target_role = _normalize_role_label(getattr(role_de(target), "role", ""))
     if target_role in ADMIN_ROLE_ALIASES and not request.user.is_superuser:
         if request.headers.get("HX-Request"):
             resp = HttpResponse(status=204)
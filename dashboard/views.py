@@ -1,4 +1,3 @@
-from datetime import timedelta
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
@@ -8,53 +7,42 @@ from django.db.models.functions import Coalesce, TruncDay, TruncMonth, Cast
 from ventes.models import Commande, LigneCommande, Vente
 from achats.models import Achat
 from charges.models import Charge
-from common.models import Pages, Caisse
+from common import referentiel
+from common.utils import Periode, lire_date
 # from common.decorators import admin_required  # si besoin
 
 # -------------------- Constantes --------------------
 BAD_SALE_STATUSES = ["Annulée", "Supprimée", "Reportée"]
 
 # -------------------- Helpers --------------------
-def _date_range_from_request(request):
+def _periode_from_request(request):
     """
-    period ∈ {jour | semaine | mois | annee | personnalise}
+    period ∈ {jour | semaine | mois | annee | glissant | personnalise}
+    jours=N (si period=glissant, 30 par défaut)
     date_from=YYYY-MM-DD, date_to=YYYY-MM-DD (si period=personnalise)
+    Retourne (Periode demi-ouverte, period).
     """
     period = request.GET.get("period", "mois")
-    tznow = timezone.localtime()
-    today = tznow.date()
+    today = timezone.localdate()
 
     if period == "jour":
-        start, end = today, today
-
+        periode = Periode.jour(today)
     elif period == "semaine":
-        start = today - timedelta(days=today.weekday())  # lundi
-        end = start + timedelta(days=6)
-
-    elif period == "mois":
-        start = today.replace(day=1)
-        if start.month == 12:
-            end = start.replace(year=start.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            end = start.replace(month=start.month + 1, day=1) - timedelta(days=1)
-
+        periode = Periode.semaine(today)  # lundi -> dimanche
     elif period == "annee":
-        start = today.replace(month=1, day=1)
-        end = start.replace(year=start.year + 1, month=1, day=1) - timedelta(days=1)
-
-    else:  # personnalisé
-        try:
-            start = timezone.datetime.fromisoformat(request.GET.get("date_from")).date()
-            end = timezone.datetime.fromisoformat(request.GET.get("date_to")).date()
-        except Exception:
-            # fallback: mois courant
-            start = today.replace(day=1)
-            if start.month == 12:
-                end = start.replace(year=start.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                end = start.replace(month=start.month + 1, day=1) - timedelta(days=1)
+        periode = Periode.annee(today.year)
+    elif period == "glissant":
+        jours = _optional_int(request.GET.get("jours")) or 30
+        periode = Periode.glissante(jours, today)
+    elif period == "personnalise":
+        debut = lire_date(request.GET.get("date_from"))
+        fin = lire_date(request.GET.get("date_to"))
+        # fallback: mois courant (dates absentes ou invalides)
+        periode = Periode.entre(debut, fin) if debut and fin else Periode.mois(today.year, today.month)
+    else:
+        periode = Periode.mois(today.year, today.month)
 
-    return start, end, period
+    return periode, period
 
 
 def _optional_int(value):
@@ -65,32 +53,29 @@ def _optional_int(value):
 
 # -------------------- Core Query --------------------
 def _query_dashboard_data(request):
-    start, end, period = _date_range_from_request(request)
+    periode, period = _periode_from_request(request)
+    start, end = periode.debut, periode.dernier_jour
     page_id = _optional_int(request.GET.get("page"))
     caisse_id = _optional_int(request.GET.get("caisse"))
 
     # QuerySets via .actifs (hérités d'AuditMixin)
     ventes_qs = (
-        Vente.actifs.select_related("commande", "paiement")
-        .filter(date_encaissement__range=[start, end])
+        periode.filtrer(Vente.actifs.select_related("commande", "paiement"), "date_encaissement")
         .exclude(commande__statut_vente__in=BAD_SALE_STATUSES)
     )
     commandes_qs = (
-        Commande.actifs.select_related("client", "page")
-        .filter(date_commande__range=[start, end])
+        periode.filtrer(Commande.actifs.select_related("client", "page"), "date_commande")
         .exclude(statut_vente__in=BAD_SALE_STATUSES)
     )
     lignes_qs = (
-        LigneCommande.actifs.select_related("commande", "article")
-        .filter(commande__date_commande__range=[start, end])
+        periode.filtrer(LigneCommande.actifs.select_related("commande", "article"), "commande__date_commande")
         .exclude(commande__statut_vente__in=BAD_SALE_STATUSES)
     )
-    achats_qs = Achat.actifs.filter(date__range=[start, end])
+    achats_qs = periode.filtrer(Achat.actifs.all(), "date")
 
     # ✅ Charges actives uniquement + comptes commençant par 6
-    charges_qs = Charge.actifs.filter(
-        date__range=[start, end],
-        libelle__compte_numero__startswith="6",
+    charges_qs = periode.filtrer(
+        Charge.actifs.filter(libelle__compte_numero__startswith="6"), "date"
     )
 
     # Filtres Page / Caisse
@@ -120,7 +105,7 @@ def _query_dashboard_data(request):
         "ca_jour": ventes_today.aggregate(v=Coalesce(Sum("montant"), 0))["v"],
         "nb_commandes": commandes_qs.count(),
         "nb_commandes_en_attente": commandes_qs.filter(statut_vente="En attente").count(),
-        "achats_periode": achats_qs.aggregate(v=Coalesce(Sum("lignes_achats__montant"), 0))["v"],
+        "achats_periode": achats_qs.aggregate(v=Coalesce(Sum("total"), 0))["v"],
         "charges_periode": charges_qs.aggregate(v=Coalesce(Sum("montant"), 0))["v"],
     }
 
@@ -196,8 +181,8 @@ def _query_dashboard_data(request):
         "period": period,
         "selected_page": page_id,
         "selected_caisse": caisse_id,
-        "pages": Pages.actifs.all().order_by("nom"),
-        "caisses": Caisse.actifs.all().order_by("nom"),
+        "pages": sorted(referentiel.pages(), key=lambda p: p.nom),
+        "caisses": sorted(referentiel.caisses(), key=lambda c: c.nom),
 
         "kpi": kpi,
         "marge_brute": marge_brute,
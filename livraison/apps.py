@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LivraisonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'livraison'
+
+    def ready(self):
+        import livraison.signals
@@ -0,0 +1,96 @@
+# livraison/fiches.py
+"""
+Fiches de livraison et de suivi de tous les livreurs d'une date.
+
+Les commandes du jour sont lues en une requête annotée (total de chaque
+commande calculé en SQL, client/lieu/livreur joints, lignes préchargées)
+puis regroupées par livreur. Totaux par livreur en SQL : GROUP BY livreur
+pour la fiche de livraison, compte du livreur (livraison.soldes) pour la
+fiche de suivi.
+"""
+from collections import defaultdict
+from itertools import groupby
+
+from django.db.models import ExpressionWrapper, F, IntegerField, Sum, Value
+from django.db.models.functions import Coalesce
+
+from ventes.models import Commande, LigneCommande
+from .models import SoldeLivreurJournalier
+from .soldes import soldes_au
+
+
+def commandes_du_jour(jour, suivi=False, livreur_ids=None):
+    """Commandes de la fiche : planifiées (livraison) ou toutes sauf supprimées (suivi)."""
+    commandes = Commande.objects.filter(livreur__isnull=False, date_livraison=jour)
+    if suivi:
+        commandes = commandes.exclude(statut_livraison="Supprimée")
+    else:
+        commandes = commandes.filter(statut_livraison="Planifiée")
+    if livreur_ids:
+        commandes = commandes.filter(livreur_id__in=livreur_ids)
+    return commandes
+
+
+def _totaux_planifies(commandes):
+    """{livreur_id: total à encaisser} en deux GROUP BY (lignes, frais de livraison)."""
+    totaux = defaultdict(int)
+    for livreur_id, frais in commandes.order_by().values_list("livreur_id").annotate(f=Sum("frais_livraison")):
+        totaux[livreur_id] += frais or 0
+    for livreur_id, montant in (
+        LigneCommande.objects.filter(commande__in=commandes)
+        .order_by().values_list("commande__livreur_id")
+        .annotate(m=Sum(F("quantite") * F("prix_unitaire")))
+    ):
+        totaux[livreur_id] += montant or 0
+    return totaux
+
+
+def fiches(jour, suivi=False, livreur_ids=None):
+    """
+    Une fiche par livreur ayant des commandes le `jour` :
+    [{"livreur", "commandes", "total_general", "total_frais_livreur",
+      "reste_versement", "solde_livreur"}] (les trois derniers pour le suivi).
+    """
+    commandes = commandes_du_jour(jour, suivi, livreur_ids)
+    liste = (
+        commandes.annotate(
+            montant_commande_anno=Coalesce(
+                Sum(F("lignes_commandes__prix_unitaire") * F("lignes_commandes__quantite")),
+                Value(0),
+            ),
+            total_commande_anno=ExpressionWrapper(
+                F("montant_commande_anno") + Coalesce(F("frais_livraison"), Value(0)),
+                output_field=IntegerField(),
+            ),
+        )
+        .select_related("client__lieu", "livreur")
+        .prefetch_related("lignes_commandes__article")
+        .order_by("livreur__nom", "livreur_id", "id")
+    )
+
+    resultat = []
+    for _, groupe in groupby(liste, key=lambda c: c.livreur_id):
+        groupe = list(groupe)
+        resultat.append({"livreur": groupe[0].livreur, "commandes": groupe})
+    if not resultat:
+        return resultat
+
+    livreur_ids = [fiche["livreur"].pk for fiche in resultat]
+    if suivi:
+        # Hors annulées, reportées, supprimées ; frais du jour en entier, réglés ou non
+        comptes = {
+            ligne.livreur_id: ligne
+            for ligne in SoldeLivreurJournalier.objects.filter(date=jour, livreur_id__in=livreur_ids)
+        }
+        soldes = dict(soldes_au(jour).filter(pk__in=livreur_ids).values_list("pk", "solde"))
+        for fiche in resultat:
+            compte = comptes.get(fiche["livreur"].pk)
+            fiche["total_general"] = compte.montant if compte else 0
+            fiche["total_frais_livreur"] = compte.frais if compte else 0
+            fiche["reste_versement"] = fiche["total_general"] - fiche["total_frais_livreur"]
+            fiche["solde_livreur"] = soldes.get(fiche["livreur"].pk) or 0
+    else:
+        totaux = _totaux_planifies(commandes)
+        for fiche in resultat:
+            fiche["total_general"] = totaux.get(fiche["livreur"].pk, 0)
+    return resultat
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+import pandas as pd
+from livraison.models import Livraison, Voisinage
+
+class Command(BaseCommand):
+    help = "Importe la table des lieux voisins (colonnes : lieu, voisin) depuis un fichier Excel"
+
+    def add_arguments(self, parser):
+        parser.add_argument("excel_file", type=str, help="Chemin vers le fichier Excel")
+
+    def handle(self, *args, **kwargs):
+        df = pd.read_excel(kwargs['excel_file'])
+        df.columns = df.columns.str.strip().str.lower()  # nettoie les noms de colonnes
+
+        lieux = {nom.strip().lower(): pk for pk, nom in Livraison.objects.values_list("pk", "lieu")}
+        couples = set()
+        for index, row in df.iterrows():
+            lieu = lieux.get(str(row['lieu']).strip().lower())
+            voisin = lieux.get(str(row['voisin']).strip().lower())
+            if lieu is None or voisin is None:
+                self.stderr.write(f"Lieu inconnu à la ligne {index + 2} : {row['lieu']} / {row['voisin']}")
+                continue
+            if lieu != voisin:
+                couples |= {(lieu, voisin), (voisin, lieu)}
+
+        Voisinage.objects.bulk_create(
+            [Voisinage(lieu_id=lieu, voisin_id=voisin) for lieu, voisin in couples],
+            ignore_conflicts=True,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Importation des voisinages terminée ({len(couples) // 2} couple(s))."))
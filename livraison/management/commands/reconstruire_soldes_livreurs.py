@@ -0,0 +1,12 @@
+# livraison/management/commands/reconstruire_soldes_livreurs.py
+from django.core.management.base import BaseCommand
+
+from livraison.soldes import reconstruire_soldes
+
+
+class Command(BaseCommand):
+    help = "Recalcule le compte journalier de chaque livreur à partir des commandes et des ventes."
+
+    def handle(self, *args, **options):
+        total = reconstruire_soldes()
+        self.stdout.write(self.style.SUCCESS(f"{total} ligne(s) de compte livreur recalculée(s)."))
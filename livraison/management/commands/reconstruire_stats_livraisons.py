@@ -0,0 +1,12 @@
+# livraison/management/commands/reconstruire_stats_livraisons.py
+from django.core.management.base import BaseCommand
+
+from livraison.performances import reconstruire_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques journalières des livraisons à partir des commandes."
+
+    def handle(self, *args, **options):
+        total = reconstruire_stats()
+        self.stdout.write(self.style.SUCCESS(f"{total} jour(s) de livraison recalculé(s)."))
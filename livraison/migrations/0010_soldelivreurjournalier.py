@@ -0,0 +1,88 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:36
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+import django.db.models.deletion
+
+
+def remplir_soldes(apps, schema_editor):
+    # Comptes des livreurs depuis l'origine : par jour, montant livré - frais
+    # - versé + frais réglés, puis solde cumulé
+    Commande = apps.get_model("ventes", "Commande")
+    LigneCommande = apps.get_model("ventes", "LigneCommande")
+    Solde = apps.get_model("livraison", "SoldeLivreurJournalier")
+    Vente = apps.get_model("ventes", "Vente")
+    commandes = (
+        Commande._base_manager.filter(livreur__isnull=False, date_livraison__isnull=False)
+        .exclude(statut_livraison__in=["Annulée", "Reportée", "Supprimée"])
+        .exclude(statut_publication="supprimé")
+    )
+    jours = defaultdict(lambda: [0, 0, 0, 0])
+    for livreur_id, jour, frais_livraison, frais in (
+        commandes.order_by().values_list("livreur_id", "date_livraison")
+        .annotate(fl=Sum("frais_livraison"), fr=Sum("frais_livreur"))
+    ):
+        jours[livreur_id, jour][0] += frais_livraison or 0
+        jours[livreur_id, jour][1] += frais or 0
+    for livreur_id, jour, montant in (
+        LigneCommande._base_manager.filter(commande__in=commandes).order_by()
+        .values_list("commande__livreur_id", "commande__date_livraison")
+        .annotate(m=Sum(F("quantite") * F("prix_unitaire")))
+    ):
+        jours[livreur_id, jour][0] += montant or 0
+    for livreur_id, jour, verse in (
+        Vente._base_manager.filter(commande__livreur__isnull=False).exclude(statut_publication="supprimé")
+        .order_by().values_list("commande__livreur_id", "date_encaissement").annotate(v=Sum("montant"))
+    ):
+        jours[livreur_id, jour][2] += verse or 0
+    for livreur_id, jour, regle in (
+        commandes.filter(paiement_frais_livreur="Payée", date_paiement_frais_livreur__isnull=False)
+        .order_by().values_list("livreur_id", "date_paiement_frais_livreur").annotate(r=Sum("frais_livreur"))
+    ):
+        jours[livreur_id, jour][3] += regle or 0
+
+    soldes = defaultdict(int)
+    lignes = []
+    for (livreur_id, jour), (montant, frais, verse, regle) in sorted(jours.items()):
+        if not (montant or frais or verse or regle):
+            continue
+        soldes[livreur_id] += montant - frais - verse + regle
+        lignes.append(Solde(
+            livreur_id=livreur_id, date=jour, montant=montant, frais=frais, verse=verse, regle=regle,
+            solde=soldes[livreur_id],
+        ))
+    Solde.objects.bulk_create(lignes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livraison', '0009_fill_frais_defaults'),
+        ('ventes', '0039_commande_date_paiement_frais_livreur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoldeLivreurJournalier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('montant', models.BigIntegerField(default=0)),
+                ('frais', models.BigIntegerField(default=0)),
+                ('verse', models.BigIntegerField(default=0)),
+                ('regle', models.BigIntegerField(default=0)),
+                ('solde', models.BigIntegerField(default=0)),
+                ('livreur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soldes_journaliers', to='livraison.livreur')),
+            ],
+            options={
+                'ordering': ['livreur', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='soldelivreurjournalier',
+            constraint=models.UniqueConstraint(fields=('livreur', 'date'), name='livreur_solde_jour_unique'),
+        ),
+        migrations.RunPython(remplir_soldes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livraison', '0010_soldelivreurjournalier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Voisinage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lieu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='voisinages', to='livraison.livraison')),
+                ('voisin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='livraison.livraison')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='voisinage',
+            constraint=models.UniqueConstraint(fields=('lieu', 'voisin'), name='voisinage_unique'),
+        ),
+    ]
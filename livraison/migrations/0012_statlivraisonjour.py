@@ -0,0 +1,73 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:44
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+import django.db.models.deletion
+
+
+def remplir_stats(apps, schema_editor):
+    # Un GROUP BY (jour, lieu, catégorie, livreur) sur les commandes datées
+    Commande = apps.get_model("ventes", "Commande")
+    StatLivraisonJour = apps.get_model("livraison", "StatLivraisonJour")
+    livree = Q(statut_livraison="Livrée")
+    lignes = (
+        Commande._base_manager.filter(date_livraison__isnull=False)
+        .exclude(statut_livraison="Supprimée").exclude(statut_publication="supprimé")
+        .order_by()
+        .values_list("date_livraison", "client__lieu_id", "client__lieu__categorie", "livreur_id")
+        .annotate(
+            n=Count("pk"),
+            livrees=Count("pk", filter=livree),
+            reportees=Count("pk", filter=Q(statut_livraison="Reportée")),
+            annulees=Count("pk", filter=Q(statut_livraison="Annulée")),
+            fl=Sum("frais_livraison", filter=livree),
+            fr=Sum("frais_livreur", filter=livree),
+        )
+    )
+    StatLivraisonJour.objects.bulk_create(
+        [
+            StatLivraisonJour(
+                date=jour, lieu_id=lieu_id, categorie=categorie or "", livreur_id=livreur_id,
+                commandes=n, livrees=livrees, reportees=reportees, annulees=annulees,
+                frais_livraison=fl or 0, frais_livreur=fr or 0,
+            )
+            for jour, lieu_id, categorie, livreur_id, n, livrees, reportees, annulees, fl, fr in lignes
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0010_client_reference_client'),
+        ('livraison', '0011_voisinage'),
+        ('ventes', '0040_commandestatutevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatLivraisonJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('categorie', models.CharField(blank=True, max_length=20)),
+                ('commandes', models.PositiveIntegerField(default=0)),
+                ('livrees', models.PositiveIntegerField(default=0)),
+                ('reportees', models.PositiveIntegerField(default=0)),
+                ('annulees', models.PositiveIntegerField(default=0)),
+                ('frais_livraison', models.BigIntegerField(default=0)),
+                ('frais_livreur', models.BigIntegerField(default=0)),
+                ('lieu', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stats_jours', to='livraison.livraison')),
+                ('livreur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stats_jours', to='livraison.livreur')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statlivraisonjour',
+            constraint=models.UniqueConstraint(fields=('date', 'lieu', 'categorie', 'livreur'), name='stat_livraison_jour_unique'),
+        ),
+        migrations.RunPython(remplir_stats, migrations.RunPython.noop),
+    ]
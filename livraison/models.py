@@ -52,3 +52,81 @@ class Livraison(AuditMixin):
 
     def __str__(self):
         return f"{self.lieu} - {self.categorie}"
+
+
+class Voisinage(models.Model):
+    """
+    Lieux de livraison voisins (table pré-calculée, importée par
+    `import_voisinages`) : la planification automatique regroupe les
+    commandes de lieux voisins de même catégorie sur un même livreur.
+    Enregistrée dans les deux sens.
+    """
+    lieu = models.ForeignKey(Livraison, on_delete=models.CASCADE, related_name="voisinages")
+    voisin = models.ForeignKey(Livraison, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["lieu", "voisin"], name="voisinage_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.lieu} ↔ {self.voisin}"
+
+
+class SoldeLivreurJournalier(models.Model):
+    """
+    Compte d'un livreur, une ligne par jour mouvementé : montant encaissé à
+    la livraison, frais livreur des livraisons du jour, encaissements de
+    vente reversés, frais réglés par la caisse ce jour-là et solde cumulé
+    (> 0 : le livreur nous doit). Dérivé des commandes et ventes, tenu à
+    jour par livraison.soldes.
+    """
+    livreur = models.ForeignKey(Livreur, on_delete=models.CASCADE, related_name="soldes_journaliers")
+    date = models.DateField()
+    montant = models.BigIntegerField(default=0)
+    frais = models.BigIntegerField(default=0)
+    verse = models.BigIntegerField(default=0)
+    regle = models.BigIntegerField(default=0)
+    solde = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["livreur", "date"]
+        constraints = [
+            models.UniqueConstraint(fields=["livreur", "date"], name="livreur_solde_jour_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.livreur} {self.date} : {self.solde}"
+
+    @property
+    def mouvement(self):
+        return self.montant - self.frais - self.verse + self.regle
+
+
+class StatLivraisonJour(models.Model):
+    """
+    Agrégat journalier des livraisons par (date de livraison, lieu,
+    catégorie, livreur) : volume, issues et frais des commandes livrées.
+    Tenu à jour par livraison.performances ; l'onglet « Livraisons » des
+    statistiques ne lit que cette table.
+    """
+    date = models.DateField()
+    lieu = models.ForeignKey(Livraison, null=True, blank=True, on_delete=models.CASCADE, related_name="stats_jours")
+    categorie = models.CharField(max_length=20, blank=True)
+    livreur = models.ForeignKey(Livreur, null=True, blank=True, on_delete=models.CASCADE, related_name="stats_jours")
+    commandes = models.PositiveIntegerField(default=0)
+    livrees = models.PositiveIntegerField(default=0)
+    reportees = models.PositiveIntegerField(default=0)
+    annulees = models.PositiveIntegerField(default=0)
+    # Sur les commandes livrées
+    frais_livraison = models.BigIntegerField(default=0)
+    frais_livreur = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "lieu", "categorie", "livreur"], name="stat_livraison_jour_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.lieu} {self.livreur} : {self.livrees}/{self.commandes}"
@@ -0,0 +1,175 @@
+# livraison/performances.py
+"""
+Performances des livraisons (StatLivraisonJour).
+
+Une ligne par (date de livraison, lieu, catégorie du lieu, livreur) :
+commandes, livrées, reportées, annulées, frais de livraison facturés et
+frais livreur des commandes livrées. Un jour touché est recalculé en
+entier (un GROUP BY sur les commandes du jour) ; les rapports sommeront
+ensuite quelques centaines de lignes au lieu de joindre commandes et
+clients.
+"""
+from contextlib import contextmanager
+from datetime import date
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from common import referentiel
+from common.backfill import DEFAULT_BATCH_SIZE
+from common.utils import filtrer_periode
+from .models import FRAIS_LIVRAISON_PAR_DEFAUT, FRAIS_LIVREUR_PAR_DEFAUT, StatLivraisonJour
+
+LIVREE = Q(statut_livraison="Livrée")
+
+
+def commandes_suivies():
+    Commande = global_apps.get_model("ventes", "Commande")
+    return (
+        Commande._base_manager.filter(date_livraison__isnull=False)
+        .exclude(statut_livraison="Supprimée")
+        .exclude(statut_publication="supprimé")
+    )
+
+
+def _lignes(dates):
+    Stat = global_apps.get_model("livraison", "StatLivraisonJour")
+    return [
+        Stat(
+            date=jour, lieu_id=lieu_id, categorie=categorie or "", livreur_id=livreur_id,
+            commandes=commandes, livrees=livrees, reportees=reportees, annulees=annulees,
+            frais_livraison=frais_livraison or 0, frais_livreur=frais_livreur or 0,
+        )
+        for jour, lieu_id, categorie, livreur_id, commandes, livrees, reportees, annulees, frais_livraison, frais_livreur in (
+            commandes_suivies().filter(date_livraison__in=dates)
+            .order_by()
+            .values_list("date_livraison", "client__lieu_id", "client__lieu__categorie", "livreur_id")
+            .annotate(
+                n=Count("pk"),
+                livrees=Count("pk", filter=LIVREE),
+                reportees=Count("pk", filter=Q(statut_livraison="Reportée")),
+                annulees=Count("pk", filter=Q(statut_livraison="Annulée")),
+                fl=Sum("frais_livraison", filter=LIVREE),
+                fr=Sum("frais_livreur", filter=LIVREE),
+            )
+        )
+    ]
+
+
+@transaction.atomic
+def maj_stats(dates):
+    """Recalcule entièrement les jours `dates`."""
+    dates = {d for d in dates if d}
+    if not dates:
+        return
+    Stat = global_apps.get_model("livraison", "StatLivraisonJour")
+    Stat.objects.filter(date__in=dates).delete()
+    Stat.objects.bulk_create(_lignes(dates), batch_size=DEFAULT_BATCH_SIZE)
+
+
+def dates_commandes(commande_ids):
+    Commande = global_apps.get_model("ventes", "Commande")
+    return set(
+        Commande._base_manager.filter(pk__in=list(commande_ids), date_livraison__isnull=False)
+        .values_list("date_livraison", flat=True)
+    )
+
+
+@contextmanager
+def suivi_stats(commande_ids):
+    """Pour les écritures en masse sur des commandes : recalcule leurs jours d'avant et d'après."""
+    commande_ids = list(commande_ids)
+    avant = dates_commandes(commande_ids)
+    yield
+    maj_stats(avant | dates_commandes(commande_ids))
+
+
+def reconstruire_stats(batch_size=200):
+    """Recalcule tous les jours ayant des livraisons, par paquets de `batch_size` jours."""
+    dates = sorted(commandes_suivies().order_by().values_list("date_livraison", flat=True).distinct())
+    global_apps.get_model("livraison", "StatLivraisonJour").objects.all().delete()
+    for i in range(0, len(dates), batch_size):
+        maj_stats(dates[i:i + batch_size])
+    return len(dates)
+
+
+# Axes du rapport -> expression de regroupement
+AXES = {
+    "categorie": F("categorie"),
+    "lieu": F("lieu_id"),
+    "livreur": F("livreur_id"),
+    "mois": TruncMonth("date"),
+}
+
+AXES_CHOIX = [
+    ("categorie", "Catégorie"),
+    ("lieu", "Lieu"),
+    ("livreur", "Livreur"),
+    ("mois", "Mois"),
+]
+
+
+def _libelles(axe, cles):
+    if axe == "lieu":
+        return {lieu.pk: f"{lieu.lieu} ({lieu.categorie})" for lieu in referentiel.lieux()}
+    if axe == "livreur":
+        return {livreur.pk: livreur.nom for livreur in referentiel.livreurs()}
+    if axe == "mois":
+        return {cle: f"{cle:%m/%Y}" for cle in cles if cle}
+    return {cle: cle for cle in cles if cle}
+
+
+def marges_par_defaut():
+    """{categorie: frais de livraison - frais livreur} des barèmes par défaut."""
+    return {
+        categorie: FRAIS_LIVRAISON_PAR_DEFAUT.get(categorie, 0) - FRAIS_LIVREUR_PAR_DEFAUT.get(categorie, 0)
+        for categorie in FRAIS_LIVRAISON_PAR_DEFAUT
+    }
+
+
+def performances(periode, axe="categorie"):
+    """
+    Indicateurs des livraisons sur la `periode` (common.utils.Periode),
+    regroupés par `axe` (voir AXES), en un GROUP BY sur StatLivraisonJour :
+    [{"cle", "libelle", "commandes", "livrees", "reportees", "annulees",
+      "frais_livraison", "frais_livreur", "marge", "taux_livraison",
+      "taux_report", "marge_moyenne"}] ; par catégorie, "marge_bareme" est la
+    marge des barèmes par défaut, pour repérer ceux qui perdent de l'argent.
+    """
+    axe = axe if axe in AXES else "categorie"
+    lignes = []
+    for cle, commandes, livrees, reportees, annulees, frais_livraison, frais_livreur in (
+        filtrer_periode(StatLivraisonJour.objects.all(), "date", periode.debut, periode.fin)
+        .order_by()
+        .annotate(cle=AXES[axe])
+        .values_list("cle")
+        .annotate(
+            Sum("commandes"), Sum("livrees"), Sum("reportees"), Sum("annulees"),
+            Sum("frais_livraison"), Sum("frais_livreur"),
+        )
+    ):
+        marge = (frais_livraison or 0) - (frais_livreur or 0)
+        lignes.append({
+            "cle": cle,
+            "commandes": commandes,
+            "livrees": livrees,
+            "reportees": reportees,
+            "annulees": annulees,
+            "frais_livraison": frais_livraison or 0,
+            "frais_livreur": frais_livreur or 0,
+            "marge": marge,
+            "taux_livraison": livrees / commandes if commandes else 0,
+            "taux_report": reportees / commandes if commandes else 0,
+            "marge_moyenne": round(marge / livrees) if livrees else 0,
+        })
+
+    libelles = _libelles(axe, [l["cle"] for l in lignes if l["cle"] is not None])
+    baremes = marges_par_defaut() if axe == "categorie" else {}
+    for ligne in lignes:
+        ligne["libelle"] = libelles.get(ligne["cle"])
+        ligne["marge_bareme"] = baremes.get(ligne["cle"])
+    if axe == "mois":
+        return sorted(lignes, key=lambda l: l["cle"] or date.min)
+    return sorted(lignes, key=lambda l: -l["commandes"])
@@ -0,0 +1,143 @@
+# livraison/planification.py
+"""
+Planification automatique des livraisons d'une date.
+
+Les commandes « En attente » du jour sont lues en une requête (lieu,
+catégorie et frais livreur du lieu joints) puis regroupées en zones :
+lieux voisins (table Voisinage, lue en une requête) de même catégorie.
+Les zones, des plus chères (frais livreur moyen) aux moins chères, vont
+au livreur disponible qui :
+  1. coûte le moins (employé : pas de frais ; prestataire : frais
+     livreur du lieu, FRAIS_LIVREUR_PAR_DEFAUT à défaut de lieu) ;
+  2. peut prendre la zone entière (sinon elle est partagée) ;
+  3. livre déjà une zone voisine ;
+  4. est le moins chargé.
+Chaque livreur prend au plus `capacite` commandes ; le surplus reste à
+planifier à la main. Tout se fait en mémoire en une passe : le plan est
+proposé, `appliquer_plan` l'enregistre.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+
+from common import referentiel
+
+from ventes.models import Commande
+from ventes.suivi import suivi_commandes_en_masse
+from .models import FRAIS_LIVREUR_PAR_DEFAUT, Voisinage
+
+CAPACITE_LIVREUR = getattr(settings, "LIVRAISON_CAPACITE_LIVREUR", 20)
+
+
+def voisinages(lieu_ids):
+    """{lieu_id: {lieux voisins}} restreint aux `lieu_ids`."""
+    voisins = defaultdict(set)
+    for lieu_id, voisin_id in Voisinage.objects.filter(
+        lieu_id__in=lieu_ids, voisin_id__in=lieu_ids,
+    ).values_list("lieu_id", "voisin_id"):
+        voisins[lieu_id].add(voisin_id)
+        voisins[voisin_id].add(lieu_id)
+    return voisins
+
+
+def _zones(commandes, voisins):
+    """Regroupe les commandes par composantes de lieux voisins de même catégorie."""
+    parent = {}
+
+    def racine(lieu_id):
+        while parent.setdefault(lieu_id, lieu_id) != lieu_id:
+            parent[lieu_id] = parent[parent[lieu_id]]
+            lieu_id = parent[lieu_id]
+        return lieu_id
+
+    categories = {c["lieu_id"]: c["categorie"] for c in commandes}
+    for lieu_id, autres in voisins.items():
+        for voisin_id in autres:
+            if categories.get(lieu_id) == categories.get(voisin_id):
+                parent[racine(lieu_id)] = racine(voisin_id)
+
+    zones = defaultdict(list)
+    for commande in commandes:
+        lieu_id = commande["lieu_id"]
+        zones[racine(lieu_id) if lieu_id is not None else None].append(commande)
+    # Zones les plus chères d'abord : les employés (sans frais) les prennent en premier
+    return sorted(zones.values(), key=lambda z: (sum(c["frais"] for c in z) / len(z), len(z)), reverse=True)
+
+
+def commandes_a_planifier(jour):
+    """Commandes « En attente » du `jour`, avec lieu, catégorie et frais livreur du lieu."""
+    commandes = []
+    for pk, lieu_id, categorie, frais_lieu in (
+        Commande.objects.filter(date_livraison=jour, statut_livraison="En attente")
+        .order_by("id")
+        .values_list("pk", "client__lieu_id", "client__lieu__categorie", "client__lieu__frais_livreur")
+    ):
+        frais = frais_lieu if frais_lieu is not None else FRAIS_LIVREUR_PAR_DEFAUT.get(categorie, 0)
+        commandes.append({"pk": pk, "lieu_id": lieu_id, "categorie": categorie, "frais": frais})
+    return commandes
+
+
+def planifier(jour, livreurs=None, capacite=CAPACITE_LIVREUR):
+    """
+    Propose une affectation des commandes « En attente » du `jour` aux
+    `livreurs` (tous les actifs par défaut). Retourne (affectations, reste) :
+    affectations = [{"livreur", "commandes": [pk], "lieux": {lieu_id}, "cout"}],
+    une par livreur servi ; reste = [pk] des commandes au-delà des capacités.
+    """
+    livreurs = list(referentiel.livreurs(actifs=True) if livreurs is None else livreurs)
+    commandes = commandes_a_planifier(jour)
+    voisins = voisinages({c["lieu_id"] for c in commandes if c["lieu_id"] is not None})
+
+    plan = {l.pk: {"livreur": l, "commandes": [], "lieux": set(), "cout": 0} for l in livreurs}
+    reste = []
+
+    def cout(livreur, part):
+        return 0 if livreur.type == "Employé" else sum(c["frais"] for c in part)
+
+    for zone in _zones(commandes, voisins):
+        lieux = {c["lieu_id"] for c in zone}
+        proches = lieux | {v for lieu_id in lieux for v in voisins.get(lieu_id, ())}
+        restantes = zone
+        while restantes:
+            candidats = [l for l in livreurs if len(plan[l.pk]["commandes"]) < capacite]
+            if not candidats:
+                reste.extend(c["pk"] for c in restantes)
+                break
+
+            def cle(livreur):
+                affecte = plan[livreur.pk]
+                place = capacite - len(affecte["commandes"])
+                return (
+                    cout(livreur, restantes[:place]) / min(place, len(restantes)),
+                    place < len(restantes),
+                    not (affecte["lieux"] & proches),
+                    len(affecte["commandes"]),
+                )
+
+            livreur = min(candidats, key=cle)
+            affecte = plan[livreur.pk]
+            place = capacite - len(affecte["commandes"])
+            part, restantes = restantes[:place], restantes[place:]
+            affecte["commandes"].extend(c["pk"] for c in part)
+            affecte["lieux"].update(c["lieu_id"] for c in part)
+            affecte["cout"] += cout(livreur, part)
+
+    return [a for a in plan.values() if a["commandes"]], reste
+
+
+def appliquer_plan(jour, affectations, user=None):
+    """
+    Enregistre `affectations` {livreur: [commande_id]} pour le `jour` : une
+    mise à jour par livreur, limitée aux commandes encore « En attente ».
+    Comme l'affectation manuelle, un employé ne touche pas de frais livreur.
+    Retourne le nombre de commandes planifiées.
+    """
+    commande_ids = [pk for ids in affectations.values() for pk in ids]
+    total = 0
+    with suivi_commandes_en_masse(commande_ids, user):  # update() sans signal
+        for livreur, ids in affectations.items():
+            champs = {"livreur": livreur, "date_livraison": jour, "statut_livraison": "Planifiée"}
+            if livreur.type == "Employé":
+                champs.update(frais_livreur=0, paiement_frais_livreur="N/A")
+            total += Commande.objects.filter(pk__in=ids, statut_livraison="En attente").update(**champs)
+    return total
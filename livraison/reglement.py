@@ -0,0 +1,81 @@
+# livraison/reglement.py
+"""
+Règlement des frais livreur.
+
+La sélection est lue en une requête (livreur et page joints), les frais
+sont regroupés par (livreur, page) : une Charge par groupe, comme le
+paiement réel remis au livreur, au lieu d'une par commande. Les commandes
+passent ensuite à « Payée » en un seul UPDATE.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from charges.models import Charge
+from common import referentiel
+from common.models import PlanDesComptes
+from ventes.models import Commande
+from ventes.suivi import suivi_commandes_en_masse
+
+COMPTE_FRAIS_LIVREUR = 10  # PlanDesComptes : Service de livraison (Frais livreur)
+LONGUEUR_REMARQUE = Charge._meta.get_field("remarque").max_length
+
+
+def total_frais(commandes):
+    """Somme des frais livreur d'un queryset de commandes (un SUM SQL)."""
+    return commandes.aggregate(total=Sum("frais_livreur"))["total"] or 0
+
+
+def _remarque(livreur, numeros):
+    texte = f"{livreur.nom if livreur else 'Sans livreur'} ({', '.join(numeros)})"
+    if len(texte) > LONGUEUR_REMARQUE:
+        texte = texte[:LONGUEUR_REMARQUE - 1] + "…"
+    return texte
+
+
+@transaction.atomic
+def regler_frais_livreurs(commande_ids, caisse, date_paiement, compte=None, user=None):
+    """
+    Règle les frais livreur des commandes `commande_ids` non encore payées
+    (frais > 0) depuis `caisse`. Retourne (charges créées, commandes réglées).
+    """
+    compte = compte or referentiel.compte(COMPTE_FRAIS_LIVREUR)
+    if compte is None:
+        raise PlanDesComptes.DoesNotExist(f"Compte de charge {COMPTE_FRAIS_LIVREUR} (frais livreur) introuvable.")
+    commandes = (
+        Commande.objects.select_for_update()
+        .filter(pk__in=commande_ids, frais_livreur__gt=0)
+        .exclude(paiement_frais_livreur="Payée")
+        .select_related("livreur", "page")
+        .order_by("numero_facture")
+    )
+
+    groupes = defaultdict(list)
+    for commande in commandes:
+        groupes[(commande.livreur, commande.page)].append(commande)
+
+    for (livreur, page), lot in groupes.items():
+        frais = {c.frais_livreur for c in lot}
+        montant = sum(c.frais_livreur for c in lot)
+        # Frais identiques : pu x nombre de livraisons ; sinon un seul montant
+        pu, quantite = (frais.pop(), len(lot)) if len(frais) == 1 else (montant, 1)
+        Charge.objects.create(
+            date=date_paiement,
+            libelle=compte,
+            pu=pu,
+            quantite=quantite,
+            montant=montant,
+            remarque=_remarque(livreur, [c.numero_facture for c in lot]),
+            paiement=caisse,
+            page=page,
+            created_by=user,
+        )
+
+    reglees = [c.pk for lot in groupes.values() for c in lot]
+    # update() sans signal : le règlement entre au compte des livreurs au jour du paiement
+    with suivi_commandes_en_masse(reglees, user):
+        Commande.objects.filter(pk__in=reglees).update(
+            paiement_frais_livreur="Payée", date_paiement_frais_livreur=date_paiement,
+        )
+    return len(groupes), len(reglees)
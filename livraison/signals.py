@@ -0,0 +1,113 @@
+# livraison/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from clients.models import Client
+from ventes.models import Commande, LigneCommande, Vente
+from .models import Livraison
+from .performances import commandes_suivies, dates_commandes, maj_stats
+from .soldes import jours_commandes, maj_soldes
+
+# Champs de la commande qui entrent dans le compte du livreur
+CHAMPS_COMMANDE = {
+    "livreur", "livreur_id", "date_livraison", "statut_livraison", "statut_publication",
+    "frais_livraison", "frais_livreur", "paiement_frais_livreur", "date_paiement_frais_livreur",
+}
+
+
+def _commande_id(sender, instance):
+    return instance.pk if sender is Commande else instance.commande_id
+
+
+def noter_jours(sender, instance, update_fields=None, **kwargs):
+    if sender is Commande and update_fields is not None and not CHAMPS_COMMANDE & set(update_fields):
+        return
+    instance._jours_livreur = jours_commandes([_commande_id(sender, instance)]) if instance.pk else set()
+
+
+def maj_compte_livreur(sender, instance, **kwargs):
+    # Jours d'avant (changement de livreur ou de date) et jours d'après
+    avant = instance.__dict__.pop("_jours_livreur", None)
+    if avant is None:
+        return
+    maj_soldes(avant | jours_commandes([_commande_id(sender, instance)]))
+
+
+for modele in (Commande, LigneCommande, Vente):
+    label = modele._meta.label
+    pre_save.connect(noter_jours, sender=modele, dispatch_uid=f"livreur_avant_save_{label}")
+    post_save.connect(maj_compte_livreur, sender=modele, dispatch_uid=f"livreur_save_{label}")
+    pre_delete.connect(noter_jours, sender=modele, dispatch_uid=f"livreur_avant_delete_{label}")
+    post_delete.connect(maj_compte_livreur, sender=modele, dispatch_uid=f"livreur_delete_{label}")
+
+
+# ---------- Performances des livraisons (StatLivraisonJour) ----------
+
+# Champs de la commande qui entrent dans les statistiques
+CHAMPS_STATS = {
+    "livreur", "livreur_id", "client", "client_id", "date_livraison", "statut_livraison",
+    "statut_publication", "frais_livraison", "frais_livreur",
+}
+# Le lieu du client et la catégorie du lieu aussi : (modèle, champ comparé, filtre des commandes)
+DEPENDANCES_STATS = {
+    Client: ("lieu_id", "client_id"),
+    Livraison: ("categorie", "client__lieu_id"),
+}
+
+
+def noter_dates_commande(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CHAMPS_STATS & set(update_fields):
+        return
+    instance._dates_stats = dates_commandes([instance.pk]) if instance.pk else set()
+
+
+def maj_stats_commande(sender, instance, **kwargs):
+    avant = instance.__dict__.pop("_dates_stats", None)
+    if avant is None:
+        return
+    maj_stats(avant | dates_commandes([instance.pk]))
+
+
+def _dates_dependance(sender, instance):
+    filtre = DEPENDANCES_STATS[sender][1]
+    return set(
+        commandes_suivies().filter(**{filtre: instance.pk})
+        .order_by().values_list("date_livraison", flat=True).distinct()
+    )
+
+
+def noter_dates_dependance(sender, instance, **kwargs):
+    # Seulement si le champ suivi change : les autres modifications d'un client ou d'un lieu n'y touchent pas
+    if not instance.pk:
+        return
+    champ = DEPENDANCES_STATS[sender][0]
+    avant = sender._base_manager.filter(pk=instance.pk).values_list(champ, flat=True).first()
+    if avant != getattr(instance, champ):
+        instance._dates_stats = _dates_dependance(sender, instance)
+
+
+def maj_stats_dependance(sender, instance, **kwargs):
+    dates = instance.__dict__.pop("_dates_stats", None)
+    if dates:
+        maj_stats(dates)
+
+
+for modele, (avant, apres) in {
+    Commande: (noter_dates_commande, maj_stats_commande),
+    Client: (noter_dates_dependance, maj_stats_dependance),
+    Livraison: (noter_dates_dependance, maj_stats_dependance),
+}.items():
+    label = modele._meta.label
+    pre_save.connect(avant, sender=modele, dispatch_uid=f"stats_avant_save_{label}")
+    post_save.connect(apres, sender=modele, dispatch_uid=f"stats_save_{label}")
+
+
+def noter_dates_lieu_supprime(sender, instance, **kwargs):
+    # Les clients passent sans lieu par un UPDATE sans signal
+    instance._dates_stats = _dates_dependance(sender, instance)
+
+
+# Un client supprimé emporte ses commandes, dont les signaux suffisent
+pre_delete.connect(noter_dates_commande, sender=Commande, dispatch_uid="stats_avant_delete_ventes.Commande")
+post_delete.connect(maj_stats_commande, sender=Commande, dispatch_uid="stats_delete_ventes.Commande")
+pre_delete.connect(noter_dates_lieu_supprime, sender=Livraison, dispatch_uid="stats_avant_delete_livraison.Livraison")
+post_delete.connect(maj_stats_dependance, sender=Livraison, dispatch_uid="stats_delete_livraison.Livraison")
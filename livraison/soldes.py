@@ -0,0 +1,211 @@
+# livraison/soldes.py
+"""
+Compte courant des livreurs (SoldeLivreurJournalier).
+
+Par livreur et par jour :
+  montant  total des commandes livrées ce jour-là (hors annulées, reportées,
+           supprimées), frais de livraison compris : l'argent que le
+           livreur encaisse chez les clients ;
+  frais    frais livreur de ces commandes, réglés ou non : ce qu'on lui doit
+           pour ses livraisons du jour (comme la fiche de suivi) ;
+  verse    encaissements de vente des commandes du livreur, au jour de
+           l'encaissement : l'argent remis en caisse ;
+  regle    frais livreur réglés par la caisse (livraison.reglement), au jour
+           du règlement : l'argent qu'on lui a remis.
+Le solde cumulé (montant - frais - verse + regle) est ce que le livreur
+doit encore ; négatif, c'est ce qu'on lui doit. Un règlement ne modifie
+jamais les jours passés : le solde d'un jour donné reste stable.
+
+Tenue incrémentale comme comptabilite.soldes : les jours touchés sont
+recalculés depuis les commandes et ventes, puis le solde des jours
+suivants est décalé d'un seul UPDATE.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+
+from common.utils import filtrer_periode
+from .models import Livreur, SoldeLivreurJournalier
+
+ETATS_HORS_COMPTE = ("Annulée", "Reportée", "Supprimée")
+
+
+def commandes_en_compte():
+    """Commandes qui entrent dans le compte de leur livreur (même règle que la fiche de suivi)."""
+    Commande = global_apps.get_model("ventes", "Commande")
+    return (
+        Commande._base_manager.filter(livreur__isnull=False, date_livraison__isnull=False)
+        .exclude(statut_livraison__in=ETATS_HORS_COMPTE)
+        .exclude(statut_publication="supprimé")
+    )
+
+
+def _mouvements(livreur_id, dates=None):
+    """{date: [montant, frais, verse, regle]} du livreur, en quatre GROUP BY date."""
+    LigneCommande = global_apps.get_model("ventes", "LigneCommande")
+    Vente = global_apps.get_model("ventes", "Vente")
+
+    commandes = commandes_en_compte().filter(livreur_id=livreur_id)
+    reglees = commandes.filter(paiement_frais_livreur="Payée", date_paiement_frais_livreur__isnull=False)
+    ventes = Vente._base_manager.filter(commande__livreur_id=livreur_id).exclude(statut_publication="supprimé")
+    if dates is not None:
+        commandes = commandes.filter(date_livraison__in=dates)
+        reglees = reglees.filter(date_paiement_frais_livreur__in=dates)
+        ventes = ventes.filter(date_encaissement__in=dates)
+
+    jours = defaultdict(lambda: [0, 0, 0, 0])
+    for jour, frais_livraison, frais in (
+        commandes.order_by().values_list("date_livraison")
+        .annotate(fl=Sum("frais_livraison"), fr=Sum("frais_livreur"))
+    ):
+        jours[jour][0] += frais_livraison or 0
+        jours[jour][1] += frais or 0
+    # Comme Commande.total_commande : toutes les lignes de la commande
+    for jour, montant in (
+        LigneCommande._base_manager.filter(commande__in=commandes)
+        .order_by().values_list("commande__date_livraison")
+        .annotate(m=Sum(F("quantite") * F("prix_unitaire")))
+    ):
+        jours[jour][0] += montant or 0
+    for jour, verse in ventes.order_by().values_list("date_encaissement").annotate(v=Sum("montant")):
+        jours[jour][2] += verse or 0
+    for jour, regle in (
+        reglees.order_by().values_list("date_paiement_frais_livreur").annotate(r=Sum("frais_livreur"))
+    ):
+        jours[jour][3] += regle or 0
+    return {jour: valeurs for jour, valeurs in jours.items() if any(valeurs)}
+
+
+def jours_commandes(commande_ids):
+    """{(livreur_id, jour)} où les `commande_ids` comptent en base : livraison, encaissement, règlement des frais."""
+    Commande = global_apps.get_model("ventes", "Commande")
+    Vente = global_apps.get_model("ventes", "Vente")
+
+    commande_ids = list(commande_ids)
+    jours = set()
+    for livreur_id, livraison, reglement in (
+        Commande._base_manager.filter(pk__in=commande_ids, livreur__isnull=False)
+        .values_list("livreur_id", "date_livraison", "date_paiement_frais_livreur")
+    ):
+        jours |= {(livreur_id, livraison), (livreur_id, reglement)}
+    jours |= set(
+        Vente._base_manager.filter(commande_id__in=commande_ids, commande__livreur__isnull=False)
+        .values_list("commande__livreur_id", "date_encaissement")
+    )
+    return jours
+
+
+@transaction.atomic
+def maj_soldes(jours_par_livreur):
+    """`jours_par_livreur` : {livreur_id: {dates touchées}} (ou itérable de couples)."""
+    if not isinstance(jours_par_livreur, dict):
+        regroupes = defaultdict(set)
+        for livreur_id, jour in jours_par_livreur:
+            regroupes[livreur_id].add(jour)
+        jours_par_livreur = regroupes
+
+    for livreur_id, jours in jours_par_livreur.items():
+        jours = {jour for jour in jours if jour}
+        if livreur_id is None or not jours:
+            continue
+        lignes = SoldeLivreurJournalier.objects.filter(livreur_id=livreur_id)
+        nouveaux = _mouvements(livreur_id, jours)
+        anciens = {l.date: l for l in lignes.filter(date__in=jours)}
+
+        for jour in sorted(jours):
+            montant, frais, verse, regle = nouveaux.get(jour, (0, 0, 0, 0))
+            ancien = anciens.get(jour)
+            delta = (montant - frais - verse + regle) - (ancien.mouvement if ancien else 0)
+            if delta:
+                lignes.filter(date__gt=jour).update(solde=F("solde") + delta)
+
+            if not (montant or frais or verse or regle):
+                if ancien:
+                    ancien.delete()
+                continue
+
+            precedent = lignes.filter(date__lt=jour).order_by("-date").values_list("solde", flat=True).first() or 0
+            SoldeLivreurJournalier.objects.update_or_create(
+                livreur_id=livreur_id, date=jour,
+                defaults={
+                    "montant": montant, "frais": frais, "verse": verse, "regle": regle,
+                    "solde": precedent + montant - frais - verse + regle,
+                },
+            )
+
+
+@contextmanager
+def suivi_livreurs(commande_ids):
+    """
+    Pour les écritures en masse sur des commandes (update, bulk_create), qui
+    n'émettent pas de signal : recalcule les jours de livreur touchés par
+    les `commande_ids` avant et après le bloc.
+    """
+    commande_ids = list(commande_ids)
+    avant = jours_commandes(commande_ids)
+    yield
+    maj_soldes(avant | jours_commandes(commande_ids))
+
+
+def reconstruire_soldes(livreur_ids=None):
+    """Recalcule entièrement les comptes livreurs (tous par défaut)."""
+    Solde = global_apps.get_model("livraison", "SoldeLivreurJournalier")
+
+    livreurs = global_apps.get_model("livraison", "Livreur").objects.all()
+    if livreur_ids is not None:
+        livreurs = livreurs.filter(pk__in=livreur_ids)
+
+    total = 0
+    for livreur_id in livreurs.values_list("pk", flat=True):
+        solde = 0
+        lignes = []
+        for jour, (montant, frais, verse, regle) in sorted(_mouvements(livreur_id).items()):
+            solde += montant - frais - verse + regle
+            lignes.append(Solde(
+                livreur_id=livreur_id, date=jour, montant=montant, frais=frais, verse=verse, regle=regle,
+                solde=solde,
+            ))
+        with transaction.atomic():
+            Solde.objects.filter(livreur_id=livreur_id).delete()
+            Solde.objects.bulk_create(lignes, batch_size=1000)
+        total += len(lignes)
+    return total
+
+
+def solde_au(livreur, jour):
+    """Ce que le livreur doit en fin de `jour` : une seule lecture indexée."""
+    solde = (
+        SoldeLivreurJournalier.objects.filter(livreur=livreur, date__lte=jour)
+        .order_by("-date").values_list("solde", flat=True).first()
+    )
+    return solde or 0
+
+
+def soldes_au(jour, livreurs=None):
+    """Livreurs annotés de `solde` au `jour` (dernière ligne antérieure, en une requête)."""
+    livreurs = Livreur.objects.all() if livreurs is None else livreurs
+    derniere = (
+        SoldeLivreurJournalier.objects.filter(livreur=OuterRef("pk"), date__lte=jour)
+        .order_by("-date").values("solde")[:1]
+    )
+    return livreurs.annotate(solde=Subquery(derniere))
+
+
+def releve(livreur, periode):
+    """
+    Relevé du livreur sur la `periode` (common.utils.Periode bornée) :
+    (solde d'ouverture, lignes journalières, totaux {"montant", "frais", "verse", "regle"}).
+    """
+    ouverture = solde_au(livreur, periode.debut - timedelta(days=1))
+    lignes = list(filtrer_periode(
+        SoldeLivreurJournalier.objects.filter(livreur=livreur), "date", periode.debut, periode.fin,
+    ).order_by("date"))
+    totaux = {
+        champ: sum(getattr(ligne, champ) for ligne in lignes)
+        for champ in ("montant", "frais", "verse", "regle")
+    }
+    return ouverture, lignes, totaux
@@ -10,9 +10,12 @@ urlpatterns = [
     # path('livreurs/modifier/<int:id>/', views.modifier_livreur, name='modifier_livreur'),
     # path('livreurs/supprimer/<int:id>/', views.supprimer_livreur, name='supprimer_livreur'),
     path('commandes-a-livrer/', views.planification_livraison, name='planification_livraison'),
+    path('planification-auto/', views.planification_auto, name='planification_auto'),
     path('assigner-livreur/', views.assigner_livreur_groupes, name='assigner_livreur_groupes'),
     path('fiche-livraison/', views.fiche_livraison, name='fiche_livraison'),
     path('fiche-de-suivi/', views.fiche_de_suivi, name='fiche_de_suivi'),
+    path('fiches/', views.fiches_livreurs, name='fiches_livreurs'),
+    path('comptes-livreurs/', views.releve_livreurs, name='releve_livreurs'),
     # path('frais/', views.frais_livraison_list, name='frais_livraison_list'),
     # path('frais/ajouter/', views.frais_livraison_ajouter, name='frais_livraison_ajouter'),
     # path('frais/modifier/<int:id>/', views.frais_livraison_modifier, name='frais_livraison_modifier'),
@@ -2,24 +2,32 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
 from django.utils import timezone
-from django.http import HttpResponse, JsonResponse, QueryDict
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
 from django.core.paginator import Paginator
 from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.utils.timezone import now
 from common.decorators import admin_required
-from common.utils import is_admin, resolve_display_mode
+from common.utils import Periode, is_admin, lire_date, lire_pk, resolve_display_mode
 from django.db.models import Q, Sum, F, IntegerField, Value, ExpressionWrapper
 from django.db.models.functions import Coalesce
 from django.db import transaction
 from .models import Livreur, Livraison, CATEGORIE_CHOIX, FRAIS_LIVRAISON_PAR_DEFAUT, FRAIS_LIVREUR_PAR_DEFAUT
-from common.models import Caisse, PlanDesComptes
+from common import referentiel
 from ventes.models import Commande, LigneCommande
-from charges.models import Charge
+from stocks.reservation import StockInsuffisant, message_stock_insuffisant
 from .forms import LivreurForm
-from datetime import datetime
+from .fiches import fiches
+from .planification import CAPACITE_LIVREUR, appliquer_plan, planifier
+from .soldes import releve, solde_au, soldes_au
+from ventes.statuts import journal_statuts
+from ventes.suivi import suivi_commandes_en_masse
+from .reglement import COMPTE_FRAIS_LIVREUR, regler_frais_livreurs, total_frais as total_frais_livreurs
+from datetime import datetime, timedelta
 from django.contrib.auth import authenticate
+from django.template.loader import get_template
+from weasyprint import HTML
 
 def _check_password(request) -> bool:
     """Vérifie le mot de passe saisi dans un POST (champ 'password')."""
@@ -32,8 +40,8 @@ def _check_password(request) -> bool:
 
 @login_required
 def liste_livraisons(request): 
-    livreurs = Livreur.objects.all()
-    lieux = Livraison.objects.order_by('lieu')
+    livreurs = referentiel.livreurs()
+    lieux = referentiel.lieux()
     commandes = Commande.objects.order_by('-date_livraison')
 
     livreur_id = request.GET.get('livreur')
@@ -123,19 +131,13 @@ def fiche_livraison(request):
         return HttpResponse("Date invalide", status=400)
 
     livreur = get_object_or_404(Livreur, id=livreur_id)
-    commandes = Commande.objects.filter(
-        livreur=livreur,
-        date_livraison=date,
-        statut_livraison = "Planifiée"
-    ).select_related('client').prefetch_related('lignes_commandes__article')
-
-    total_general = sum(c.total_commande() for c in commandes)
+    fiche = next(iter(fiches(date, livreur_ids=[livreur.pk])), {"commandes": [], "total_general": 0})
 
     return render(request, 'livraison/fiche_livraison.html', {
         'livreur': livreur,
-        'commandes': commandes,
+        'commandes': fiche["commandes"],
         'date': date,
-        'total_general': total_general,
+        'total_general': fiche["total_general"],
         "is_admin": is_admin(request.user),
     })
 
@@ -153,40 +155,100 @@ def fiche_de_suivi(request):
         return HttpResponse("Date invalide", status=400)
 
     livreur = get_object_or_404(Livreur, id=livreur_id)
-    commandes = Commande.objects.filter(
-        livreur=livreur,
-        date_livraison=date,
-    ).exclude(statut_livraison="Supprimée") \
-     .select_related('client') \
-     .prefetch_related('lignes_commandes__article')
-
-    # ➜ on ne compte pas les commandes « Annulée » ou « Reportée »
-    total_general = sum(
-        c.total_commande() if c.statut_livraison not in ["Annulée", "Reportée", "Supprimée"] else 0
-        for c in commandes
-    )
-
-    # ➜ Total des frais livreur (même logique)
-    total_frais_livreur = sum(
-        (c.frais_livreur or 0) if c.statut_livraison not in ["Annulée", "Reportée", "Supprimée"] else 0
-        for c in commandes
-    )
-
-    reste_versement = total_general - total_frais_livreur
+    fiche = next(iter(fiches(date, suivi=True, livreur_ids=[livreur.pk])), None)
+    if fiche is None:
+        fiche = {
+            "commandes": [], "total_general": 0, "total_frais_livreur": 0, "reste_versement": 0,
+            "solde_livreur": solde_au(livreur, date),
+        }
 
     return render(request, 'livraison/fiche_de_suivi.html', {
         'livreur': livreur,
-        'commandes': commandes,
+        'commandes': fiche["commandes"],
         'date': date,
-        'total_general': total_general,
-        'total_frais_livreur': total_frais_livreur,
-        'reste_versement': reste_versement,
+        'total_general': fiche["total_general"],
+        'total_frais_livreur': fiche["total_frais_livreur"],
+        'reste_versement': fiche["reste_versement"],
+        'solde_livreur': fiche["solde_livreur"],
         "is_admin": is_admin(request.user),
     })
 
+
+@login_required
+def fiches_livreurs(request):
+    """
+    Fiches de tous les livreurs d'une date sur une seule page imprimable
+    (?date=AAAA-MM-JJ&type=livraison|suivi, livreur=… pour restreindre) ;
+    &format=pdf renvoie le même document en PDF.
+    """
+    date_str = request.GET.get('date')
+    try:
+        date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.localdate()
+    except ValueError:
+        return HttpResponse("Date invalide", status=400)
+    suivi = request.GET.get('type') == 'suivi'
+    livreur_ids = [pk for pk in map(lire_pk, request.GET.getlist('livreur')) if pk is not None]
+
+    params = request.GET.copy()
+    params.pop('format', None)
+    context = {
+        'fiches': fiches(date, suivi=suivi, livreur_ids=livreur_ids),
+        'date': date,
+        'suivi': suivi,
+        'querystring': params.urlencode(),
+        'pdf': request.GET.get('format') == 'pdf',
+    }
+    if not context['pdf']:
+        return render(request, 'livraison/fiches_livreurs.html', context)
+
+    html_string = get_template('livraison/fiches_livreurs.html').render(context)
+    response = HttpResponse(content_type='application/pdf')
+    nom = "fiches_suivi" if suivi else "fiches_livraison"
+    response['Content-Disposition'] = f'attachment; filename="{nom}_{date:%Y-%m-%d}.pdf"'
+    HTML(string=html_string, base_url=request.build_absolute_uri()).write_pdf(response)
+    return response
+
+def _periode_releve(valeur):
+    """« AAAA-MM » (input type=month) -> Periode du mois ; mois courant par défaut."""
+    aujourd_hui = timezone.localdate()
+    annee, _, mois = (valeur or "").partition("-")
+    return Periode.lire_mois(annee, mois, Periode.mois(aujourd_hui.year, aujourd_hui.month))
+
+
+@login_required
+def releve_livreurs(request):
+    """
+    Comptes des livreurs : solde de chacun à ce jour et, pour le livreur
+    choisi, relevé du mois (?livreur=&mois=AAAA-MM) lu dans les soldes
+    journaliers.
+    """
+    aujourd_hui = timezone.localdate()
+    periode = _periode_releve(request.GET.get("mois"))
+    livreur_id = request.GET.get("livreur")
+
+    livreurs = soldes_au(aujourd_hui, Livreur.objects.order_by("nom"))
+    livreur = get_object_or_404(Livreur, pk=livreur_id) if livreur_id else None
+
+    context = {
+        "livreurs": livreurs,
+        "livreur": livreur,
+        "mois": f"{periode.debut:%Y-%m}",
+        "aujourd_hui": aujourd_hui,
+        "is_admin": is_admin(request.user),
+    }
+    if livreur:
+        ouverture, lignes, totaux = releve(livreur, periode)
+        context.update({
+            "ouverture": ouverture,
+            "lignes": lignes,
+            "totaux": totaux,
+            "cloture": lignes[-1].solde if lignes else ouverture,
+        })
+    return render(request, "livraison/releve_livreurs.html", context)
+
 @login_required
 def planification_livraison(request):
-    livreurs = Livreur.objects.all()
+    livreurs = referentiel.livreurs()
     commandes_qs = Commande.objects.order_by('-date_livraison')
 
     params = request.GET.copy()
@@ -232,6 +294,58 @@ def planification_livraison(request):
         "is_admin": is_admin(request.user),
     })
 
+@login_required
+def planification_auto(request):
+    """
+    Proposition d'affectation des commandes « En attente » d'une date
+    (livraison.planification) : GET calcule le plan (?date=&capacite=&livreurs=…),
+    POST enregistre les affectations validées (affectation_<commande>=<livreur>).
+    """
+    if request.method == 'POST':
+        date = lire_date(request.POST.get('date'))
+        if not date:
+            messages.error(request, "Date de livraison invalide.")
+            return redirect('planification_auto')
+        livreurs = {l.pk: l for l in referentiel.livreurs(actifs=True)}
+        affectations = {}
+        for cle, valeur in request.POST.items():
+            if not cle.startswith('affectation_'):
+                continue
+            commande_id, livreur_id = lire_pk(cle[len('affectation_'):]), lire_pk(valeur)
+            if commande_id and livreur_id in livreurs:
+                affectations.setdefault(livreurs[livreur_id], []).append(commande_id)
+        total = appliquer_plan(date, affectations, request.user)
+        messages.success(request, f"{total} commande(s) planifiée(s) pour le {date:%d/%m/%Y}.")
+        return redirect(f"{reverse('planification_livraison')}?date={date:%Y-%m-%d}&statut_livraison=Planifiée")
+
+    date = lire_date(request.GET.get('date'), timezone.localdate())
+    try:
+        capacite = max(1, int(request.GET.get('capacite') or CAPACITE_LIVREUR))
+    except ValueError:
+        capacite = CAPACITE_LIVREUR
+
+    tous = sorted(referentiel.livreurs(actifs=True), key=lambda l: (l.nom, l.pk))
+    choisis = set(request.GET.getlist('livreurs'))
+    disponibles = [l for l in tous if str(l.pk) in choisis] if choisis else tous
+
+    affectations, reste = planifier(date, disponibles, capacite)
+    commandes = Commande.objects.select_related('client__lieu').in_bulk(
+        [pk for a in affectations for pk in a['commandes']] + reste
+    )
+    for affectation in affectations:
+        affectation['commandes'] = [commandes[pk] for pk in affectation['commandes']]
+
+    return render(request, 'livraison/planification_auto.html', {
+        'date': date,
+        'capacite': capacite,
+        'livreurs': tous,
+        'disponibles': {l.pk for l in disponibles},
+        'affectations': affectations,
+        'reste': [commandes[pk] for pk in reste],
+        'cout_total': sum(a['cout'] for a in affectations),
+        "is_admin": is_admin(request.user),
+    })
+
 @login_required
 def assigner_livreur_groupes(request):
     if request.method == 'POST':
@@ -252,18 +366,19 @@ def assigner_livreur_groupes(request):
 
         frais_remis_zero = False
 
-        for commande in commandes:
-            commande.livreur = livreur
-            commande.date_livraison = date_livraison
-            commande.statut_livraison = 'Planifiée'
-
-             # ✅ Remettre frais à zéro si livreur est un employé
-            if livreur.type == 'Employé':
-                commande.frais_livreur = 0
-                commande.paiement_frais_livreur = "N/A"
-                frais_remis_zero = True
-                
-            commande.save()
+        with transaction.atomic(), journal_statuts(ids, request.user):
+            for commande in commandes:
+                commande.livreur = livreur
+                commande.date_livraison = date_livraison
+                commande.statut_livraison = 'Planifiée'
+
+                # ✅ Remettre frais à zéro si livreur est un employé
+                if livreur.type == 'Employé':
+                    commande.frais_livreur = 0
+                    commande.paiement_frais_livreur = "N/A"
+                    frais_remis_zero = True
+
+                commande.save()
 
         messages.success(
             request,
@@ -328,7 +443,7 @@ def mise_a_jour_statuts_livraisons(request):
         clean_params['statut_livraison'] = statut_livraison
     extra_querystring = clean_params.urlencode()
 
-    livreurs = Livreur.objects.all()
+    livreurs = referentiel.livreurs()
 
     return render(request, 'livraison/mise_a_jour_statuts.html', {
         'commandes': page_obj,
@@ -380,13 +495,15 @@ def mise_a_jour_statuts_livraisons_groupes(request):
             return redirect('mise_a_jour_statuts_livraisons')
 
         # Sinon, on annule livraison ET vente
-        updated = commandes.update(statut_livraison='Annulée', statut_vente='Annulée')
+        with suivi_commandes_en_masse(ids, request.user):  # update() sans signal
+            updated = commandes.update(statut_livraison='Annulée', statut_vente='Annulée')
         messages.success(request, f"{updated} commande(s) annulée(s) avec succès.")
         return redirect('mise_a_jour_statuts_livraisons')
 
     if action == 'livrée':
         # On ne touche PAS à statut_vente
-        updated = commandes.update(statut_livraison='Livrée')
+        with suivi_commandes_en_masse(ids, request.user):  # update() sans signal
+            updated = commandes.update(statut_livraison='Livrée')
         messages.success(request, f"{updated} commande(s) livrée(s) avec succès.")
         return redirect('mise_a_jour_statuts_livraisons')
 
@@ -406,50 +523,67 @@ def mise_a_jour_statuts_livraisons_groupes(request):
 
         date_formatee = nouvelle_date_obj.strftime("%d/%m/%Y")
 
-        with transaction.atomic():
-            qs = (
-                commandes.select_related('client', 'page')
-                .prefetch_related('lignes_commandes')
-            )
-
-            for commande in qs:
-                statut_vente_initial = commande.statut_vente
-                remarque_initiale = (commande.remarque or "").strip()
+        try:
+            with transaction.atomic(), journal_statuts(ids, request.user):
+                qs = (
+                    commandes.select_related('client', 'page')
+                    .prefetch_related('lignes_commandes')
+                )
 
-                prefix = f"Reportée au {date_formatee}"
-                if not remarque_initiale.startswith(prefix):
-                    nouvelle_remarque_existante = f"{prefix}\n{remarque_initiale}".strip()
-                else:
-                    nouvelle_remarque_existante = remarque_initiale
+                for commande in qs:
+                    statut_vente_initial = commande.statut_vente
+                    remarque_initiale = (commande.remarque or "").strip()
 
-                commande.statut_livraison = 'Reportée'
-                commande.remarque = nouvelle_remarque_existante
-                commande.save()
+                    prefix = f"Reportée au {date_formatee}"
+                    if not remarque_initiale.startswith(prefix):
+                        nouvelle_remarque_existante = f"{prefix}\n{remarque_initiale}".strip()
+                    else:
+                        nouvelle_remarque_existante = remarque_initiale
 
-                nouvelle_commande = Commande.objects.create(
-                    client=commande.client,
-                    page=commande.page,
-                    remarque=remarque_initiale,         # pas de "Reportée..." copié
-                    statut_vente=statut_vente_initial,  # on conserve
-                    statut_livraison='En attente',
-                    frais_livraison=commande.frais_livraison,
-                    date_livraison=nouvelle_date_obj,
-                    livreur=None,
-                    frais_livreur=commande.frais_livreur,
-                    paiement_frais_livreur='Non payée'
-                )
+                    # La prestation (location) est décalée avec la livraison, durée conservée
+                    decalage = (
+                        nouvelle_date_obj - commande.date_livraison
+                        if commande.date_livraison else timedelta(0)
+                    )
 
-                lignes = [
-                    LigneCommande(
-                        commande=nouvelle_commande,
-                        article=ligne.article,
-                        prix_unitaire=ligne.prix_unitaire,
-                        prix_achat=ligne.prix_achat,
-                        quantite=ligne.quantite,
+                    commande.statut_livraison = 'Reportée'
+                    commande.remarque = nouvelle_remarque_existante
+                    commande.save()
+
+                    nouvelle_commande = Commande.objects.create(
+                        client=commande.client,
+                        page=commande.page,
+                        remarque=remarque_initiale,         # pas de "Reportée..." copié
+                        statut_vente=statut_vente_initial,  # on conserve
+                        statut_livraison='En attente',
+                        frais_livraison=commande.frais_livraison,
+                        date_livraison=nouvelle_date_obj,
+                        livreur=None,
+                        frais_livreur=commande.frais_livreur,
+                        paiement_frais_livreur='Non payée',
+                        date_debut_prestation=(
+                            commande.date_debut_prestation + decalage if commande.date_debut_prestation else None
+                        ),
+                        date_fin_prestation=(
+                            commande.date_fin_prestation + decalage if commande.date_fin_prestation else None
+                        ),
                     )
-                    for ligne in commande.lignes_commandes.all()
-                ]
-                LigneCommande.objects.bulk_create(lignes)
+
+                    lignes = [
+                        LigneCommande(
+                            commande=nouvelle_commande,
+                            article=ligne.article,
+                            prix_unitaire=ligne.prix_unitaire,
+                            prix_achat=ligne.prix_achat,
+                            quantite=ligne.quantite,
+                        )
+                        for ligne in commande.lignes_commandes.all()
+                    ]
+                    with suivi_commandes_en_masse([nouvelle_commande.pk], request.user):  # bulk_create sans signal
+                        LigneCommande.objects.bulk_create(lignes)
+        except StockInsuffisant as e:
+            messages.error(request, f"Report impossible. {message_stock_insuffisant(e.manquants)}")
+            return redirect('mise_a_jour_statuts_livraisons')
 
         messages.success(
             request,
@@ -465,7 +599,7 @@ def mise_a_jour_statuts_livraisons_groupes(request):
 
 @login_required
 def liste_livreurs(request):
-    livreurs = Livreur.objects.all()
+    livreurs = referentiel.livreurs()
     form = LivreurForm()
     return render(request, 'livraison/liste_livreurs.html', {'livreurs': livreurs, 'form': form})
 
@@ -618,8 +752,8 @@ def frais_livraison_supprimer(request, id):
 @login_required
 @admin_required
 def paiement_frais_livraisons(request):
-    livreurs = Livreur.objects.all()
-    commandes = Commande.objects.order_by('-date_livraison')
+    livreurs = referentiel.livreurs()
+    commandes = Commande.objects.select_related('client__lieu', 'page', 'livreur').order_by('-date_livraison')
 
     livreur_id = request.GET.get('livreur')
     selected_date = request.GET.get('date')
@@ -648,9 +782,7 @@ def paiement_frais_livraisons(request):
         commandes = commandes.filter(paiement_frais_livreur=selected_paiement_frais)
 
     # 🔢 Total des frais pour la sélection
-    total_frais = sum(
-        (c.frais_livreur or 0) for c in commandes
-    )
+    total_frais = total_frais_livreurs(commandes)
 
     # Pagination
     paginator = Paginator(commandes, 24)
@@ -670,7 +802,7 @@ def paiement_frais_livraisons(request):
         'commandes': page_obj.object_list,
         'page_obj': page_obj,
         'livreurs': livreurs,
-        'lieux': Livraison.objects.order_by('lieu'),
+        'lieux': referentiel.lieux(),
         'selected_livreur': livreur_id,
         'selected_date': selected_date,
         'selected_statut': selected_statut,
@@ -678,7 +810,7 @@ def paiement_frais_livraisons(request):
         'total_frais': total_frais,
         'extra_querystring': extra_querystring,
         'is_admin': is_admin(request.user),
-        'caisses': Caisse.objects.all(),
+        'caisses': referentiel.caisses(actifs=False),
         'today': now().date(),
     })
 
@@ -694,35 +826,23 @@ def paiement_frais_livraisons_groupes(request):
             messages.error(request, "Tous les champs sont requis pour enregistrer un paiement.")
             return redirect('paiement_frais_livraisons')
 
-        caisse = get_object_or_404(Caisse, pk=paiement_id)
-        compte_charge = get_object_or_404(PlanDesComptes, pk=10)  # Service de livraison (Frais livreur)
-        created_count = 0
-
-        for cid in commande_ids:
-            try:
-                commande = Commande.objects.get(pk=cid)
-                pu = commande.frais_livreur or 0
-                if pu <= 0:
-                    continue
-
-                Charge.objects.create(
-                    date=date_paiement,
-                    libelle=compte_charge,
-                    pu=pu,
-                    quantite=1,
-                    montant=pu,
-                    remarque=f"{commande.livreur.nom} ({commande.numero_facture})" if commande.livreur else '',
-                    paiement=caisse,
-                    page=commande.page
-                )
+        date_paiement = lire_date(date_paiement)
+        if not date_paiement:
+            messages.error(request, "Date de paiement invalide.")
+            return redirect('paiement_frais_livraisons')
 
-                commande.paiement_frais_livreur = "Payée"
-                commande.save()
-                created_count += 1
-            except Commande.DoesNotExist:
-                continue
+        caisse = referentiel.caisse(paiement_id)
+        compte_charge = referentiel.compte(COMPTE_FRAIS_LIVREUR)  # Service de livraison (Frais livreur)
+        if caisse is None or compte_charge is None:
+            raise Http404("Caisse ou compte de charge introuvable.")
 
-        messages.success(request, f"{created_count} charge(s) enregistrée(s) avec succès.")
+        nb_charges, nb_commandes = regler_frais_livreurs(
+            commande_ids, caisse, date_paiement, compte=compte_charge, user=request.user,
+        )
+        messages.success(
+            request,
+            f"{nb_charges} charge(s) enregistrée(s) pour {nb_commandes} commande(s) réglée(s).",
+        )
         return redirect('paiement_frais_livraisons')
 
     return redirect('paiement_frais_livraisons')
@@ -0,0 +1,127 @@
+# service/encaissement.py
+"""
+Encaissement groupé des commandes de service (proformas -> factures).
+
+Les commandes sélectionnées sont verrouillées et lues en une requête ; les
+numéros de facture du jour sont alloués en un bloc contigu, les ventes
+insérées par bulk_create (montant = total stocké de la commande) et les
+commandes passent à « Payée » en un seul UPDATE. Les factures PDF ne sont
+pas rendues ici : les ventes sont marquées `pdf_a_generer` et la commande
+generer_factures_services les produit en différé.
+"""
+import logging
+import time
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+
+from common import referentiel
+from common.backfill import DEFAULT_BATCH_SIZE
+from common.pdf import pdf_hors_requete
+from .models import Commande, Vente
+
+logger = logging.getLogger(__name__)
+
+STATUTS_NON_ENCAISSABLES = ("Payée", "Annulée", "Supprimée")
+
+
+def _inserer_ventes(ventes):
+    """Bloc de numéros puis bulk_create ; réessaie si un numéro vient d'être pris."""
+    for tentative in range(5):
+        for vente, numero in zip(ventes, Vente.generer_numeros_factures(len(ventes))):
+            vente.numero_facture = numero
+        try:
+            with transaction.atomic():
+                Vente.objects.bulk_create(ventes, batch_size=500)
+            break
+        except IntegrityError as e:
+            if "Duplicate entry" in str(e):
+                time.sleep(0.1)  # backoff léger, comme Vente.save()
+                continue
+            raise
+    else:
+        raise IntegrityError("Impossible d'allouer un bloc de numeros de facture uniques")
+
+    if any(vente.pk is None for vente in ventes):
+        # MySQL ne renvoie pas les clés d'un INSERT multiple : relecture par numéro
+        pks = dict(
+            Vente.objects.filter(numero_facture__in=[v.numero_facture for v in ventes])
+            .values_list("numero_facture", "pk")
+        )
+        for vente in ventes:
+            vente.pk = pks[vente.numero_facture]
+    return ventes
+
+
+@transaction.atomic
+def encaisser_commandes(commande_ids, caisse, date_encaissement, reference=None, user=None):
+    """
+    Encaisse les commandes `commande_ids` encore encaissables sur `caisse`.
+    Retourne (ventes créées, commandes écartées : déjà payées, annulées,
+    supprimées ou déjà encaissées).
+    """
+    commandes = list(
+        Commande.objects.select_for_update()
+        .filter(pk__in=commande_ids)
+        .order_by("date_commande", "numero_proforma")
+    )
+    deja = set(Vente.objects.filter(commande__in=commandes).values_list("commande_id", flat=True))
+    a_encaisser, ecartees = [], []
+    for commande in commandes:
+        if commande.statut_vente in STATUTS_NON_ENCAISSABLES or commande.pk in deja:
+            ecartees.append(commande)
+        else:
+            a_encaisser.append(commande)
+    if not a_encaisser:
+        return [], ecartees
+
+    ventes = _inserer_ventes([
+        Vente(
+            commande=commande,
+            paiement=caisse,
+            montant=commande.total,
+            date_encaissement=date_encaissement,
+            reference=reference or None,
+            pdf_a_generer=True,
+            created_by=user,
+        )
+        for commande in a_encaisser
+    ])
+    Commande.objects.filter(pk__in=[c.pk for c in a_encaisser]).update(statut_vente="Payée")
+    return ventes, ecartees
+
+
+def generer_factures(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Rend et enregistre la facture PDF des ventes marquées `pdf_a_generer`.
+    Chaque facture est enregistrée séparément : une interruption ne refait
+    que les suivantes. Une facture en échec est journalisée et laissée
+    marquée (reprise au passage suivant) sans bloquer les autres.
+    Retourne (nombre de factures produites, pk des ventes en échec).
+    """
+    caisses = referentiel.caisses(actifs=False)
+    total, echecs, dernier = 0, [], 0
+    while True:
+        ventes = list(
+            Vente.actifs.filter(pdf_a_generer=True, pk__gt=dernier)
+            .order_by("pk")[:batch_size]
+        )
+        if not ventes:
+            return total, echecs
+        for vente in ventes:
+            dernier = vente.pk
+            try:
+                pdf = pdf_hors_requete("service/factures_services.html", {
+                    "commandes": Commande.objects.filter(pk=vente.commande_id),
+                    "impression": False,
+                    "type_facture": "FACTURE",
+                    "caisses": caisses,
+                })
+                vente.facture_pdf.save(f"FACTURE_{vente.numero_facture}.pdf", ContentFile(pdf), save=False)
+                vente.pdf_a_generer = False
+                vente.save(update_fields=["facture_pdf", "pdf_a_generer", "updated_at"])
+            except Exception:
+                logger.exception("Facture de la vente de service %s non générée", vente.pk)
+                echecs.append(vente.pk)
+                continue
+            total += 1
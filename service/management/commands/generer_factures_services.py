@@ -0,0 +1,17 @@
+# service/management/commands/generer_factures_services.py
+from django.core.management.base import BaseCommand
+
+from service.encaissement import generer_factures
+
+
+class Command(BaseCommand):
+    help = (
+        "Rend les factures PDF des ventes de service en attente (encaissement groupé). "
+        "À planifier (cron) toutes les quelques minutes."
+    )
+
+    def handle(self, *args, **options):
+        total, echecs = generer_factures()
+        self.stdout.write(self.style.SUCCESS(f"{total} facture(s) de service générée(s)."))
+        if echecs:
+            self.stderr.write(f"{len(echecs)} facture(s) en échec (ventes {', '.join(map(str, echecs))}), reprises au prochain passage.")
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:47
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from common.backfill import backfill_update
+
+
+def remplir_totaux(apps, schema_editor):
+    Commande = apps.get_model('service', 'Commande')
+    LigneCommande = apps.get_model('service', 'LigneCommande')
+    somme = (
+        LigneCommande.objects.filter(commande_id=OuterRef('pk'))
+        .values('commande_id')
+        .annotate(s=Sum(F('tarif') * F('quantite')))
+        .values('s')[:1]
+    )
+    backfill_update(Commande.objects.all(), {'total': Coalesce(Subquery(somme), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0003_rename_numero_facture_commande_numero_proforma_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total (Ar)'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut_vente', 'date_commande'], name='service_cmd_statut_date_idx'),
+        ),
+        migrations.RunPython(remplir_totaux, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0004_commande_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vente',
+            name='facture_pdf',
+            field=models.FileField(blank=True, editable=False, upload_to='factures/services/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='vente',
+            name='pdf_a_generer',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+    ]
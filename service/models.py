@@ -1,4 +1,6 @@
 from django.db import models, transaction, IntegrityError
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Length
 from django.utils import timezone
 import time
 
@@ -17,13 +19,35 @@ class Commande(AuditMixin):
     remarque = models.TextField(blank=True, null=True)
     
     statut_vente = models.CharField(max_length=20, choices=ETAT_CHOIX, default='En attente')
-    
+    # Somme des lignes, tenue à jour par service.signals (SUM SQL direct dans les journaux)
+    total = models.PositiveIntegerField("Total (Ar)", default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["statut_vente", "date_commande"], name="service_cmd_statut_date_idx"),
+        ]
+
     def __str__(self):
         return f"Proforma {self.numero_proforma} - {self.client.raison_sociale}"
     
     @property
     def montant_commande(self):
-        return sum(ligne.montant() for ligne in self.lignes_commandes.all()) 
+        return self.total
+
+    @staticmethod
+    def total_lignes_expr():
+        """Sous-requête SUM(lignes.tarif * lignes.quantite) pour un UPDATE ensembliste."""
+        somme = (
+            LigneCommande.objects.filter(commande_id=OuterRef("pk"))
+            .values("commande_id")
+            .annotate(s=Sum(F("tarif") * F("quantite")))
+            .values("s")[:1]
+        )
+        return Coalesce(Subquery(somme), Value(0))
+
+    @classmethod
+    def recalculer_totaux(cls, commande_ids):
+        return cls.objects.filter(pk__in=commande_ids).update(total=cls.total_lignes_expr(), updated_at=timezone.now())
  
     def save(self, *args, **kwargs):
         max_attempts = 5
@@ -92,6 +116,9 @@ class Vente(AuditMixin):
     paiement = models.ForeignKey(Caisse, on_delete=models.PROTECT, related_name="service_ventes")
     reference = models.CharField(max_length=50, blank=True, null=True)
     montant = models.PositiveIntegerField()
+    # Facture PDF rendue hors requête (commande generer_factures_services)
+    pdf_a_generer = models.BooleanField(default=False, db_index=True, editable=False)
+    facture_pdf = models.FileField(upload_to="factures/services/%Y/%m/", blank=True, editable=False)
 
     def __str__(self):
         return f"Facture {self.numero_facture} - {self.montant} Ar"
@@ -115,6 +142,11 @@ class Vente(AuditMixin):
 
     @classmethod
     def generer_numero_facture_atomic(cls):
+        return cls.generer_numeros_factures(1)[0]
+
+    @classmethod
+    def generer_numeros_factures(cls, nombre):
+        """`nombre` numéros consécutifs du jour (bloc pour l'encaissement groupé)."""
         with transaction.atomic():
             prefix = "F"
             date_str = timezone.now().strftime("%y%m%d")
@@ -123,7 +155,8 @@ class Vente(AuditMixin):
                 cls.objects
                 .select_for_update()
                 .filter(numero_facture__startswith=f"{prefix}{date_str}")
-                .order_by('-numero_facture')
+                # -1000 après -999 : la longueur d'abord, l'ordre lexicographique ensuite
+                .order_by(Length('numero_facture').desc(), '-numero_facture')
                 .first()
             )
 
@@ -132,5 +165,4 @@ class Vente(AuditMixin):
             else:
                 last_number = 0
 
-            new_number = last_number + 1
-            return f"{prefix}{date_str}-{new_number:03d}"
+            return [f"{prefix}{date_str}-{last_number + i:03d}" for i in range(1, nombre + 1)]
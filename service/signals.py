@@ -0,0 +1,11 @@
+# service/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Commande, LigneCommande
+
+
+@receiver(post_save, sender=LigneCommande)
+@receiver(post_delete, sender=LigneCommande)
+def maj_total_commande(sender, instance, **kwargs):
+    # Un seul UPDATE ... SET total = (SELECT SUM ...) par écriture de ligne
+    Commande.recalculer_totaux([instance.commande_id])
@@ -10,6 +10,7 @@ urlpatterns = [
     path('commande/<int:commande_id>/supprimer/', views.supprimer_commande_service, name='supprimer_commande_service'),
     path('encaissements/', views.encaissement_services, name='encaissement_services'),
     path('encaissements/unitaire/', views.encaissement_service_unitaire, name='encaissement_service_unitaire'),
+    path('encaissements/groupes/', views.encaissement_services_groupes, name='encaissement_services_groupes'),
     path('facturation/', views.facturation_commandes_services, name='facturation_commandes_services'),
     path('facturation/partial/', views.facturation_commandes_services_partial, name='facturation_commandes_services_partial'),
     path('facturation/voir/', views.voir_factures_services, name='voir_factures_services'),
@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, QueryDict
+from django.http import FileResponse, JsonResponse, QueryDict
 from django.contrib import messages
 from django.db.models import Sum
 from django.core.paginator import Paginator
@@ -9,8 +9,9 @@ from django.template.loader import render_to_string
 from django.views.decorators.http import require_POST, require_http_methods
 from django.db import IntegrityError, transaction
 from django.contrib.auth.decorators import login_required
+from common import referentiel
 from common.decorators import admin_required
-from common.utils import is_admin
+from common.utils import is_admin, lire_date, lire_pk
 from common.pdf import render_html_to_pdf, render_single_page_pdf
 from urllib.parse import urlencode
 
@@ -18,6 +19,7 @@ from datetime import date
 import json
 from django.core.serializers.json import DjangoJSONEncoder
 
+from .encaissement import encaisser_commandes
 from .models import Commande, LigneCommande, Vente
 from clients.models import Entreprise
 from articles.models import Service
@@ -60,7 +62,7 @@ def liste_commandes_services(request):
         qs = qs.filter(lignes_commandes__service_id=filtre_service_id).distinct()
 
     commandes_valides = qs.exclude(statut_vente__in=["Annulée", "Supprimée"])
-    total_montant = sum(c.montant_commande for c in commandes_valides)
+    total_montant = commandes_valides.aggregate(s=Sum('total'))['s'] or 0
 
     paginator = Paginator(qs, 10)
     page_number = request.GET.get('page')
@@ -85,7 +87,7 @@ def liste_commandes_services(request):
         'filtre_statut': filtre_statut,
         'filtre_page': page_id,
 
-        'pages': Pages.actifs.filter(type="SERVICE"),
+        'pages': referentiel.pages("SERVICE"),
         'services': Service.actifs.all(),
         'clients': Entreprise.actifs.all().order_by('raison_sociale'),
 
@@ -127,7 +129,7 @@ def detail_commande_service_modal(request, commande_id):
 
 @login_required
 def creer_commande_service(request):
-    pages = Pages.actifs.filter(type="SERVICE")
+    pages = referentiel.pages("SERVICE")
     services = Service.actifs.all()
 
     if request.method == 'POST':
@@ -182,7 +184,7 @@ def modifier_commande_service(request, commande_id):
         messages.warning(request, "Modification interdite pour cette commande.")
         return redirect('detail_commande_service', commande_id=commande.id)
 
-    pages = Pages.actifs.filter(type="SERVICE")
+    pages = referentiel.pages("SERVICE")
     services = Service.actifs.all()
 
     if request.method == 'POST':
@@ -259,7 +261,7 @@ def encaissement_services(request):
         if selected_date:
             commandes = commandes.filter(date_commande=selected_date)
 
-    total_montant = sum(c.montant_commande for c in commandes)
+    total_montant = commandes.aggregate(s=Sum("total"))["s"] or 0
 
     paginator = Paginator(commandes, 10)
     page_number = request.GET.get("page")
@@ -273,7 +275,7 @@ def encaissement_services(request):
             clean_params.setlist(key, clean_values)
     extra_querystring = "&" + clean_params.urlencode() if clean_params else ""
 
-    caisses = Caisse.actifs.all()
+    caisses = referentiel.caisses()
     today = now().date()
 
     context = {
@@ -343,9 +345,10 @@ def encaissement_service_unitaire(request):
             vente = Vente.objects.create(
                 commande=commande,
                 paiement=paiement,
-                montant=commande.montant_commande,
+                montant=commande.total,
                 date_encaissement=date_encaissement,
                 reference=reference or None,
+                pdf_a_generer=True,
             )
 
             # Mise à jour du statut
@@ -371,6 +374,44 @@ def encaissement_service_unitaire(request):
     return redirect("encaissement_services")
 
 
+@login_required
+@require_POST
+def encaissement_services_groupes(request):
+    ids = [pk for pk in map(lire_pk, request.POST.getlist("commandes")) if pk is not None]
+    paiement_id = request.POST.get("paiement")
+    texte_date = request.POST.get("date_encaissement")
+    date_encaissement = lire_date(texte_date) if texte_date else now().date()
+    if date_encaissement is None:  # mal formée ou impossible (2024-02-31)
+        messages.error(request, "Date d'encaissement invalide.")
+        return redirect("encaissement_services")
+    reference = (request.POST.get("reference") or "").strip()
+
+    if not ids:
+        messages.warning(request, "Aucune commande sélectionnée.")
+        return redirect("encaissement_services")
+
+    if not paiement_id:
+        messages.warning(request, "Veuillez choisir un mode de paiement.")
+        return redirect("encaissement_services")
+
+    paiement = get_object_or_404(Caisse.actifs, pk=paiement_id)
+    ventes, ecartees = encaisser_commandes(ids, paiement, date_encaissement, reference, user=request.user)
+
+    if ecartees:
+        messages.warning(
+            request,
+            "Commandes non encaissables (déjà payées, supprimées ou annulées) : "
+            + ", ".join(c.numero_proforma for c in ecartees) + "."
+        )
+    if ventes:
+        messages.success(
+            request,
+            f"{len(ventes)} commande(s) encaissée(s) : factures {ventes[0].numero_facture} à "
+            f"{ventes[-1].numero_facture}. Les PDF sont générés en différé."
+        )
+    return redirect("encaissement_services")
+
+
 STATUTS_VENTE = ["En attente", "Payée", "Supprimée"]
 
 @login_required
@@ -456,7 +497,7 @@ def voir_factures_services(request):
         messages.error(request, "Type FACTURE non autorisé : la commande sélectionnée n'est pas Payée.")
         return redirect('facturation_commandes_services')
 
-    caisses = Caisse.objects.all()
+    caisses = referentiel.caisses(actifs=False)
 
     return render(request, "service/factures_services.html", {
         "commandes": Commande.objects.filter(id=commande.id),
@@ -484,7 +525,7 @@ def imprimer_factures_services(request):
         messages.error(request, "Type FACTURE non autorisé : la commande sélectionnée n'est pas Payée.")
         return redirect('facturation_commandes_services')
 
-    caisses = Caisse.objects.all()
+    caisses = referentiel.caisses(actifs=False)
 
     return render(request, 'service/factures_services.html', {
         'commandes': Commande.objects.filter(id=commande.id),
@@ -515,7 +556,15 @@ def telecharger_facture_service_pdf(request):
         messages.error(request, "Type FACTURE non autorisé : la commande sélectionnée n'est pas Payée.")
         return redirect('facturation_commandes_services')
 
-    caisses = Caisse.objects.all()
+    # Facture déjà rendue en différé (encaissement groupé) : servie telle quelle
+    vente = Vente.objects.filter(commande=commande).exclude(facture_pdf="").first()
+    if effective_type == "FACTURE" and vente is not None:
+        return FileResponse(
+            vente.facture_pdf.open("rb"), content_type="application/pdf",
+            filename=f"{effective_type}_{commande.numero_proforma or commande.id}.pdf",
+        )
+
+    caisses = referentiel.caisses(actifs=False)
 
     context = {
         "commandes": Commande.objects.filter(id=commande.id),
@@ -0,0 +1,120 @@
+# statistiques/cloture.py
+"""
+Clôture mensuelle.
+
+Clôturer un mois écrit ses montants (CA, achats, charges par préfixe de
+compte, flux de chaque caisse) dans des ClotureSolde immuables et interdit
+toute écriture datée dans la période clôturée. Les rapports additionnent
+ensuite les soldes figés et un delta calculé en direct sur la seule période
+ouverte : leur coût ne dépend plus de la profondeur de l'historique.
+
+Les clôtures sont contiguës : la première couvre tout l'historique jusqu'à
+la fin du mois choisi, les suivantes un mois chacune.
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from caisses.utils import flux_caisses
+from charges.models import prefixe_compte
+from comptabilite.utils import totaux_resultat
+from stocks.utils import calculer_total_stock
+from .models import Cloture, ClotureSolde, debut_mois, mois_suivant
+
+RUBRIQUES_RESULTAT = ("ca", "achats", "charges")
+
+
+class PeriodeCloturee(ValidationError):
+    """Écriture refusée : la date tombe dans une période clôturée."""
+
+
+def verifier_dates(*dates, libelle="Cette opération", limite=None):
+    """Lève PeriodeCloturee si l'une des `dates` appartient à un mois clôturé."""
+    dates = [d.date() if hasattr(d, "date") else d for d in dates if d]
+    if not dates:
+        return
+    limite = limite or Cloture.date_limite()
+    if limite is None:
+        return
+    for d in dates:
+        if d < limite:
+            raise PeriodeCloturee(
+                f"{libelle} : le {d:%d/%m/%Y} appartient à une période clôturée "
+                f"(jusqu'au {limite:%d/%m/%Y} exclu)."
+            )
+
+
+def soldes_resultat(depuis=None, avant=None):
+    """{(rubrique, cle): montant} lus en direct dans le journal sur [depuis, avant)."""
+    totaux = totaux_resultat(depuis, avant)
+    soldes = defaultdict(int)
+    soldes[("ca", "")] = totaux["ca"]
+    soldes[("achats", "")] = totaux["achats"]
+    for compte, montant in totaux["charges"].items():
+        soldes[("charges", prefixe_compte(compte))] += montant
+    return soldes
+
+
+def soldes_resultat_cumules(avant=None):
+    """Depuis l'origine jusqu'à `avant` : soldes figés + delta sur la période ouverte."""
+    couvert = Cloture.date_limite(avant=avant)
+    soldes = soldes_resultat(depuis=couvert, avant=avant)
+    if couvert:
+        for cle_solde, montant in ClotureSolde.cumuls(RUBRIQUES_RESULTAT, avant=couvert).items():
+            soldes[cle_solde] += montant
+    return soldes
+
+
+def mois_a_cloturer():
+    """Mois suivant la dernière clôture (None tant qu'aucune clôture n'existe)."""
+    derniere = Cloture.derniere()
+    return mois_suivant(derniere.periode) if derniere else None
+
+
+@transaction.atomic
+def cloturer_mois(mois, user=None):
+    """
+    Clôture le mois contenant `mois`. Seul le mois suivant la dernière clôture
+    peut l'être, et jamais le mois en cours.
+    """
+    periode = debut_mois(mois)
+    attendu = mois_a_cloturer()
+    if attendu and periode != attendu:
+        raise ValidationError(f"Le prochain mois à clôturer est {attendu:%m/%Y}.")
+    if mois_suivant(periode) > debut_mois(date.today()):
+        raise ValidationError("Seul un mois entièrement écoulé peut être clôturé.")
+
+    depuis = attendu  # None pour la première clôture : tout l'historique
+    avant = mois_suivant(periode)
+
+    cloture = Cloture.objects.create(
+        periode=periode,
+        stock_valeur=calculer_total_stock(),
+        created_by=user,
+    )
+
+    soldes = [
+        ClotureSolde(cloture=cloture, rubrique=rubrique, cle=cle, montant=montant)
+        for (rubrique, cle), montant in soldes_resultat(depuis, avant).items()
+        if montant
+    ]
+    for caisse_id, flux in flux_caisses(depuis, avant).items():
+        soldes.extend(
+            ClotureSolde(cloture=cloture, rubrique=f"caisse_{cle}", cle=str(caisse_id), montant=montant)
+            for cle, montant in flux.items()
+            if montant
+        )
+    ClotureSolde.objects.bulk_create(soldes)
+    return cloture
+
+
+@transaction.atomic
+def rouvrir_derniere():
+    """Supprime la dernière clôture (et ses soldes) : le mois redevient modifiable."""
+    derniere = Cloture.derniere()
+    if derniere is None:
+        raise ValidationError("Aucune période clôturée.")
+    derniere.delete()
+    return derniere.periode
@@ -0,0 +1,24 @@
+# statistiques/middleware.py
+from django.contrib import messages
+from django.shortcuts import redirect
+
+from .cloture import PeriodeCloturee
+
+
+class PeriodeClotureeMiddleware:
+    """
+    Transforme une écriture refusée par la clôture (levée depuis n'importe
+    quelle vue) en message d'erreur + retour à la page précédente.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, PeriodeCloturee):
+            return None
+        messages.error(request, " ".join(exception.messages))
+        return redirect(request.META.get("HTTP_REFERER") or "home")
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cloture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut_publication', models.CharField(choices=[('publié', 'Publié'), ('modifié', 'Modifié'), ('supprimé', 'Supprimé')], default='publié', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('periode', models.DateField(unique=True, verbose_name='Mois clôturé')),
+                ('stock_valeur', models.BigIntegerField(default=0, verbose_name='Valeur du stock à la clôture')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_created_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+                ('deleted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_deleted_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(app_label)s_updated_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-periode'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClotureSolde',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rubrique', models.CharField(choices=[('ca', "Chiffre d'affaires"), ('achats', 'Achats'), ('charges', 'Charges par compte'), ('caisse_ventes', 'Caisse : ventes'), ('caisse_mvt_entree', 'Caisse : mouvements entrants'), ('caisse_achats', 'Caisse : achats'), ('caisse_charges', 'Caisse : charges'), ('caisse_versements', 'Caisse : versements'), ('caisse_mvt_sortie', 'Caisse : mouvements sortants')], max_length=20)),
+                ('cle', models.CharField(blank=True, default='', max_length=20)),
+                ('montant', models.BigIntegerField(default=0)),
+                ('cloture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soldes', to='statistiques.cloture')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rubrique', 'cle'], name='cloture_solde_rubrique_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cloturesolde',
+            constraint=models.UniqueConstraint(fields=('cloture', 'rubrique', 'cle'), name='cloture_solde_unique'),
+        ),
+    ]
@@ -1,3 +1,99 @@
+from datetime import date
+
 from django.db import models
+from django.db.models import Sum
+from common.mixins import AuditMixin
+
+
+def debut_mois(d):
+    return date(d.year, d.month, 1)
+
+
+def mois_suivant(d):
+    return date(d.year + 1, 1, 1) if d.month == 12 else date(d.year, d.month + 1, 1)
+
+
+class Cloture(AuditMixin):
+    """
+    Clôture d'un mois : les écritures datées avant `fin` sont figées et les
+    rapports lisent les ClotureSolde au lieu de recalculer tout l'historique.
+    """
+    periode = models.DateField("Mois clôturé", unique=True)  # 1er jour du mois
+    stock_valeur = models.BigIntegerField("Valeur du stock à la clôture", default=0)
+
+    class Meta:
+        ordering = ["-periode"]
+
+    def __str__(self):
+        return f"Clôture {self.periode:%m/%Y}"
+
+    @property
+    def fin(self):
+        """Premier jour non clôturé (borne exclusive)."""
+        return mois_suivant(self.periode)
+
+    @classmethod
+    def derniere(cls):
+        return cls.objects.order_by("-periode").first()
+
+    @classmethod
+    def date_limite(cls, avant=None):
+        """
+        Toute date strictement antérieure est clôturée (None si aucune clôture).
+        Avec `avant`, ne retient que les clôtures entièrement comprises avant cette date.
+        """
+        qs = cls.objects.all()
+        if avant:
+            qs = qs.filter(periode__lt=debut_mois(avant))
+        derniere = qs.order_by("-periode").values_list("periode", flat=True).first()
+        return mois_suivant(derniere) if derniere else None
+
+
+class ClotureSolde(models.Model):
+    """Montant figé d'une rubrique pour un mois clôturé. Jamais modifié après insertion."""
+    RUBRIQUES = [
+        ("ca", "Chiffre d'affaires"),
+        ("achats", "Achats"),
+        ("charges", "Charges par compte"),
+        ("caisse_ventes", "Caisse : ventes"),
+        ("caisse_mvt_entree", "Caisse : mouvements entrants"),
+        ("caisse_achats", "Caisse : achats"),
+        ("caisse_charges", "Caisse : charges"),
+        ("caisse_versements", "Caisse : versements"),
+        ("caisse_mvt_sortie", "Caisse : mouvements sortants"),
+    ]
+
+    cloture = models.ForeignKey(Cloture, on_delete=models.CASCADE, related_name="soldes")
+    rubrique = models.CharField(max_length=20, choices=RUBRIQUES)
+    cle = models.CharField(max_length=20, blank=True, default="")  # préfixe de compte, id de caisse...
+    montant = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cloture", "rubrique", "cle"], name="cloture_solde_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["rubrique", "cle"], name="cloture_solde_rubrique_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.cloture} - {self.rubrique} {self.cle} : {self.montant}"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Un solde de clôture ne peut pas être modifié.")
+        super().save(*args, **kwargs)
 
-# Create your models here.
+    @classmethod
+    def cumuls(cls, rubriques=None, prefixe="", avant=None):
+        """
+        {(rubrique, cle): somme} sur toutes les clôtures (ou celles antérieures
+        à `avant`), pour les `rubriques` données ou celles commençant par `prefixe`.
+        """
+        qs = cls.objects.filter(rubrique__startswith=prefixe)
+        if rubriques:
+            qs = qs.filter(rubrique__in=rubriques)
+        if avant:
+            qs = qs.filter(cloture__periode__lt=avant)
+        rows = qs.order_by().values_list("rubrique", "cle").annotate(total=Sum("montant"))
+        return {(rubrique, cle): total or 0 for rubrique, cle, total in rows}
@@ -0,0 +1,85 @@
+# statistiques/pivot.py
+"""
+Tableaux croisés du rapport de vente (marge par article / mois / jour et par page).
+
+Les lignes de commande sont lues une seule fois en tuples (values_list),
+agrégées par groupby pandas, puis remises aux templates sous forme de
+lignes déjà alignées sur la liste des pages : plus aucune recherche de
+cellule par (ligne, page) dans le template.
+"""
+import pandas as pd
+
+SANS_PAGE = "(Sans page)"
+CHAMPS = {
+    "article": "article__nom",
+    "page": "commande__page__nom",
+    "date": "commande__date_livraison",
+    "quantite": "quantite",
+    "prix_unitaire": "prix_unitaire",
+    "prix_achat": "article__prix_achat",
+}
+MESURES = ["quantite", "vente", "achat", "marge"]
+
+
+def charger(lignes):
+    """DataFrame des lignes de commande (une requête, sans instancier de modèles)."""
+    df = pd.DataFrame.from_records(
+        list(lignes.order_by().values_list(*CHAMPS.values())), columns=list(CHAMPS),
+    )
+    df["page"] = df["page"].fillna(SANS_PAGE)
+    for champ in ("quantite", "prix_unitaire", "prix_achat"):
+        df[champ] = pd.to_numeric(df[champ]).fillna(0).astype("int64")
+    df["vente"] = df["quantite"] * df["prix_unitaire"]
+    df["achat"] = df["quantite"] * df["prix_achat"]
+    df["marge"] = df["vente"] - df["achat"]
+    jours = pd.to_datetime(df["date"])
+    df["jour"] = jours.dt.strftime("%Y-%m-%d")
+    df["mois"] = jours.dt.strftime("%Y-%m")
+    return df
+
+
+def croiser(df, cle, pages):
+    """
+    Une ligne par valeur de `cle` (triée) : {"cle", quantite, vente, achat,
+    marge, "marges": [marge par page, dans l'ordre de `pages`]}.
+    Les lignes sans valeur de `cle` (date de livraison vide) sont ignorées.
+    """
+    if df.empty:
+        return []
+    totaux = df.groupby(cle)[MESURES].sum()
+    croise = (
+        df.groupby([cle, "page"])["marge"].sum()
+        .unstack(fill_value=0)
+        .reindex(index=totaux.index, columns=pages, fill_value=0)
+    )
+    return [
+        dict(zip(MESURES, valeurs), cle=valeur_cle, marges=marges)
+        for valeur_cle, valeurs, marges in zip(
+            totaux.index, totaux.to_numpy().tolist(), croise.to_numpy().tolist()
+        )
+    ]
+
+
+def rapport(lignes):
+    """Contexte du rapport de vente à partir du queryset de LigneCommande filtré."""
+    df = charger(lignes)
+    pages = sorted(df["page"].unique())
+    par_article = croiser(df, "article", pages)
+    par_jour = croiser(df, "jour", pages)
+    for ligne in par_jour:
+        annee, mois, jour = ligne["cle"].split("-")
+        ligne["display_date"] = f"{jour}/{mois}/{annee}"
+    totaux_pages = (
+        df.groupby("page")["marge"].sum().reindex(pages, fill_value=0).tolist() if pages else []
+    )
+    return {
+        "pages": pages,
+        "articles": [ligne["cle"] for ligne in par_article],
+        "rapport_article": par_article,
+        "rapport_mois": croiser(df, "mois", pages),
+        "rapport_jour": par_jour,
+        "totaux_pages": totaux_pages,
+        "total_general_qte": int(df["quantite"].sum()),
+        "total_general_montant": int(df["vente"].sum()),
+        "total_general_marge": int(df["marge"].sum()),
+    }
@@ -0,0 +1,55 @@
+# statistiques/signals.py
+from django.db.models.signals import pre_save, pre_delete
+
+from achats.models import Achat, LigneAchat
+from caisses.models import Versement, MouvementCaisse
+from charges.models import Charge
+from stocks.models import Inventaire
+from ventes.models import Vente
+from .cloture import verifier_dates
+from .models import Cloture
+
+# Modèle -> champ portant la date comptable (les lignes d'achat suivent leur achat)
+CHAMPS_DATE = {
+    Vente: "date_encaissement",
+    Achat: "date",
+    LigneAchat: "achat__date",
+    Charge: "date",
+    Versement: "date",
+    MouvementCaisse: "date",
+    Inventaire: "date",
+}
+
+
+def _date_courante(instance):
+    if isinstance(instance, LigneAchat):
+        return Achat.objects.filter(pk=instance.achat_id).values_list("date", flat=True).first()
+    return getattr(instance, CHAMPS_DATE[type(instance)])
+
+
+def _date_enregistree(sender, instance):
+    if not instance.pk:
+        return None
+    return (
+        sender._base_manager.filter(pk=instance.pk)
+        .values_list(CHAMPS_DATE[sender], flat=True)
+        .first()
+    )
+
+
+def proteger_periode_cloturee(sender, instance, **kwargs):
+    limite = Cloture.date_limite()
+    if limite is None:
+        return
+    # Ni écrire dans un mois clôturé, ni en sortir une écriture (ancienne date)
+    verifier_dates(
+        _date_courante(instance),
+        _date_enregistree(sender, instance),
+        libelle=f"{sender._meta.verbose_name.capitalize()} #{instance.pk or 'nouveau'}",
+        limite=limite,
+    )
+
+
+for modele in CHAMPS_DATE:
+    pre_save.connect(proteger_periode_cloturee, sender=modele, dispatch_uid=f"cloture_save_{modele.__name__}")
+    pre_delete.connect(proteger_periode_cloturee, sender=modele, dispatch_uid=f"cloture_delete_{modele.__name__}")
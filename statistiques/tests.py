@@ -1,3 +1,60 @@
+from datetime import date
+
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from charges.models import Charge
+from clients.models import Client
+from common.models import Caisse, PlanDesComptes
+from comptabilite.journal import suivi_ventes
+from ventes.models import Commande, Vente
+from .cloture import PeriodeCloturee
+from .models import Cloture
+
+
+class PeriodeClotureeTests(TestCase):
+    def setUp(self):
+        self.caisse = Caisse.objects.create(nom="Caisse", responsable="R")
+        self.compte = PlanDesComptes.objects.create(compte_numero="626", libelle="Téléphone")
+        self.charge = self.creer_charge(date(2024, 1, 20))
+        Cloture.objects.create(periode=date(2024, 1, 1))
+
+    def creer_charge(self, jour):
+        return Charge.objects.create(
+            date=jour, libelle=self.compte, pu=50, quantite=1, montant=50, paiement=self.caisse,
+        )
+
+    def test_ecriture_dans_le_mois_cloture_refusee(self):
+        with self.assertRaises(PeriodeCloturee):
+            self.creer_charge(date(2024, 1, 31))
+
+    def test_ecriture_apres_la_cloture_acceptee(self):
+        self.assertEqual(self.creer_charge(date(2024, 2, 1)).date, date(2024, 2, 1))
+
+    def test_modification_et_suppression_refusees(self):
+        self.charge.montant = 60
+        with self.assertRaises(PeriodeCloturee):
+            self.charge.save()
+        with self.assertRaises(PeriodeCloturee):
+            self.charge.delete()
+
+    def test_deplacement_vers_ou_hors_du_mois_cloture_refuse(self):
+        charge = self.creer_charge(date(2024, 2, 5))
+        charge.date = date(2024, 1, 5)
+        with self.assertRaises(PeriodeCloturee):
+            charge.save()
+        self.charge.date = date(2024, 2, 5)
+        with self.assertRaises(PeriodeCloturee):
+            self.charge.save()
+
+    def test_changement_de_statut_en_masse_refuse(self):
+        client = Client.objects.create(nom="Client", contact="0340000000")
+        commande = Commande.objects.create(client=client, page=None, statut_vente="Payée")
+        Vente.objects.bulk_create([
+            Vente(commande=commande, date_encaissement=date(2024, 1, 10), paiement=self.caisse, montant=400),
+        ])
+        with self.assertRaises(PeriodeCloturee):
+            with transaction.atomic(), suivi_ventes([commande.pk]):
+                Commande.objects.filter(pk=commande.pk).update(statut_vente="Annulée")
+        commande.refresh_from_db()
+        self.assertEqual(commande.statut_vente, "Payée")
@@ -7,5 +7,7 @@ urlpatterns = [
     # path('bilan/', bilan, name='bilan'),
     path("", views.statistiques_home, name="statistiques"),
     path("section/<str:section>/", views.statistiques_section, name="statistiques_section"),
+    path("cloture/", views.cloturer_periode, name="cloturer_periode"),
+    path("cloture/rouvrir/", views.rouvrir_periode, name="rouvrir_periode"),
 
 ]
@@ -1,17 +1,28 @@
 # statistiques/views.py
-from django.shortcuts import render
+from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.contrib import messages
+from django.contrib.auth import authenticate
+from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from django.db.models import Q, Sum, F, ExpressionWrapper, IntegerField
-from collections import defaultdict
 from django.contrib.auth.decorators import login_required
+from common import referentiel
 from common.decorators import admin_required
-from common.utils import is_admin
-from ventes.models import LigneCommande, Vente
-from charges.models import Charge
-from achats.models import Achat
+from common.utils import Periode, annees_de, filtrer_periodes, is_admin, lire_date, lire_pk
+from ventes.models import LigneCommande
+from charges.utils import somme_comptes
 from stocks.utils import calculer_total_stock
-from caisses.utils import calculer_totaux_caisses
-from datetime import date
+from caisses.utils import calculer_totaux_caisses, flux_caisses_cumules
+from datetime import date, timedelta
+from .cloture import soldes_resultat, soldes_resultat_cumules, cloturer_mois, rouvrir_derniere, mois_a_cloturer
+from .models import Cloture, debut_mois, mois_suivant
+from .pivot import rapport
+from comptabilite.models import RepartitionCharge
+from comptabilite.soldes import soldes_au
+from comptabilite.repartition import methode_valide, resultat_par_page
+from comptabilite.utils import balance_generale, grand_livre
+from livraison.performances import AXES_CHOIX, performances
 
 # ---------- Helpers: retournent uniquement un contexte ----------
 def _ctx_rapport_vente(request):
@@ -30,208 +41,122 @@ def _ctx_rapport_vente(request):
         year = str(now.year)
         month = f"{now.month:02d}"
 
-    lignes = LigneCommande.actifs.select_related(
-        'commande__client', 'commande__page', 'article', 'commande__vente'
-    ).filter(commande__vente__isnull=False)
+    lignes = LigneCommande.actifs.filter(commande__vente__isnull=False)
 
     # Appliquer les filtres si présents (y compris defaults si on vient d’en injecter)
-    if any([year, month, page_filter, article_filter]):
-        if year:
-            lignes = lignes.filter(commande__date_livraison__year=year)
-        if month:
-            lignes = lignes.filter(commande__date_livraison__month=month)
-        if page_filter:
-            lignes = lignes.filter(commande__page__nom=page_filter)
-        if article_filter:
-            lignes = lignes.filter(article__nom=article_filter)
+    # Année / Mois -> intervalles de dates (index utilisé), jamais __year / __month
+    annees = annees_de(lignes, 'commande__date_livraison') if month and not year else None
+    lignes = filtrer_periodes(lignes, 'commande__date_livraison', Periode.depuis_filtres(year, month, annees))
+    if page_filter:
+        lignes = lignes.filter(commande__page__nom=page_filter)
+    if article_filter:
+        lignes = lignes.filter(article__nom=article_filter)
 
     selected_year = year
     selected_month = month
 
-    # --- Par article ---
-    rapport_article = lignes.values('article__nom').annotate(
-        total_qte=Sum('quantite'),
-        total_montant=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=IntegerField())),
-        total_achat=Sum(ExpressionWrapper(F('quantite') * F('article__prix_achat'), output_field=IntegerField())),
-    ).annotate(
-        total_marge=ExpressionWrapper(F('total_montant') - F('total_achat'), output_field=IntegerField())
-    )
-
-    # --- Par jour ---
-    rapport_jour_raw = lignes.annotate(
-        date=F('commande__date_livraison')
-    ).values('date').annotate(
-        total_achat=Sum(F('quantite') * F('article__prix_achat'), output_field=IntegerField()),
-        total_vente=Sum(F('quantite') * F('prix_unitaire'), output_field=IntegerField()),
-    ).annotate(
-        total_marge=F('total_vente') - F('total_achat')
-    ).order_by('date')
-
-    rapport_jour = []
-    for item in rapport_jour_raw:
-        date_obj = item['date']
-        date_str = date_obj.strftime('%Y-%m-%d') if hasattr(date_obj, 'strftime') else str(date_obj)
-        display_date = date_obj.strftime('%d/%m/%Y') if hasattr(date_obj, 'strftime') else str(date_obj)
-        rapport_jour.append({
-            'date': date_str,
-            'display_date': display_date,
-            'total_achat': item['total_achat'],
-            'total_vente': item['total_vente'],
-            'total_marge': item['total_marge'],
-        })
-
-    # --- Par mois ---
-    rapport_mois_raw = lignes.annotate(
-        annee=F('commande__date_livraison__year'),
-        mois=F('commande__date_livraison__month')
-    ).values('annee', 'mois').annotate(
-        total_achat=Sum(
-            F('quantite') * F('article__prix_achat'),
-            output_field=IntegerField()
-        ),
-        total_vente=Sum(
-            F('quantite') * F('prix_unitaire'),
-            output_field=IntegerField()
-        ),
-    ).annotate(
-        total_marge=F('total_vente') - F('total_achat')
-    ).order_by('annee', 'mois')
-
-    rapport_mois = []
-    for item in rapport_mois_raw:
-        mois_str = f"{item['annee']}-{item['mois']:02d}"
-        display_mois = timezone.datetime(item['annee'], item['mois'], 1).strftime('%B %Y')
-        rapport_mois.append({
-            'mois': mois_str,
-            'display_mois': display_mois,
-            'total_achat': item['total_achat'],
-            'total_vente': item['total_vente'],
-            'total_marge': item['total_marge'],
-        })
-
-    # --- Pages & articles disponibles ---
-    pages_set, articles_set = set(), set()
-    for ligne in lignes:
-        page_name = ligne.commande.page.nom if ligne.commande.page else "(Sans page)"
-        pages_set.add(page_name)
-        articles_set.add(ligne.article.nom)
-    pages = sorted(pages_set)
-    articles = sorted(articles_set)
-
-    # --- Marges croisées ---
-    marge_par_article_page = defaultdict(lambda: defaultdict(int))
-    marge_par_jour_page = defaultdict(lambda: defaultdict(int))
-    marge_par_mois_page = defaultdict(lambda: defaultdict(int))
-
-    for ligne in lignes:
-        article_name = ligne.article.nom
-        page_name = ligne.commande.page.nom if ligne.commande.page else "(Sans page)"
-        marge = ligne.montant() - ligne.quantite * ligne.article.prix_achat
-        marge_par_article_page[article_name][page_name] += marge
-
-        d_str = ligne.commande.date_livraison.strftime("%Y-%m-%d")
-        marge_par_jour_page[d_str][page_name] += marge
-
-        m_str = ligne.commande.date_livraison.strftime('%Y-%m')
-        marge_par_mois_page[m_str][page_name] += marge
+    # --- Tableaux par article / mois / jour, croisés par page (statistiques.pivot) ---
+    ctx = rapport(lignes)
 
     years = list(range(timezone.now().year, timezone.now().year - 5, -1))
     months = [(f"{i:02d}", timezone.datetime(2000, i, 1).strftime('%B')) for i in range(1, 13)]
 
-    # --- Totaux ---
-    total_general_qte = 0
-    total_general_montant = 0
-    total_general_marge = 0
-    total_par_page = defaultdict(int)
-
-    for item in rapport_article:
-        total_general_qte += item['total_qte'] or 0
-        total_general_montant += item['total_montant'] or 0
-        total_general_marge += item['total_marge'] or 0
-
-    for pages_dict in marge_par_article_page.values():
-        for page_name, marge in pages_dict.items():
-            total_par_page[page_name] += marge
-
-    return {
-        'rapport_article': rapport_article,
-        'pages': pages,
-        'articles': articles,
-        'total_general_qte': total_general_qte,
-        'total_general_montant': total_general_montant,
-        'total_general_marge': total_general_marge,
-        'total_par_page': total_par_page,
-        'rapport_jour': rapport_jour,
-        'rapport_mois': rapport_mois,
-        'marge_par_article_page': marge_par_article_page,
-        'marge_par_jour_page': marge_par_jour_page,
-        'marge_par_mois_page': marge_par_mois_page,
+    ctx.update({
         'year': selected_year,
         'month': selected_month,
         'years': years,
         'months': months,
         'page': page_filter,
         'article': article_filter,
-    }
-
-def _ctx_compte_de_resultat(request):
-    chiffre_affaires = Vente.actifs.aggregate(total=Sum('montant'))['total'] or 0
-    charges_60 = Charge.actifs.filter(libelle__compte_numero__startswith='60').aggregate(total=Sum('montant'))['total'] or 0
-    total_achats = sum(achat.total for achat in Achat.actifs.all())
-    stocks_total = calculer_total_stock()
+    })
+    return ctx
+
+def _periode_from_request(request):
+    """Bornes incluses ?date_debut=AAAA-MM-JJ&date_fin=AAAA-MM-JJ (None si absentes ou invalides)."""
+    return lire_date(request.GET.get('date_debut')), lire_date(request.GET.get('date_fin'))
+
+def _resultat(date_debut=None, date_fin=None):
+    """
+    Soldes intermédiaires de gestion sur la période.
+    Toutes les rubriques de charges viennent d'un seul GROUP BY compte_prefixe ;
+    sans date de début, les mois clôturés sont lus dans leurs soldes figés.
+    """
+    avant = _avant(date_fin)
+    if date_debut is None:
+        # Depuis l'origine : soldes figés des mois clôturés + delta de la période ouverte
+        soldes = soldes_resultat_cumules(avant=avant)
+    else:
+        soldes = soldes_resultat(depuis=date_debut, avant=avant)
+
+    comptes = {cle: montant for (rubrique, cle), montant in soldes.items() if rubrique == "charges"}
+    chiffre_affaires = soldes[("ca", "")]
+    total_achats = soldes[("achats", "")]
+    stocks_total = calculer_total_stock(avant)
     variation_stock = stocks_total  # TODO: déduire stock initial si dispo
-    achats_cons = charges_60 + total_achats - variation_stock
-
-    services_cons = Charge.actifs.filter(
-        Q(libelle__compte_numero__startswith='61') | Q(libelle__compte_numero__startswith='62')
-    ).aggregate(total=Sum('montant'))['total'] or 0
+    achats_cons = somme_comptes(comptes, '60') + total_achats - variation_stock
 
+    services_cons = somme_comptes(comptes, '61', '62')
     valeur_ajoutee = chiffre_affaires - achats_cons - services_cons
-    charges_personnel = Charge.actifs.filter(libelle__compte_numero__startswith='64').aggregate(total=Sum('montant'))['total'] or 0
-    taxes = Charge.actifs.filter(libelle__compte_numero__startswith='63').aggregate(total=Sum('montant'))['total'] or 0
+    charges_personnel = somme_comptes(comptes, '64')
+    taxes = somme_comptes(comptes, '63')
     ebe = valeur_ajoutee - charges_personnel - taxes
-    autres_charges = Charge.actifs.filter(libelle__compte_numero__startswith='65').aggregate(total=Sum('montant'))['total'] or 0
-    dotations = Charge.actifs.filter(libelle__compte_numero__startswith='68').aggregate(total=Sum('montant'))['total'] or 0
+    autres_charges = somme_comptes(comptes, '65')
+    dotations = somme_comptes(comptes, '68')
     resultat_op = ebe - autres_charges - dotations
 
+    return {
+        "comptes": comptes,
+        "stocks_total": stocks_total,
+        "chiffre_affaires": chiffre_affaires,
+        "achats_cons": achats_cons,
+        "services_cons": services_cons,
+        "valeur_ajoutee": valeur_ajoutee,
+        "charges_personnel": charges_personnel,
+        "taxes": taxes,
+        "ebe": ebe,
+        "autres_charges": autres_charges,
+        "dotations": dotations,
+        "resultat_op": resultat_op,
+    }
+
+def _ctx_compte_de_resultat(request):
+    date_debut, date_fin = _periode_from_request(request)
+    r = _resultat(date_debut, date_fin)
+
     return {
         "compte_resultat": [
-            {"num": 1, "rubrique": "Chiffres d'affaires", "montant": chiffre_affaires},
-            {"num": 2, "rubrique": "Achats consommés", "montant": achats_cons},
-            {"num": 3, "rubrique": "Services extérieurs et autres consommations", "montant": services_cons or "-"},
-            {"num": 4, "rubrique": "Valeur ajoutée d'exploitation", "montant": valeur_ajoutee, "is_total": True},
-            {"num": 5, "rubrique": "Charges de personnel", "montant": charges_personnel},
-            {"num": 6, "rubrique": "Impôts, taxes et versements assimilés", "montant": taxes},
-            {"num": 7, "rubrique": "Excédent Brut d'Exploitation", "montant": ebe, "is_total": True},
-            {"num": 8, "rubrique": "Autres charges opérationnelles", "montant": autres_charges or "-"},
-            {"num": 9, "rubrique": "Dotations aux amortissements, aux provisions et pertes de valeurs", "montant": dotations or "-"},
-            {"num": 10, "rubrique": "Résultat opérationnel", "montant": resultat_op, "is_total": True},
-        ]
+            {"num": 1, "rubrique": "Chiffres d'affaires", "montant": r["chiffre_affaires"]},
+            {"num": 2, "rubrique": "Achats consommés", "montant": r["achats_cons"]},
+            {"num": 3, "rubrique": "Services extérieurs et autres consommations", "montant": r["services_cons"] or "-"},
+            {"num": 4, "rubrique": "Valeur ajoutée d'exploitation", "montant": r["valeur_ajoutee"], "is_total": True},
+            {"num": 5, "rubrique": "Charges de personnel", "montant": r["charges_personnel"]},
+            {"num": 6, "rubrique": "Impôts, taxes et versements assimilés", "montant": r["taxes"]},
+            {"num": 7, "rubrique": "Excédent Brut d'Exploitation", "montant": r["ebe"], "is_total": True},
+            {"num": 8, "rubrique": "Autres charges opérationnelles", "montant": r["autres_charges"] or "-"},
+            {"num": 9, "rubrique": "Dotations aux amortissements, aux provisions et pertes de valeurs", "montant": r["dotations"] or "-"},
+            {"num": 10, "rubrique": "Résultat opérationnel", "montant": r["resultat_op"], "is_total": True},
+        ],
+        "date_debut": date_debut,
+        "date_fin": date_fin,
     }
 
 def _ctx_bilan(request):
-    capital = Charge.actifs.filter(libelle__compte_numero__startswith='1').aggregate(total=Sum('montant'))['total'] or 0
-    immobilisations = Charge.actifs.filter(libelle__compte_numero__startswith='2').aggregate(total=Sum('montant'))['total'] or 0
-    stocks_total = calculer_total_stock()
-    totaux_caisses = calculer_totaux_caisses()
-    solde_final = totaux_caisses['solde_final']
-    total_versements = totaux_caisses['versements']
-
-    chiffre_affaires = Vente.actifs.aggregate(total=Sum('montant'))['total'] or 0
-    charges_60 = Charge.actifs.filter(libelle__compte_numero__startswith='60').aggregate(total=Sum('montant'))['total'] or 0
-    total_achats = sum(achat.total for achat in Achat.actifs.all())
-    variation_stock = stocks_total
-    achats_cons = charges_60 + total_achats - variation_stock
-    services_cons = Charge.actifs.filter(
-        Q(libelle__compte_numero__startswith='61') | Q(libelle__compte_numero__startswith='62')
-    ).aggregate(total=Sum('montant'))['total'] or 0
-    valeur_ajoutee = chiffre_affaires - achats_cons - services_cons
-    charges_personnel = Charge.actifs.filter(libelle__compte_numero__startswith='64').aggregate(total=Sum('montant'))['total'] or 0
-    taxes = Charge.actifs.filter(libelle__compte_numero__startswith='63').aggregate(total=Sum('montant'))['total'] or 0
-    ebe = valeur_ajoutee - charges_personnel - taxes
-    autres_charges = Charge.actifs.filter(libelle__compte_numero__startswith='65').aggregate(total=Sum('montant'))['total'] or 0
-    dotations = Charge.actifs.filter(libelle__compte_numero__startswith='68').aggregate(total=Sum('montant'))['total'] or 0
-    resultat_op = ebe - autres_charges - dotations
+    # Un bilan est une situation à une date : tout est cumulé depuis l'origine jusqu'à date_fin
+    _, date_fin = _periode_from_request(request)
+    r = _resultat(None, date_fin)
+    comptes = r["comptes"]
+
+    capital = somme_comptes(comptes, '1')
+    immobilisations = somme_comptes(comptes, '2')
+    stocks_total = r["stocks_total"]
+    if date_fin:
+        solde_final = sum(soldes_au(date_fin).values())
+        total_versements = sum(f["versements"] for f in flux_caisses_cumules(avant=_avant(date_fin)).values())
+    else:
+        totaux_caisses = calculer_totaux_caisses()
+        solde_final = totaux_caisses['solde_final']
+        total_versements = totaux_caisses['versements']
+    resultat_op = r["resultat_op"]
 
     total_actif = immobilisations + stocks_total + solde_final + total_versements
     total_passif = capital + resultat_op
@@ -246,6 +171,94 @@ def _ctx_bilan(request):
         "total_actif": total_actif,
         "total_passif": total_passif,
         "today": date.today(),
+        "date_fin": date_fin,
+    }
+
+def _avant(date_fin):
+    """Borne incluse du formulaire -> borne exclusive des requêtes."""
+    return Periode.entre(fin_incluse=date_fin).fin
+
+def _ctx_balance(request):
+    date_debut, date_fin = _periode_from_request(request)
+    lignes = balance_generale(date_debut, _avant(date_fin))
+    return {
+        "lignes": lignes,
+        "total_debit": sum(l["debit"] for l in lignes),
+        "total_credit": sum(l["credit"] for l in lignes),
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+    }
+
+def _ctx_grand_livre(request):
+    date_debut, date_fin = _periode_from_request(request)
+    compte = (request.GET.get('compte') or '').strip()
+    caisse_id = lire_pk(request.GET.get('caisse'))
+    ouverture, lignes = (0, [])
+    if compte:
+        ouverture, lignes = grand_livre(compte, date_debut, _avant(date_fin), caisse_id=caisse_id)
+    return {
+        "compte": compte,
+        "caisse_id": caisse_id,
+        "caisses": referentiel.caisses(actifs=False),
+        "ouverture": ouverture,
+        "lignes": lignes,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+    }
+
+def _ctx_repartition(request):
+    date_debut, date_fin = _periode_from_request(request)
+    methode = methode_valide(request.GET.get('cle'))
+    lignes = resultat_par_page(Periode.entre(date_debut, date_fin), methode)
+    for ligne in lignes:
+        ligne["page"] = referentiel.page(ligne["page_id"])
+    return {
+        "lignes": lignes,
+        "totaux": {
+            cle: sum(l[cle] for l in lignes)
+            for cle in ("quantite", "chiffre_affaires", "marge", "quote_part", "marge_nette")
+        },
+        "methode": methode,
+        "methodes": RepartitionCharge.METHODES,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+    }
+
+def _ctx_livraisons(request):
+    date_debut, date_fin = _periode_from_request(request)
+    if date_debut is None and date_fin is None:
+        # Par défaut : le mois en cours
+        date_debut = debut_mois(date.today())
+    axe = request.GET.get('par') or 'categorie'
+    lignes = performances(Periode.entre(date_debut, date_fin), axe)
+    totaux = {
+        cle: sum(l[cle] for l in lignes)
+        for cle in ("commandes", "livrees", "reportees", "annulees", "frais_livraison", "frais_livreur", "marge")
+    }
+    totaux["taux_livraison"] = totaux["livrees"] / totaux["commandes"] if totaux["commandes"] else 0
+    totaux["taux_report"] = totaux["reportees"] / totaux["commandes"] if totaux["commandes"] else 0
+    totaux["marge_moyenne"] = round(totaux["marge"] / totaux["livrees"]) if totaux["livrees"] else 0
+    return {
+        "lignes": lignes,
+        "totaux": totaux,
+        "par": axe,
+        "axes": AXES_CHOIX,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+    }
+
+def _ctx_cloture(request):
+    derniere = Cloture.derniere()
+    prochain = mois_a_cloturer()
+    if prochain is None:
+        # Première clôture : par défaut le mois précédent
+        prochain = debut_mois(debut_mois(date.today()) - timedelta(days=1))
+    return {
+        "clotures": Cloture.objects.select_related("created_by")[:24],
+        "derniere_cloture": derniere,
+        "premiere_cloture": derniere is None,
+        "prochain_mois": prochain,
+        "cloturable": mois_suivant(prochain) <= debut_mois(date.today()),
     }
 
 # ---------- Nouvelles vues "container + sections" ----------
@@ -262,6 +275,16 @@ def statistiques_home(request):
         context.update(_ctx_compte_de_resultat(request))
     elif tab == 'bilan':
         context.update(_ctx_bilan(request))
+    elif tab == 'balance':
+        context.update(_ctx_balance(request))
+    elif tab == 'grand_livre':
+        context.update(_ctx_grand_livre(request))
+    elif tab == 'repartition':
+        context.update(_ctx_repartition(request))
+    elif tab == 'livraisons':
+        context.update(_ctx_livraisons(request))
+    elif tab == 'cloture':
+        context.update(_ctx_cloture(request))
     return render(request, "statistiques/statistiques.html", context)
 
 @login_required
@@ -270,12 +293,60 @@ def statistiques_section(request, section):
     # Renvoie UNIQUEMENT le fragment (HTMX)
     if section == 'rapport':
         ctx = _ctx_rapport_vente(request)
-        return render(request, "statistiques/_rapport_vente.html", ctx)
+        return render(request, "statistiques/rapport_vente.html", ctx)
     elif section == 'compte':
         ctx = _ctx_compte_de_resultat(request)
-        return render(request, "statistiques/_compte_de_resultat.html", ctx)
+        return render(request, "statistiques/compte_de_resultat.html", ctx)
     elif section == 'bilan':
         ctx = _ctx_bilan(request)
-        return render(request, "statistiques/_bilan.html", ctx)
+        return render(request, "statistiques/bilan.html", ctx)
+    elif section == 'balance':
+        ctx = _ctx_balance(request)
+        return render(request, "statistiques/balance.html", ctx)
+    elif section == 'grand_livre':
+        ctx = _ctx_grand_livre(request)
+        return render(request, "statistiques/grand_livre.html", ctx)
+    elif section == 'repartition':
+        ctx = _ctx_repartition(request)
+        return render(request, "statistiques/repartition.html", ctx)
+    elif section == 'livraisons':
+        ctx = _ctx_livraisons(request)
+        return render(request, "statistiques/livraisons.html", ctx)
+    elif section == 'cloture':
+        ctx = _ctx_cloture(request)
+        return render(request, "statistiques/cloture.html", ctx)
     # fallback
-    return render(request, "statistiques/_rapport_vente.html", _ctx_rapport_vente(request))
+    return render(request, "statistiques/rapport_vente.html", _ctx_rapport_vente(request))
+
+@login_required
+@admin_required
+@require_POST
+def cloturer_periode(request):
+    mois = lire_date(request.POST.get("mois"))
+    if mois is None:
+        messages.warning(request, "Mois à clôturer invalide.")
+        return redirect(f"{reverse('statistiques')}?tab=cloture")
+    try:
+        cloture = cloturer_mois(mois, user=request.user)
+    except ValidationError as e:
+        messages.error(request, " ".join(e.messages))
+    else:
+        messages.success(request, f"Période {cloture.periode:%m/%Y} clôturée.")
+    return redirect(f"{reverse('statistiques')}?tab=cloture")
+
+@login_required
+@admin_required
+@require_POST
+def rouvrir_periode(request):
+    password = request.POST.get('password')
+    user = authenticate(username=request.user.username, password=password)
+    if user is None:
+        messages.warning(request, "Mot de passe incorrect. Réouverture annulée.")
+        return redirect(f"{reverse('statistiques')}?tab=cloture")
+    try:
+        periode = rouvrir_derniere()
+    except ValidationError as e:
+        messages.error(request, " ".join(e.messages))
+    else:
+        messages.success(request, f"Période {periode:%m/%Y} réouverte.")
+    return redirect(f"{reverse('statistiques')}?tab=cloture")
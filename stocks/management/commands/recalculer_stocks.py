@@ -0,0 +1,12 @@
+# stocks/management/commands/recalculer_stocks.py
+from django.core.management.base import BaseCommand
+
+from stocks.reservation import recalculer
+
+
+class Command(BaseCommand):
+    help = "Recalcule le stock disponible de chaque article à partir des achats, commandes et inventaires."
+
+    def handle(self, *args, **options):
+        total = recalculer()
+        self.stdout.write(self.style.SUCCESS(f"Stock disponible recalculé pour {total} articles."))
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:28
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def remplir_stocks(apps, schema_editor):
+    # disponible = achats publiés - lignes des commandes actives + ajustements,
+    # en un GROUP BY article par source ; un compteur pour chaque article
+    Article = apps.get_model("articles", "Article")
+    Commande = apps.get_model("ventes", "Commande")
+    Inventaire = apps.get_model("stocks", "Inventaire")
+    LigneAchat = apps.get_model("achats", "LigneAchat")
+    LigneCommande = apps.get_model("ventes", "LigneCommande")
+    StockArticle = apps.get_model("stocks", "StockArticle")
+    liberes = ["Annulée", "Supprimée", "Reportée"]
+    commandes = (
+        Commande._base_manager.exclude(statut_publication="supprimé")
+        .exclude(statut_vente__in=liberes).exclude(statut_livraison__in=liberes)
+    )
+    sources = [
+        (LigneAchat.objects.filter(achat__statut_publication__iexact="publié"), "quantite", 1),
+        (LigneCommande._base_manager.filter(commande__in=commandes).exclude(statut_publication="supprimé"), "quantite", -1),
+        (Inventaire.objects.filter(statut_publication__iexact="publié"), "ajustement", 1),
+    ]
+    disponible = defaultdict(int)
+    for queryset, champ, signe in sources:
+        for article_id, total in queryset.order_by().values_list("article_id").annotate(total=Sum(champ)):
+            disponible[article_id] += signe * (total or 0)
+    StockArticle.objects.bulk_create(
+        [StockArticle(article_id=pk, disponible=disponible[pk]) for pk in Article.objects.values_list("pk", flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('achats', '0007_achat_total'),
+        ('articles', '0010_alter_article_reference'),
+        ('stocks', '0006_alter_inventaire_created_by_and_more'),
+        ('ventes', '0037_occupationjour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockArticle',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_disponible', serialize=False, to='articles.article')),
+                ('disponible', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(remplir_stocks, migrations.RunPython.noop),
+    ]
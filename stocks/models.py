@@ -11,3 +11,16 @@ class Inventaire(AuditMixin):
     def __str__(self):
         return f"Inventaire de {self.article.nom} le {self.date} : {self.ajustement}"
 
+
+
+class StockArticle(models.Model):
+    """
+    Quantité disponible d'un article : achats publiés - lignes des commandes
+    actives + ajustements d'inventaire. Compteur tenu par delta (stocks.signals)
+    et décrémenté par UPDATE conditionnel à la prise de commande.
+    """
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name="stock_disponible")
+    disponible = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.article} : {self.disponible} disponible(s)"
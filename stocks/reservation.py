@@ -0,0 +1,221 @@
+# stocks/reservation.py
+"""
+Compteur de stock disponible par article (StockArticle) et réservation à la
+prise de commande.
+
+disponible = achats publiés - lignes des commandes actives + ajustements
+d'inventaire. Chaque pièce (ligne d'achat, inventaire, ligne de commande...)
+a une « contribution » {article_id: quantité signée} ; les signaux appliquent
+la différence entre la contribution enregistrée et la nouvelle.
+
+Une hausse de consommation passe par un UPDATE conditionnel
+`disponible = disponible - q WHERE disponible >= q` : seule la ligne du
+compteur est verrouillée, jusqu'à la fin de la transaction de la commande,
+et deux saisies simultanées ne peuvent pas vendre la même dernière unité.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F, Sum
+
+from ventes.disponibilite import commandes_actives
+
+
+class StockInsuffisant(Exception):
+    """Réservation refusée ; `manquants` = [(article_id, demandé, disponible)]."""
+
+    def __init__(self, manquants):
+        self.manquants = manquants
+        super().__init__(manquants)
+
+
+def lignes_sorties():
+    """Lignes de commande qui consomment du stock (commandes actives, lignes non supprimées)."""
+    Commande = global_apps.get_model("ventes", "Commande")
+    LigneCommande = global_apps.get_model("ventes", "LigneCommande")
+    return LigneCommande._base_manager.filter(
+        commande__in=commandes_actives(Commande)
+    ).exclude(statut_publication="supprimé")
+
+
+def _total_par_article(queryset, champ, signe=1):
+    return {
+        article_id: signe * (total or 0)
+        for article_id, total in queryset.order_by().values_list("article_id").annotate(total=Sum(champ))
+    }
+
+
+def contribution(model, pk):
+    """{article_id: quantité signée} de la pièce `pk` telle qu'enregistrée en base."""
+    LigneAchat = global_apps.get_model("achats", "LigneAchat")
+    Inventaire = global_apps.get_model("stocks", "Inventaire")
+    label = model._meta.label
+    if not pk:
+        return {}
+    if label == "achats.LigneAchat":
+        return _total_par_article(LigneAchat.objects.filter(pk=pk, achat__statut_publication__iexact="publié"), "quantite")
+    if label == "achats.Achat":
+        return _total_par_article(LigneAchat.objects.filter(achat_id=pk, achat__statut_publication__iexact="publié"), "quantite")
+    if label == "stocks.Inventaire":
+        return _total_par_article(Inventaire.objects.filter(pk=pk, statut_publication__iexact="publié"), "ajustement")
+    if label == "ventes.LigneCommande":
+        return _total_par_article(lignes_sorties().filter(pk=pk), "quantite", -1)
+    if label == "ventes.Commande":
+        return _total_par_article(lignes_sorties().filter(commande_id=pk), "quantite", -1)
+    return {}
+
+
+def _contribution_commandes(commande_ids):
+    return _total_par_article(lignes_sorties().filter(commande_id__in=commande_ids), "quantite", -1)
+
+
+@contextmanager
+def suivi_commandes(commande_ids):
+    """
+    Pour les écritures en masse sur des commandes (update, bulk_create), qui
+    n'émettent pas de signal : applique au stock la différence de
+    consommation des `commande_ids` entre l'entrée et la sortie du bloc.
+    """
+    commande_ids = list(commande_ids)
+    avant = _contribution_commandes(commande_ids)
+    yield
+    appliquer(avant, _contribution_commandes(commande_ids))
+
+
+def _assurer(article_ids):
+    from .models import StockArticle
+
+    StockArticle.objects.bulk_create(
+        [StockArticle(article_id=article_id) for article_id in article_ids], ignore_conflicts=True,
+    )
+
+
+def verrouiller(article_ids):
+    """
+    Verrouille les compteurs des articles dans l'ordre des clés : deux
+    commandes qui touchent les mêmes articles les prennent dans le même
+    ordre (pas d'interblocage). À appeler dans la transaction de la commande.
+    """
+    from .models import StockArticle
+
+    article_ids = sorted({int(a) for a in article_ids if a})
+    _assurer(article_ids)
+    list(StockArticle.objects.select_for_update().filter(pk__in=article_ids).order_by("pk").values_list("pk"))
+
+
+def ajuster(deltas):
+    """Applique les `deltas` {article_id: +/- quantité} sans condition (entrées, libérations)."""
+    from .models import StockArticle
+
+    deltas = {article_id: d for article_id, d in deltas.items() if d}
+    _assurer(deltas)
+    for article_id in sorted(deltas):
+        StockArticle.objects.filter(pk=article_id).update(disponible=F("disponible") + deltas[article_id])
+
+
+@transaction.atomic
+def reserver(besoins):
+    """
+    Retire `besoins` {article_id: quantité} du disponible, article par
+    article et seulement s'il reste assez d'unités. Si un article manque,
+    rien n'est retiré et StockInsuffisant est levée.
+    """
+    from .models import StockArticle
+
+    besoins = {article_id: q for article_id, q in besoins.items() if q > 0}
+    _assurer(besoins)
+    manquants = []
+    for article_id in sorted(besoins):
+        quantite = besoins[article_id]
+        if not StockArticle.objects.filter(pk=article_id, disponible__gte=quantite).update(
+            disponible=F("disponible") - quantite
+        ):
+            manquants.append((article_id, quantite))
+    if manquants:
+        restants = disponibles([article_id for article_id, _ in manquants])
+        raise StockInsuffisant([(article_id, q, restants.get(article_id, 0)) for article_id, q in manquants])
+
+
+@transaction.atomic
+def appliquer(avant, apres, reservation=True):
+    """
+    Passe d'une contribution `avant` à `apres`. Les libérations et entrées
+    sont appliquées d'abord ; une baisse est réservée sous condition si
+    `reservation` (consommation de commande), forcée sinon (achat, inventaire).
+    """
+    deltas = defaultdict(int)
+    for article_id, quantite in apres.items():
+        deltas[article_id] += quantite
+    for article_id, quantite in avant.items():
+        deltas[article_id] -= quantite
+    ajuster({article_id: d for article_id, d in deltas.items() if d > 0})
+    baisses = {article_id: -d for article_id, d in deltas.items() if d < 0}
+    if reservation:
+        reserver(baisses)
+    else:
+        ajuster({article_id: -q for article_id, q in baisses.items()})
+
+
+def disponibles(article_ids=None):
+    """{article_id: disponible} lu dans les compteurs (une requête)."""
+    from .models import StockArticle
+
+    qs = StockArticle.objects.all()
+    if article_ids is not None:
+        qs = qs.filter(pk__in=article_ids)
+    return dict(qs.values_list("pk", "disponible"))
+
+
+def quantites(avant=None):
+    """
+    {article_id: disponible} recalculé depuis les pièces ; avec `avant`,
+    seulement les achats, commandes et inventaires datés avant ce jour.
+    """
+    LigneAchat = global_apps.get_model("achats", "LigneAchat")
+    Inventaire = global_apps.get_model("stocks", "Inventaire")
+
+    achats = LigneAchat.objects.filter(achat__statut_publication__iexact="publié")
+    sorties = lignes_sorties()
+    inventaires = Inventaire.objects.filter(statut_publication__iexact="publié")
+    if avant:
+        achats = achats.filter(achat__date__lt=avant)
+        sorties = sorties.filter(commande__date_commande__lt=avant)
+        inventaires = inventaires.filter(date__lt=avant)
+
+    disponible = defaultdict(int)
+    for totaux in (
+        _total_par_article(achats, "quantite"),
+        _total_par_article(sorties, "quantite", -1),
+        _total_par_article(inventaires, "ajustement"),
+    ):
+        for article_id, quantite in totaux.items():
+            disponible[article_id] += quantite
+    return disponible
+
+
+@transaction.atomic
+def recalculer():
+    """Recalcule tous les compteurs depuis les pièces ; retourne le nombre d'articles."""
+    Article = global_apps.get_model("articles", "Article")
+    StockArticle = global_apps.get_model("stocks", "StockArticle")
+
+    disponible = quantites()
+    StockArticle.objects.all().delete()
+    objs = StockArticle.objects.bulk_create(
+        [StockArticle(article_id=pk, disponible=disponible.get(pk, 0)) for pk in Article.objects.values_list("pk", flat=True)],
+        batch_size=1000,
+    )
+    return len(objs)
+
+
+def message_stock_insuffisant(manquants):
+    from articles.models import Article
+
+    noms = Article.objects.in_bulk([article_id for article_id, _, _ in manquants])
+    details = ", ".join(
+        f"{noms[article_id].nom if article_id in noms else article_id} : {demande} demandé(s), {dispo} en stock"
+        for article_id, demande, dispo in manquants
+    )
+    return f"Stock insuffisant — {details}."
@@ -0,0 +1,43 @@
+# stocks/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from achats.models import Achat, LigneAchat
+from ventes.models import Commande, LigneCommande
+from .models import Inventaire
+from .reservation import appliquer, contribution
+
+# Pièces qui font varier le disponible -> consommation réservée sous condition ?
+SOURCES = {
+    LigneAchat: False,
+    Achat: False,
+    Inventaire: False,
+    LigneCommande: True,
+    Commande: True,
+}
+# Les pièces parentes ne suivent que leurs changements de statut : leurs
+# lignes suivent elles-mêmes la suppression (sinon double compte en cascade)
+PARENTS = (Achat, Commande)
+CHAMPS_STATUT = {"statut_vente", "statut_livraison", "statut_publication"}
+
+
+def noter_contribution(sender, instance, update_fields=None, **kwargs):
+    if sender in PARENTS and update_fields is not None and not CHAMPS_STATUT & set(update_fields):
+        return
+    instance._stock_avant = contribution(sender, instance.pk)
+
+
+def maj_stock(sender, instance, signal, **kwargs):
+    avant = instance.__dict__.pop("_stock_avant", None)
+    if avant is None:
+        return
+    apres = {} if signal is post_delete else contribution(sender, instance.pk)
+    appliquer(avant, apres, reservation=SOURCES[sender])
+
+
+for modele in SOURCES:
+    label = modele._meta.label
+    pre_save.connect(noter_contribution, sender=modele, dispatch_uid=f"stock_avant_save_{label}")
+    post_save.connect(maj_stock, sender=modele, dispatch_uid=f"stock_save_{label}")
+    if modele not in PARENTS:
+        pre_delete.connect(noter_contribution, sender=modele, dispatch_uid=f"stock_avant_delete_{label}")
+        post_delete.connect(maj_stock, sender=modele, dispatch_uid=f"stock_delete_{label}")
@@ -1,3 +1,91 @@
-from django.test import TestCase
+import threading
+from datetime import date
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from achats.models import Achat, LigneAchat
+from articles.models import Article
+from clients.models import Client
+from ventes.models import Commande, LigneCommande
+from .models import StockArticle
+from .reservation import StockInsuffisant, disponibles, quantites, reserver
+
+
+def creer_article(reference, stock=0):
+    article = Article.objects.create(reference=reference, nom=reference, prix_achat=100, prix_vente=200)
+    if stock:
+        achat = Achat.objects.create(date=date(2024, 1, 1))
+        LigneAchat.objects.create(achat=achat, article=article, pu=100, quantite=stock)
+    return article
+
+
+def commander(article, quantite, client):
+    commande = Commande.objects.create(client=client, page=None)
+    LigneCommande.objects.create(
+        commande=commande, article=article, quantite=quantite, prix_unitaire=200, prix_achat=100,
+    )
+    return commande
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.client_vente = Client.objects.create(nom="Client", contact="0340000000")
+
+    def test_achat_et_commande_tiennent_le_compteur(self):
+        article = creer_article("VELO", stock=3)
+        commander(article, 2, self.client_vente)
+        self.assertEqual(disponibles([article.pk]), {article.pk: 1})
+        self.assertEqual(quantites()[article.pk], 1)
+
+    def test_derniere_unite_vendue_une_seule_fois(self):
+        article = creer_article("VELO", stock=1)
+        commander(article, 1, self.client_vente)
+        with self.assertRaises(StockInsuffisant) as erreur:
+            with transaction.atomic():
+                commander(article, 1, self.client_vente)
+        self.assertEqual(erreur.exception.manquants, [(article.pk, 1, 0)])
+        self.assertEqual(disponibles([article.pk]), {article.pk: 0})
+        self.assertEqual(LigneCommande.objects.filter(article=article).count(), 1)
+
+    def test_reservation_tout_ou_rien(self):
+        velo, casque = creer_article("VELO", stock=2), creer_article("CASQUE", stock=1)
+        with self.assertRaises(StockInsuffisant):
+            with transaction.atomic():
+                reserver({velo.pk: 1, casque.pk: 2})
+        self.assertEqual(disponibles([velo.pk, casque.pk]), {velo.pk: 2, casque.pk: 1})
+
+    def test_annulation_libere_le_stock(self):
+        article = creer_article("VELO", stock=1)
+        commande = commander(article, 1, self.client_vente)
+        commande.statut_vente = "Annulée"
+        commande.save(update_fields=["statut_vente"])
+        self.assertEqual(disponibles([article.pk]), {article.pk: 1})
+
+
+class ReservationConcurrenteTests(TransactionTestCase):
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_deux_transactions_pour_la_derniere_unite(self):
+        article = creer_article("VELO", stock=1)
+        depart = threading.Barrier(2)
+        resultats = []
+
+        def reserver_une():
+            try:
+                depart.wait()
+                with transaction.atomic():
+                    reserver({article.pk: 1})
+                resultats.append("ok")
+            except StockInsuffisant:
+                resultats.append("refus")
+            finally:
+                connection.close()
+
+        fils = [threading.Thread(target=reserver_une) for _ in range(2)]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+
+        self.assertEqual(sorted(resultats), ["ok", "refus"])
+        self.assertEqual(StockArticle.objects.get(pk=article.pk).disponible, 0)
@@ -1,45 +1,22 @@
+from django.db.models import F, Sum
+
 from articles.models import Article
-from achats.models import LigneAchat
-from ventes.models import LigneCommande
-from .models import Inventaire
-from django.db.models import Sum, Q
+from .models import StockArticle
+from .reservation import disponibles, quantites
+
 
 def calculer_stock_article(article):
-    entrees = (
-        LigneAchat.objects.filter(
-            achat__statut_publication__iexact="publié",
-            article=article
-        )
-        .aggregate(total=Sum("quantite"))["total"] or 0
-    )
+    # Compteur tenu par stocks.reservation (achats - commandes actives + inventaires)
+    return disponibles([article.pk]).get(article.pk, 0)
 
-    sorties = (
-        LigneCommande.objects.filter(
-            commande__statut_publication__iexact="publié",
-            # On EXCLUT les ventes non comptabilisées
-        )
-        .exclude(commande__statut_vente__in=["Supprimée", "Annulée", "Reportée"])
-        .filter(article=article)
-        .aggregate(total=Sum("quantite"))["total"] or 0
-    )
 
-    ajustements = (
-        Inventaire.objects.filter(
-            statut_publication__iexact="publié",
-            article=article
+def calculer_total_stock(avant=None):
+    """Valeur du stock au prix d'achat : compteurs courants, ou reconstituée à la veille de `avant`."""
+    if avant is None:
+        return (
+            StockArticle.objects.filter(disponible__gt=0)
+            .aggregate(total=Sum(F("disponible") * F("article__prix_achat")))["total"] or 0
         )
-        .aggregate(total=Sum("ajustement"))["total"] or 0
-    )
-
-    return entrees - sorties + ajustements
-
-def calculer_total_stock():
-    total_valeur = 0
-    articles = Article.objects.all()
-
-    for article in articles:
-        stock = calculer_stock_article(article)
-        valeur = stock * article.prix_achat if stock > 0 else 0
-        total_valeur += valeur
-
-    return total_valeur
+    en_stock = {article_id: q for article_id, q in quantites(avant).items() if q > 0}
+    prix = Article.objects.filter(pk__in=en_stock).values_list("pk", "prix_achat")
+    return sum(en_stock[article_id] * (prix_achat or 0) for article_id, prix_achat in prix)
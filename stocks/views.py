@@ -14,8 +14,8 @@ from common.utils import is_admin, resolve_display_mode
 from .models import Inventaire
 from articles.models import Article
 from achats.models import LigneAchat
-from ventes.models import LigneCommande
 from .forms import InventaireForm 
+from .reservation import lignes_sorties
 
 def build_etat_stock_context(request):
     query = request.GET.get("q", "").strip()
@@ -35,11 +35,8 @@ def build_etat_stock_context(request):
         achat__statut_publication__iexact="publié"
     ).values("article_id").annotate(total_entrees=Sum("quantite"))
 
-    commandes_valides = LigneCommande.objects.filter(
-        commande__statut_publication__iexact="publié"
-    ).exclude(
-        commande__statut_vente__in=["Supprimée", "Annulée", "Reportée"]
-    ).values("article_id").annotate(total_sorties=Sum("quantite"))
+    # Même définition que le compteur de stock disponible (stocks.reservation)
+    commandes_valides = lignes_sorties().values("article_id").annotate(total_sorties=Sum("quantite"))
 
     inventaires_valides = Inventaire.objects.filter(
         statut_publication__iexact="publié"
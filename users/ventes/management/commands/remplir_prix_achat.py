@@ -1,24 +1,23 @@
 # ventes/management/commands/remplir_prix_achat.py
 
-from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+from common.backfill import BackfillCommand
+from articles.models import Article
 from ventes.models import LigneCommande
 
-class Command(BaseCommand):
+class Command(BackfillCommand):
     help = "Remplit le champ prix_achat des lignes de commande à partir du prix d'achat de l'article"
 
-    def handle(self, *args, **kwargs):
-        lignes = LigneCommande.objects.filter(prix_achat__isnull=True).select_related('article')
-        total = lignes.count()
+    def get_queryset(self):
+        return LigneCommande.objects.filter(
+            prix_achat__isnull=True,
+            article__prix_achat__isnull=False,
+        )
 
-        if total == 0:
-            self.stdout.write(self.style.SUCCESS("Aucune ligne à mettre à jour."))
-            return
-
-        updated = 0
-        for ligne in lignes:
-            if ligne.article and ligne.article.prix_achat is not None:
-                ligne.prix_achat = ligne.article.prix_achat
-                ligne.save(update_fields=['prix_achat'])
-                updated += 1
-
-        self.stdout.write(self.style.SUCCESS(f"{updated} lignes mises à jour sur {total}."))
\ No newline at end of file
+    def get_updates(self):
+        # UPDATE ... SET prix_achat = (SELECT prix_achat FROM article WHERE id = article_id)
+        return {
+            "prix_achat": Subquery(
+                Article.objects.filter(pk=OuterRef("article_id")).values("prix_achat")[:1]
+            ),
+        }
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VentesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ventes'
+
+    def ready(self):
+        import ventes.signals
@@ -0,0 +1,342 @@
+# ventes/disponibilite.py
+"""
+Disponibilité des articles loués sur une période.
+
+Chaque ligne d'une commande active occupe son article sur
+[date_debut_prestation, date_fin_prestation] ; ces intervalles sont copiés
+dans OccupationArticle (index article, debut, fin). Une question « combien
+de X sont libres du D1 au D2 » ne lit donc que les intervalles de X qui
+chevauchent la période, puis un balayage (sweep-line) des débuts/fins donne
+le pic d'utilisation simultanée.
+
+Pour les grilles (articles × jours), OccupationJour stocke en plus le total
+utilisé par article et par jour : il est recalculé, sur la seule plage de
+dates touchée, chaque fois que les intervalles d'une commande changent.
+
+Parc d'un article = quantités achetées + ajustements d'inventaire : une
+location occupe l'article sans le sortir du parc. Un article sans achat ni
+inventaire n'a pas de parc connu (None) et n'est pas contrôlé.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Max, Min, Q, Sum
+
+from common.backfill import DEFAULT_BATCH_SIZE, iter_pk_batches
+from common.utils import Periode
+
+# Commandes qui ne retiennent plus leurs articles
+STATUTS_LIBERES = ["Annulée", "Supprimée", "Reportée"]
+
+
+def commandes_actives(Commande):
+    return (
+        Commande._base_manager.exclude(statut_publication="supprimé")
+        .exclude(statut_vente__in=STATUTS_LIBERES)
+        .exclude(statut_livraison__in=STATUTS_LIBERES)
+    )
+
+
+def intervalle(debut, fin):
+    """Dates de prestation (incluses) -> [debut, fin) ; une date manquante vaut l'autre."""
+    debut = debut or fin
+    fin = fin or debut
+    if fin < debut:
+        fin = debut
+    return debut, fin + timedelta(days=1)
+
+
+def _occupations(commande_ids):
+    Commande = global_apps.get_model("ventes", "Commande")
+    LigneCommande = global_apps.get_model("ventes", "LigneCommande")
+    OccupationArticle = global_apps.get_model("ventes", "OccupationArticle")
+    dates = {
+        pk: intervalle(debut, fin)
+        for pk, debut, fin in commandes_actives(Commande).filter(pk__in=commande_ids)
+        .values_list("pk", "date_debut_prestation", "date_fin_prestation")
+        if debut or fin
+    }
+    lignes = (
+        LigneCommande._base_manager.filter(commande_id__in=list(dates), quantite__gt=0)
+        .exclude(statut_publication="supprimé")
+        .values_list("pk", "commande_id", "article_id", "quantite")
+    )
+    return [
+        OccupationArticle(
+            ligne_id=pk, commande_id=commande_id, article_id=article_id, quantite=quantite,
+            debut=dates[commande_id][0], fin=dates[commande_id][1],
+        )
+        for pk, commande_id, article_id, quantite in lignes
+    ]
+
+
+def _plages(intervalles):
+    """{article_id: (premier debut, dernière fin)} des (article_id, debut, fin)."""
+    plages = {}
+    for article_id, debut, fin in intervalles:
+        if article_id in plages:
+            d, f = plages[article_id]
+            debut, fin = min(d, debut), max(f, fin)
+        plages[article_id] = (debut, fin)
+    return plages
+
+
+def _recalculer_jours(plages, effacer=True):
+    """
+    Réécrit OccupationJour de chaque article de `plages` sur sa plage
+    [debut, fin), en sommant les intervalles qui la chevauchent (tableau de
+    différences puis somme cumulée ; seuls les jours occupés sont écrits).
+    """
+    OccupationArticle = global_apps.get_model("ventes", "OccupationArticle")
+    OccupationJour = global_apps.get_model("ventes", "OccupationJour")
+    if not plages:
+        return 0
+    debut_min = min(debut for debut, _ in plages.values())
+    fin_max = max(fin for _, fin in plages.values())
+
+    differences = defaultdict(lambda: defaultdict(int))
+    for article_id, debut, fin, quantite in (
+        OccupationArticle.objects.filter(article_id__in=list(plages), debut__lt=fin_max, fin__gt=debut_min)
+        .order_by().values_list("article_id", "debut", "fin", "quantite")
+    ):
+        p_debut, p_fin = plages[article_id]
+        debut, fin = max(debut, p_debut), min(fin, p_fin)
+        if debut < fin:
+            differences[article_id][debut] += quantite
+            differences[article_id][fin] -= quantite
+
+    lignes = []
+    for article_id, (debut, fin) in plages.items():
+        diff = differences.get(article_id, {})
+        courant = 0
+        for i in range((fin - debut).days):
+            jour = debut + timedelta(days=i)
+            courant += diff.get(jour, 0)
+            if courant:
+                lignes.append(OccupationJour(jour=jour, article_id=article_id, quantite=courant))
+
+    if effacer:
+        anciennes = Q()
+        for article_id, (debut, fin) in plages.items():
+            anciennes |= Q(article_id=article_id, jour__gte=debut, jour__lt=fin)
+        OccupationJour.objects.filter(anciennes).delete()
+    OccupationJour.objects.bulk_create(lignes, batch_size=DEFAULT_BATCH_SIZE)
+    return len(lignes)
+
+
+@transaction.atomic
+def maj_occupations(commande_ids):
+    """
+    Remplace les intervalles des commandes `commande_ids` (retirés si
+    inactives) et recalcule l'occupation journalière des dates touchées.
+    """
+    OccupationArticle = global_apps.get_model("ventes", "OccupationArticle")
+    commande_ids = [pk for pk in commande_ids if pk]
+    if not commande_ids:
+        return
+    anciennes = OccupationArticle.objects.filter(commande_id__in=commande_ids)
+    touches = list(anciennes.values_list("article_id", "debut", "fin"))
+    anciennes.delete()
+    nouvelles = OccupationArticle.objects.bulk_create(_occupations(commande_ids))
+    touches += [(o.article_id, o.debut, o.fin) for o in nouvelles]
+    _recalculer_jours(_plages(touches))
+
+
+def reconstruire_occupations(batch_size=DEFAULT_BATCH_SIZE):
+    """Régénère toute la table par lots de commandes ; retourne le nombre d'intervalles."""
+    Commande = global_apps.get_model("ventes", "Commande")
+    OccupationArticle = global_apps.get_model("ventes", "OccupationArticle")
+    total = 0
+    with transaction.atomic():
+        OccupationArticle.objects.all().delete()
+        for pks in iter_pk_batches(commandes_actives(Commande), batch_size):
+            total += len(OccupationArticle.objects.bulk_create(_occupations(pks), batch_size=batch_size))
+    return total
+
+
+@transaction.atomic
+def reconstruire_jours(batch_size=200):
+    """Régénère OccupationJour par lots d'articles ; retourne le nombre de lignes."""
+    OccupationArticle = global_apps.get_model("ventes", "OccupationArticle")
+    OccupationJour = global_apps.get_model("ventes", "OccupationJour")
+    OccupationJour.objects.all().delete()
+    plages = list(
+        OccupationArticle.objects.order_by("article_id")
+        .values_list("article_id").annotate(debut=Min("debut"), fin=Max("fin"))
+    )
+    total = 0
+    for i in range(0, len(plages), batch_size):
+        lot = {article_id: (debut, fin) for article_id, debut, fin in plages[i:i + batch_size]}
+        total += _recalculer_jours(lot, effacer=False)
+    return total
+
+
+def parcs(article_ids=None):
+    """
+    {article_id: parc ou None} en deux GROUP BY (achats publiés + ajustements
+    d'inventaire). Sans `article_ids` : tous les articles ayant un parc connu.
+    """
+    from achats.models import LigneAchat
+    from stocks.models import Inventaire
+
+    achats = LigneAchat.objects.filter(achat__statut_publication__iexact="publié")
+    inventaires = Inventaire.objects.filter(statut_publication__iexact="publié")
+    if article_ids is not None:
+        achats = achats.filter(article_id__in=article_ids)
+        inventaires = inventaires.filter(article_id__in=article_ids)
+
+    parc = defaultdict(int)
+    for article_id, total in achats.order_by().values_list("article_id").annotate(total=Sum("quantite")):
+        parc[article_id] += total or 0
+    for article_id, total in inventaires.order_by().values_list("article_id").annotate(total=Sum("ajustement")):
+        parc[article_id] += total or 0
+    if article_ids is None:
+        return dict(parc)
+    return {article_id: parc.get(article_id) for article_id in article_ids}
+
+
+def _intervalles(periode, article_ids=None, exclure_commande=None):
+    """Intervalles qui chevauchent la période : debut < fin_periode AND fin > debut_periode."""
+    from .models import OccupationArticle
+
+    qs = OccupationArticle.objects.filter(debut__lt=periode.fin, fin__gt=periode.debut)
+    if article_ids is not None:
+        qs = qs.filter(article_id__in=article_ids)
+    if exclure_commande:
+        qs = qs.exclude(commande_id=exclure_commande)
+    return qs.order_by().values_list("article_id", "debut", "fin", "quantite")
+
+
+def _pic(intervalles, periode):
+    """
+    Nombre maximal d'unités utilisées en même temps sur la période.
+    Balayage : +q au début, -q à la fin de chaque intervalle (tronqué à la
+    période) ; à date égale les fins passent avant les débuts (demi-ouvert).
+    """
+    evenements = []
+    for debut, fin, quantite in intervalles:
+        debut, fin = max(debut, periode.debut), min(fin, periode.fin)
+        if debut < fin:
+            evenements.append((debut, quantite))
+            evenements.append((fin, -quantite))
+    evenements.sort(key=lambda e: (e[0], e[1]))
+    courant = pic = 0
+    for _, delta in evenements:
+        courant += delta
+        pic = max(pic, courant)
+    return pic
+
+
+def pics(periode, article_ids, exclure_commande=None):
+    """{article_id: nombre maximal d'unités utilisées en même temps sur la période}."""
+    par_article = defaultdict(list)
+    for article_id, debut, fin, quantite in _intervalles(periode, article_ids, exclure_commande):
+        par_article[article_id].append((debut, fin, quantite))
+
+    resultat = dict.fromkeys(article_ids, 0)
+    for article_id, intervalles in par_article.items():
+        resultat[article_id] = _pic(intervalles, periode)
+    return resultat
+
+
+def disponibilites(debut, fin, article_ids, exclure_commande=None):
+    """{article_id: {"parc", "utilises", "libres"}} du `debut` au `fin` (dates incluses)."""
+    article_ids = list(article_ids)
+    periode = Periode(*intervalle(debut, fin))
+    parc = parcs(article_ids)
+    utilises = pics(periode, article_ids, exclure_commande)
+    return {
+        article_id: {
+            "parc": parc[article_id],
+            "utilises": utilises[article_id],
+            "libres": None if parc[article_id] is None else max(parc[article_id] - utilises[article_id], 0),
+        }
+        for article_id in article_ids
+    }
+
+
+def surreservations(besoins, debut, fin, exclure_commande=None):
+    """
+    `besoins` : {article_id: quantité demandée}. Retourne la liste des
+    (article_id, demandé, libres) qui dépassent le parc disponible.
+    """
+    if not besoins:
+        return []
+    dispo = disponibilites(debut, fin, besoins, exclure_commande)
+    return [
+        (article_id, quantite, dispo[article_id]["libres"])
+        for article_id, quantite in besoins.items()
+        if dispo[article_id]["libres"] is not None and quantite > dispo[article_id]["libres"]
+    ]
+
+
+def calendrier(periode, article_ids=None):
+    """
+    Occupation journalière lue dans OccupationJour : une seule requête sur
+    la plage de jours (index jour, article), jours libres remplis à 0.
+    Retourne (jours, {article_id: [unités utilisées par jour]}).
+    """
+    from .models import OccupationJour
+
+    nb_jours = (periode.fin - periode.debut).days
+    jours = [periode.debut + timedelta(days=i) for i in range(nb_jours)]
+    qs = periode.filtrer(OccupationJour.objects.all(), "jour")
+    if article_ids is not None:
+        qs = qs.filter(article_id__in=article_ids)
+
+    occupation = {}
+    for article_id, jour, quantite in qs.order_by().values_list("article_id", "jour", "quantite"):
+        occupation.setdefault(article_id, [0] * nb_jours)[(jour - periode.debut).days] = quantite
+    return jours, occupation
+
+
+class ControleLot:
+    """
+    Disponibilité pour une saisie en lot : parcs et intervalles existants
+    sont lus une fois pour toute la plage du lot, puis chaque commande
+    acceptée (`ajouter`) compte pour les suivantes, en mémoire.
+    `demandes` : [(date_debut, date_fin, article_ids)] des commandes du lot.
+    """
+
+    def __init__(self, demandes):
+        demandes = [(intervalle(debut, fin), ids) for debut, fin, ids in demandes if ids]
+        article_ids = sorted({article_id for _, ids in demandes for article_id in ids})
+        self.parc = parcs(article_ids) if article_ids else {}
+        self.intervalles = defaultdict(list)
+        if demandes:
+            globale = Periode(min(d for (d, _), _ in demandes), max(f for (_, f), _ in demandes))
+            controles = [article_id for article_id in article_ids if self.parc[article_id] is not None]
+            for article_id, debut, fin, quantite in _intervalles(globale, controles):
+                self.intervalles[article_id].append((debut, fin, quantite))
+
+    def conflits(self, besoins, debut, fin):
+        """[(article_id, demandé, libres)] comme surreservations()."""
+        periode = Periode(*intervalle(debut, fin))
+        resultat = []
+        for article_id, quantite in besoins.items():
+            parc = self.parc.get(article_id)
+            if parc is None:
+                continue
+            libres = max(parc - _pic(self.intervalles[article_id], periode), 0)
+            if quantite > libres:
+                resultat.append((article_id, quantite, libres))
+        return resultat
+
+    def ajouter(self, besoins, debut, fin):
+        debut, fin = intervalle(debut, fin)
+        for article_id, quantite in besoins.items():
+            if self.parc.get(article_id) is not None:
+                self.intervalles[article_id].append((debut, fin, quantite))
+
+
+def message_surreservation(conflits):
+    from articles.models import Article
+
+    noms = Article.objects.in_bulk([article_id for article_id, _, _ in conflits])
+    details = ", ".join(
+        f"{noms[article_id].nom if article_id in noms else article_id} : {demande} demandé(s), {libres} libre(s)"
+        for article_id, demande, libres in conflits
+    )
+    return f"Disponibilité insuffisante sur la période de prestation — {details}."
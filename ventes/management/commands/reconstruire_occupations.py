@@ -0,0 +1,13 @@
+# ventes/management/commands/reconstruire_occupations.py
+from django.core.management.base import BaseCommand
+
+from ventes.disponibilite import reconstruire_jours, reconstruire_occupations
+
+
+class Command(BaseCommand):
+    help = "Régénère les intervalles d'occupation des articles et l'occupation journalière à partir des commandes actives."
+
+    def handle(self, *args, **options):
+        total = reconstruire_occupations()
+        jours = reconstruire_jours()
+        self.stdout.write(self.style.SUCCESS(f"{total} intervalles d'occupation et {jours} jours d'occupation écrits."))
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:22
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remplir_occupations(apps, schema_editor):
+    # Un intervalle [debut, fin) par ligne des commandes actives datées ;
+    # une date de prestation manquante vaut l'autre
+    Commande = apps.get_model("ventes", "Commande")
+    LigneCommande = apps.get_model("ventes", "LigneCommande")
+    OccupationArticle = apps.get_model("ventes", "OccupationArticle")
+    liberes = ["Annulée", "Supprimée", "Reportée"]
+    commandes = (
+        Commande._base_manager.exclude(statut_publication="supprimé")
+        .exclude(statut_vente__in=liberes).exclude(statut_livraison__in=liberes)
+        .filter(models.Q(date_debut_prestation__isnull=False) | models.Q(date_fin_prestation__isnull=False))
+    )
+    dates = {}
+    for pk, debut, fin in commandes.values_list("pk", "date_debut_prestation", "date_fin_prestation").iterator():
+        debut, fin = debut or fin, fin or debut
+        dates[pk] = (debut, max(fin, debut) + timedelta(days=1))
+    lignes = (
+        LigneCommande._base_manager.filter(commande_id__in=commandes.values("pk"), quantite__gt=0)
+        .exclude(statut_publication="supprimé")
+        .values_list("pk", "commande_id", "article_id", "quantite")
+    )
+    OccupationArticle.objects.bulk_create(
+        (
+            OccupationArticle(
+                ligne_id=pk, commande_id=commande_id, article_id=article_id, quantite=quantite,
+                debut=dates[commande_id][0], fin=dates[commande_id][1],
+            )
+            for pk, commande_id, article_id, quantite in lignes.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0010_alter_article_reference'),
+        ('ventes', '0035_alter_vente_paiement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupationArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('debut', models.DateField()),
+                ('fin', models.DateField()),
+                ('quantite', models.PositiveIntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='articles.article')),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations', to='ventes.commande')),
+                ('ligne', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='occupation', to='ventes.lignecommande')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['article', 'debut', 'fin'], name='occupation_article_idx')],
+            },
+        ),
+        migrations.RunPython(remplir_occupations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:25
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def remplir_jours(apps, schema_editor):
+    # Unités utilisées par article et par jour occupé : somme cumulée des
+    # +quantité au début / -quantité à la fin de chaque intervalle
+    OccupationArticle = apps.get_model("ventes", "OccupationArticle")
+    OccupationJour = apps.get_model("ventes", "OccupationJour")
+    differences = defaultdict(lambda: defaultdict(int))
+    for article_id, debut, fin, quantite in OccupationArticle.objects.values_list(
+        "article_id", "debut", "fin", "quantite"
+    ).iterator():
+        differences[article_id][debut] += quantite
+        differences[article_id][fin] -= quantite
+
+    lignes = []
+    for article_id, diff in differences.items():
+        jour, fin = min(diff), max(diff)
+        courant = 0
+        while jour < fin:
+            courant += diff.get(jour, 0)
+            if courant:
+                lignes.append(OccupationJour(jour=jour, article_id=article_id, quantite=courant))
+            jour += timedelta(days=1)
+    OccupationJour.objects.bulk_create(lignes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0010_alter_article_reference'),
+        ('ventes', '0036_occupationarticle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupationJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('quantite', models.PositiveIntegerField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupations_jours', to='articles.article')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='occupationjour',
+            constraint=models.UniqueConstraint(fields=('jour', 'article'), name='occupation_jour_uniq'),
+        ),
+        migrations.RunPython(remplir_jours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventes', '0037_occupationjour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurFacture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefixe', models.CharField(max_length=20, unique=True)),
+                ('dernier', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
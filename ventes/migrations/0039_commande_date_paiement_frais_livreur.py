@@ -0,0 +1,32 @@
+# Generated by Django 4.2.23 on 2026-10-19 16:06
+
+from django.db import migrations, models
+from django.db.models import F
+
+from common.backfill import backfill_update
+
+
+def dater_reglements(apps, schema_editor):
+    # Jour du règlement inconnu pour l'historique : le jour de livraison, qui
+    # laisse les soldes des livreurs inchangés
+    Commande = apps.get_model('ventes', 'Commande')
+    backfill_update(
+        Commande.objects.filter(paiement_frais_livreur='Payée', date_livraison__isnull=False),
+        {'date_paiement_frais_livreur': F('date_livraison')},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventes', '0038_compteurfacture'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commande',
+            name='date_paiement_frais_livreur',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(dater_reglements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-19 15:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('livraison', '0011_voisinage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ventes', '0039_commande_date_paiement_frais_livreur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommandeStatutEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('champ', models.CharField(choices=[('livraison', 'Livraison'), ('vente', 'Vente')], max_length=10)),
+                ('ancien', models.CharField(blank=True, max_length=20)),
+                ('nouveau', models.CharField(max_length=20)),
+                ('date_livraison', models.DateField(blank=True, null=True)),
+                ('cree_le', models.DateTimeField(default=django.utils.timezone.now)),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='evenements_statut', to='ventes.commande')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('livreur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='livraison.livreur')),
+            ],
+            options={
+                'ordering': ['cree_le', 'id'],
+                'indexes': [models.Index(fields=['champ', 'nouveau', 'cree_le'], name='statut_event_nouveau_idx'), models.Index(fields=['livreur', 'cree_le'], name='statut_event_livreur_idx'), models.Index(fields=['commande', 'cree_le'], name='statut_event_commande_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models, transaction, IntegrityError
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -40,6 +41,8 @@ class Commande(AuditMixin):
         choices=FRAIS_LIVREUR_CHOIX,
         default='Non payée'
     )
+    # Jour du règlement des frais par la caisse (livraison.reglement) : mouvement du compte livreur
+    date_paiement_frais_livreur = models.DateField(null=True, blank=True, editable=False)
     cours_devise = models.IntegerField(null=True, blank=True)
 
     def __str__(self):
@@ -95,28 +98,42 @@ class Commande(AuditMixin):
     
     @classmethod
     def generer_numero_facture_atomic(cls, prefix: str = "bim", serie: str = "B", padding: int = 3) -> str:
+        return cls.generer_numeros_factures(1, prefix, serie, padding)[0]
+
+    @classmethod
+    def generer_numeros_factures(cls, nombre: int, prefix: str = "bim", serie: str = "B", padding: int = 3) -> list:
+        """
+        `nombre` numéros consécutifs de la série du mois (bloc pour la saisie
+        en lot), pris sur le compteur de la série verrouillé (CompteurFacture) :
+        deux allocations simultanées ne peuvent pas se chevaucher.
+        """
         with transaction.atomic():
             date_str = timezone.now().strftime("%y%m")
             full_prefix = f"{prefix}{date_str}-{serie}"  # ex: 'bim2509-B'
 
-            # On verrouille les lignes correspondantes pour éviter les collisions
-            last_commande = (
-                cls.objects
-                .select_for_update(skip_locked=True)
-                .filter(numero_facture__startswith=full_prefix)
-                .order_by("-id")  # plus fiable que l'ordre lexicographique sur le code
-                .first()
-            )
+            compteur = CompteurFacture.verrouiller(full_prefix, lambda: cls._dernier_numero(full_prefix))
+            debut = compteur.dernier
+            compteur.dernier += nombre
+            compteur.save(update_fields=["dernier"])
 
-            last_seq = 0
-            if last_commande and last_commande.numero_facture:
-                # extrait les chiffres terminaux (ex: 'bim2509-B001' -> '001')
-                m = re.search(r'(\d+)$', last_commande.numero_facture)
-                if m:
-                    last_seq = int(m.group(1))  # ex: 1
+            # ex: ['bim2509-B002', 'bim2509-B003', ...]
+            return [f"{full_prefix}{str(debut + i).zfill(padding)}" for i in range(1, nombre + 1)]
 
-            new_seq = last_seq + 1
-            return f"{full_prefix}{str(new_seq).zfill(padding)}"  # ex: 'bim2509-B002'
+    @classmethod
+    def _dernier_numero(cls, full_prefix: str) -> int:
+        """Dernier numéro déjà attribué dans la série (avant la création de son compteur)."""
+        last_commande = (
+            cls._base_manager
+            .filter(numero_facture__startswith=full_prefix)
+            .order_by("-id")  # plus fiable que l'ordre lexicographique sur le code
+            .first()
+        )
+        if last_commande and last_commande.numero_facture:
+            # extrait les chiffres terminaux (ex: 'bim2509-B001' -> '001')
+            m = re.search(r'(\d+)$', last_commande.numero_facture)
+            if m:
+                return int(m.group(1))  # ex: 1
+        return 0
 
 
 
@@ -165,3 +182,105 @@ class Vente(AuditMixin):
 
     def __str__(self):
         return f"Vente {self.commande.numero_facture} - Total : {self.total} Ar"
+
+
+class OccupationArticle(models.Model):
+    """
+    Intervalle d'utilisation d'un article par une ligne de commande :
+    [debut, fin) avec fin = date_fin_prestation + 1 jour. Seules les
+    commandes actives (ni annulées, ni supprimées, ni reportées) y figurent ;
+    tenu à jour par ventes.disponibilite.
+    """
+    ligne = models.OneToOneField(LigneCommande, on_delete=models.CASCADE, related_name="occupation")
+    commande = models.ForeignKey(Commande, on_delete=models.CASCADE, related_name="occupations")
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name="occupations")
+    debut = models.DateField()
+    fin = models.DateField()
+    quantite = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["article", "debut", "fin"], name="occupation_article_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.article} x {self.quantite} du {self.debut} au {self.fin}"
+
+
+class OccupationJour(models.Model):
+    """
+    Unités d'un article utilisées un jour donné (somme des OccupationArticle
+    qui couvrent ce jour). Seuls les jours occupés sont stockés ; tenu à jour
+    par ventes.disponibilite en même temps que les intervalles.
+    """
+    jour = models.DateField()
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name="occupations_jours")
+    quantite = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["jour", "article"], name="occupation_jour_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.article} : {self.quantite} le {self.jour}"
+
+
+class CompteurFacture(models.Model):
+    """
+    Dernier numéro attribué d'une série de factures (ex: 'bim2509-B').
+    La ligne est verrouillée (select_for_update) le temps d'une allocation,
+    jusqu'à la fin de la transaction qui insère les commandes.
+    """
+    prefixe = models.CharField(max_length=20, unique=True)
+    dernier = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.prefixe} : {self.dernier}"
+
+    @classmethod
+    def verrouiller(cls, prefixe, initial):
+        """Compteur de `prefixe` verrouillé, créé à `initial()` s'il n'existe pas encore."""
+        compteur = cls.objects.select_for_update().filter(prefixe=prefixe).first()
+        if compteur is None:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(prefixe=prefixe, dernier=initial())
+            except IntegrityError:
+                pass  # créé au même moment par une autre transaction
+            compteur = cls.objects.select_for_update().get(prefixe=prefixe)
+        return compteur
+
+
+class CommandeStatutEvent(models.Model):
+    """
+    Journal des changements de statut des commandes, en ajout seul : une
+    ligne par statut (livraison ou vente) qui change, avec le livreur et
+    la date de livraison du moment. Écrit en lot par ventes.statuts.
+    """
+    CHAMPS = [
+        ("livraison", "Livraison"),
+        ("vente", "Vente"),
+    ]
+
+    commande = models.ForeignKey(Commande, on_delete=models.CASCADE, related_name="evenements_statut")
+    champ = models.CharField(max_length=10, choices=CHAMPS)
+    ancien = models.CharField(max_length=20, blank=True)  # vide à la création
+    nouveau = models.CharField(max_length=20)
+    livreur = models.ForeignKey(Livreur, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    date_livraison = models.DateField(null=True, blank=True)
+    cree_le = models.DateTimeField(default=timezone.now)
+    cree_par = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+",
+    )
+
+    class Meta:
+        ordering = ["cree_le", "id"]
+        indexes = [
+            models.Index(fields=["champ", "nouveau", "cree_le"], name="statut_event_nouveau_idx"),
+            models.Index(fields=["livreur", "cree_le"], name="statut_event_livreur_idx"),
+            models.Index(fields=["commande", "cree_le"], name="statut_event_commande_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.commande_id} {self.champ} : {self.ancien or '—'} → {self.nouveau}"
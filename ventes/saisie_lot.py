@@ -0,0 +1,339 @@
+# ventes/saisie_lot.py
+"""
+Saisie de commandes en lot (API JSON).
+
+Le lot est traité en une transaction et en requêtes groupées : clients,
+articles, pages et lieux résolus par quelques SELECT ... IN, numéros de
+facture alloués en bloc, commandes et lignes insérées par bulk_create.
+Chaque commande est validée séparément : une commande invalide (champ
+manquant, article inconnu, stock ou disponibilité insuffisants) est rejetée
+avec ses erreurs sans bloquer les autres.
+
+Format d'une commande :
+    {"ref": "...",                      # optionnel, renvoyé tel quel
+     "client": {"nom", "contact", "lieu", "precision_lieu", "reference_client"},
+     "page": id, "remarque": "...",
+     "date_commande", "date_livraison", "date_debut_prestation", "date_fin_prestation",  # AAAA-MM-JJ
+     "frais_livraison": n, "frais_livreur": n,
+     "lignes": [{"article": id | "reference": "...", "quantite": n, "prix_unitaire": n}]}
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from articles.models import Article
+from clients.models import Client
+from common import referentiel
+from common.utils import lire_date, lire_pk
+from stocks.reservation import disponibles, message_stock_insuffisant, verrouiller
+from .disponibilite import ControleLot, message_surreservation
+from .models import Commande, LigneCommande
+from .suivi import suivi_commandes_en_masse
+
+MAX_COMMANDES = 1000
+CHAMPS_DATES = ("date_commande", "date_livraison", "date_debut_prestation", "date_fin_prestation")
+
+
+def _texte(valeur):
+    return str(valeur).strip() if valeur is not None else ""
+
+
+def _scalaire(valeur):
+    """Identifiant tel que reçu (texte ou entier) ; None pour une liste, un objet, etc."""
+    return valeur if isinstance(valeur, (str, int)) and not isinstance(valeur, bool) else None
+
+
+def _lignes_brutes(brute):
+    lignes = brute.get("lignes")
+    return lignes if isinstance(lignes, list) else []
+
+
+def _cle(valeur):
+    return _texte(valeur).casefold()
+
+
+def _entier(valeur, erreurs, libelle, defaut=0):
+    if valeur in (None, ""):
+        return defaut
+    try:
+        entier = int(valeur)
+    except (TypeError, ValueError):
+        entier = -1
+    if entier < 0:
+        erreurs.append(f"{libelle} invalide : {valeur!r}.")
+        return defaut
+    return entier
+
+
+def _date(valeur, erreurs, libelle):
+    if valeur in (None, ""):
+        return None
+    jour = lire_date(str(valeur))
+    if jour is None:
+        erreurs.append(f"{libelle} invalide (attendu AAAA-MM-JJ) : {valeur!r}.")
+    return jour
+
+
+def _references(commandes):
+    """Articles, pages et lieux cités dans le lot, chacun en une requête."""
+    ids, refs, pages, lieux = set(), set(), set(), set()
+    for brute in commandes:
+        if not isinstance(brute, dict):
+            continue
+        # Valeurs non scalaires ignorées ici : _preparer rejette la commande
+        pages.add(_scalaire(brute.get("page")))
+        client = brute.get("client")
+        if isinstance(client, dict):
+            lieux.add(_scalaire(client.get("lieu")))
+        for ligne in _lignes_brutes(brute):
+            if not isinstance(ligne, dict):
+                continue
+            if ligne.get("article") not in (None, ""):
+                ids.add(_scalaire(ligne["article"]))
+            elif _scalaire(ligne.get("reference")):
+                refs.add(_texte(ligne["reference"]))
+
+    def _pks(valeurs):
+        return {pk for pk in map(lire_pk, valeurs) if pk is not None}
+
+    articles = Article.actifs.in_bulk(_pks(ids))
+    par_reference = Article.actifs.in_bulk(refs, field_name="reference") if refs else {}
+    pages, lieux = _pks(pages), _pks(lieux)
+    return (
+        articles,
+        par_reference,
+        {p.pk: p for p in referentiel.pages("VENTE") if p.pk in pages},
+        {l.pk: l for l in referentiel.lieux(actifs=True) if l.pk in lieux},
+    )
+
+
+def _preparer(brute, articles, par_reference, pages, lieux, aujourd_hui):
+    """Valide une commande brute ; retourne (commande préparée ou None, erreurs)."""
+    erreurs = []
+    if not isinstance(brute, dict):
+        return None, ["Commande attendue sous forme d'objet JSON."]
+
+    client = brute.get("client") if isinstance(brute.get("client"), dict) else {}
+    nom, contact = _texte(client.get("nom")), _texte(client.get("contact"))
+    lieu = lieux.get(lire_pk(client.get("lieu")))
+    page = pages.get(lire_pk(brute.get("page")))
+    if not nom or not contact or not lieu or not page:
+        erreurs.append("Merci de renseigner Nom, Contact, Lieu et Page.")
+
+    dates = {champ: _date(brute.get(champ), erreurs, champ) for champ in CHAMPS_DATES}
+    frais_livraison = _entier(brute.get("frais_livraison"), erreurs, "frais_livraison")
+    frais_livreur = _entier(brute.get("frais_livreur"), erreurs, "frais_livreur")
+    debut = dates["date_debut_prestation"] or aujourd_hui
+    fin = dates["date_fin_prestation"] or aujourd_hui
+    if fin < debut:
+        erreurs.append("La date de fin ne peut pas être avant la date de début.")
+
+    lignes = []
+    for i, ligne in enumerate(_lignes_brutes(brute), start=1):
+        if not isinstance(ligne, dict):
+            erreurs.append(f"Ligne {i} : objet attendu.")
+            continue
+        if ligne.get("article") not in (None, ""):
+            article = articles.get(lire_pk(ligne["article"]))
+        else:
+            article = par_reference.get(_texte(ligne.get("reference")))
+        if article is None:
+            erreurs.append(f"Ligne {i} : article introuvable.")
+            continue
+        quantite = _entier(ligne.get("quantite"), erreurs, f"Ligne {i} : quantité")
+        if quantite <= 0:
+            erreurs.append(f"Ligne {i} : quantité attendue supérieure à 0.")
+            continue
+        prix = _entier(ligne.get("prix_unitaire"), erreurs, f"Ligne {i} : prix unitaire", article.prix_vente)
+        lignes.append((article, quantite, prix))
+    if not lignes and not erreurs:
+        erreurs.append("Aucune ligne de commande.")
+
+    if erreurs:
+        return None, erreurs
+
+    besoins = defaultdict(int)
+    for article, quantite, _ in lignes:
+        besoins[article.pk] += quantite
+    return {
+        "nom": nom,
+        "contact": contact,
+        "reference_client": _texte(client.get("reference_client")),
+        "precision_lieu": _texte(client.get("precision_lieu")),
+        "lieu": lieu,
+        "page": page,
+        "remarque": _texte(brute.get("remarque")),
+        "date_commande": dates["date_commande"] or aujourd_hui,
+        "date_livraison": dates["date_livraison"] or aujourd_hui,
+        "date_debut_prestation": debut,
+        "date_fin_prestation": fin,
+        "frais_livraison": frais_livraison,
+        "frais_livreur": frais_livreur,
+        "lignes": lignes,
+        "besoins": dict(besoins),
+    }, erreurs
+
+
+def _resoudre_clients(commandes):
+    """
+    Même règle que le formulaire (contact d'abord, sinon nom ; le plus récent
+    gagne), en une requête pour tout le lot. Les clients existants reçoivent
+    une mise à jour douce (bulk_update), les nouveaux sont insérés ensemble.
+    """
+    contacts = {_cle(c["contact"]) for c in commandes}
+    noms = {_cle(c["nom"]) for c in commandes}
+    par_contact, par_nom = {}, {}
+    for client in (
+        Client.objects.annotate(contact_cle=Lower("contact"), nom_cle=Lower("nom"))
+        .filter(Q(contact_cle__in=contacts) | Q(nom_cle__in=noms))
+        .order_by("id")
+    ):
+        par_contact[_cle(client.contact)] = client
+        par_nom[_cle(client.nom)] = client
+
+    # reference_client est unique : une référence déjà portée par un autre client n'est pas reprise
+    proprietaires = {
+        ref: ("client", pk)
+        for ref, pk in Client.objects.filter(
+            reference_client__in={c["reference_client"] for c in commandes if c["reference_client"]}
+        ).values_list("reference_client", "pk")
+    }
+    nouveaux, modifies = [], {}
+    for c in commandes:
+        client = par_contact.get(_cle(c["contact"])) or par_nom.get(_cle(c["nom"]))
+        if client is None:
+            client = Client(nom=c["nom"], contact=c["contact"], lieu=c["lieu"], precision_lieu=c["precision_lieu"])
+            nouveaux.append(client)
+        else:
+            client.nom, client.contact, client.lieu = c["nom"], c["contact"], c["lieu"]
+            if c["precision_lieu"]:
+                client.precision_lieu = c["precision_lieu"]
+            modifies[id(client)] = client
+        ref = c["reference_client"]
+        identite = ("client", client.pk) if client.pk else ("nouveau", id(client))
+        if ref and proprietaires.setdefault(ref, identite) == identite:
+            client.reference_client = ref
+        par_contact[_cle(c["contact"])] = par_nom[_cle(c["nom"])] = client
+        c["client"] = client
+
+    if connection.features.can_return_rows_from_bulk_insert:
+        Client.objects.bulk_create(nouveaux)
+    else:
+        for client in nouveaux:
+            client.save()
+    existants = [client for client in modifies.values() if client.pk]
+    Client.objects.bulk_update(
+        existants, ["nom", "contact", "lieu", "precision_lieu", "reference_client"], batch_size=500,
+    )
+
+
+def _inserer_commandes(commandes, user):
+    """
+    Numéros de facture en bloc (compteur de la série verrouillé jusqu'à la
+    fin de la transaction du lot) puis bulk_create ; réessaie si un numéro
+    était déjà pris hors compteur.
+    """
+    objs = [
+        Commande(
+            client=c["client"], page=c["page"], remarque=c["remarque"],
+            date_commande=c["date_commande"], date_livraison=c["date_livraison"],
+            date_debut_prestation=c["date_debut_prestation"], date_fin_prestation=c["date_fin_prestation"],
+            frais_livraison=c["frais_livraison"], frais_livreur=c["frais_livreur"], created_by=user,
+        )
+        for c in commandes
+    ]
+    for tentative in range(5):
+        for obj, numero in zip(objs, Commande.generer_numeros_factures(len(objs))):
+            obj.numero_facture = numero
+        try:
+            with transaction.atomic():
+                Commande.objects.bulk_create(objs, batch_size=500)
+            break
+        except IntegrityError:
+            # Seul un numéro déjà pris justifie un nouveau bloc ; toute autre erreur remonte
+            if not Commande._base_manager.filter(numero_facture__in=[o.numero_facture for o in objs]).exists():
+                raise
+    else:
+        raise IntegrityError("Impossible d'allouer un bloc de numeros de facture uniques")
+
+    if any(obj.pk is None for obj in objs):
+        # MySQL ne renvoie pas les clés d'un INSERT multiple : relecture par numéro
+        pks = dict(
+            Commande.objects.filter(numero_facture__in=[o.numero_facture for o in objs])
+            .values_list("numero_facture", "pk")
+        )
+        for obj in objs:
+            obj.pk = pks[obj.numero_facture]
+    return objs
+
+
+@transaction.atomic
+def saisir_commandes(donnees, user=None):
+    """
+    Crée les commandes valides de `donnees` (liste de dicts, voir le format
+    en tête de module). Retourne un résultat par commande, dans l'ordre :
+    {"index", "ref", "statut": "créée", "commande_id", "numero_facture"}
+    ou {"index", "ref", "statut": "rejetée", "erreurs": [...]}.
+    """
+    aujourd_hui = timezone.now().date()
+    articles, par_reference, pages, lieux = _references(donnees)
+
+    resultats, preparees = [], []
+    for index, brute in enumerate(donnees):
+        ref = brute.get("ref") if isinstance(brute, dict) else None
+        commande, erreurs = _preparer(brute, articles, par_reference, pages, lieux, aujourd_hui)
+        resultats.append({"index": index, "ref": ref, "statut": "rejetée", "erreurs": erreurs})
+        if commande:
+            commande["resultat"] = resultats[-1]
+            preparees.append(commande)
+
+    # Stock : compteurs verrouillés (ordre des clés) puis répartis en mémoire
+    article_ids = {article_id for c in preparees for article_id in c["besoins"]}
+    verrouiller(article_ids)
+    stock = disponibles(article_ids)
+    controle = ControleLot([
+        (c["date_debut_prestation"], c["date_fin_prestation"], c["besoins"]) for c in preparees
+    ])
+    acceptees = []
+    for c in preparees:
+        manquants = [
+            (article_id, q, stock.get(article_id, 0))
+            for article_id, q in c["besoins"].items() if q > stock.get(article_id, 0)
+        ]
+        if manquants:
+            c["resultat"]["erreurs"].append(message_stock_insuffisant(manquants))
+            continue
+        conflits = controle.conflits(c["besoins"], c["date_debut_prestation"], c["date_fin_prestation"])
+        if conflits:
+            c["resultat"]["erreurs"].append(message_surreservation(conflits))
+            continue
+        for article_id, q in c["besoins"].items():
+            stock[article_id] -= q
+        controle.ajouter(c["besoins"], c["date_debut_prestation"], c["date_fin_prestation"])
+        acceptees.append(c)
+
+    if not acceptees:
+        return resultats
+
+    _resoudre_clients(acceptees)
+    objs = _inserer_commandes(acceptees, user)
+    with suivi_commandes_en_masse([obj.pk for obj in objs], user, nouvelles=True):  # bulk_create sans signal
+        LigneCommande.objects.bulk_create(
+            [
+                LigneCommande(
+                    commande=obj, article=article, quantite=quantite, prix_unitaire=prix,
+                    prix_achat=article.prix_achat, created_by=user,
+                )
+                for obj, c in zip(objs, acceptees)
+                for article, quantite, prix in c["lignes"]
+            ],
+            batch_size=1000,
+        )
+
+    for obj, c in zip(objs, acceptees):
+        del c["resultat"]["erreurs"]
+        c["resultat"].update(statut="créée", commande_id=obj.pk, numero_facture=obj.numero_facture)
+    return resultats
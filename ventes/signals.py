@@ -0,0 +1,41 @@
+# ventes/signals.py
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .disponibilite import maj_occupations
+from .models import Commande, LigneCommande
+from .statuts import CHAMPS, en_lot, etat, etats, journaliser
+
+# Champs de la commande qui déplacent ou libèrent ses intervalles d'occupation
+CHAMPS_OCCUPATION = {"date_debut_prestation", "date_fin_prestation", "statut_vente", "statut_livraison", "statut_publication"}
+
+
+@receiver(post_save, sender=Commande)
+def maj_occupations_commande(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not CHAMPS_OCCUPATION & set(update_fields)):
+        return
+    maj_occupations([instance.pk])
+
+
+@receiver(post_save, sender=LigneCommande)
+@receiver(post_delete, sender=LigneCommande)
+def maj_occupations_ligne(sender, instance, **kwargs):
+    maj_occupations([instance.commande_id])
+
+
+@receiver(pre_save, sender=Commande)
+def noter_statuts(sender, instance, update_fields=None, **kwargs):
+    # Les traitements groupés (journal_statuts) journalisent eux-mêmes, en un lot
+    if not instance.pk or en_lot(instance.pk):
+        return
+    if update_fields is not None and not set(CHAMPS.values()) & set(update_fields):
+        return
+    instance._statuts_avant = etats([instance.pk])
+
+
+@receiver(post_save, sender=Commande)
+def journaliser_statuts(sender, instance, created, **kwargs):
+    avant = {} if created else instance.__dict__.pop("_statuts_avant", None)
+    if avant is None:
+        return
+    journaliser(avant, {instance.pk: etat(instance)}, instance.updated_by_id or instance.created_by_id)
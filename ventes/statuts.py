@@ -0,0 +1,81 @@
+# ventes/statuts.py
+"""
+Journal des statuts de commande (CommandeStatutEvent), en ajout seul.
+
+Enregistrement unitaire : les signaux comparent les statuts d'une commande
+avant et après son save() et ajoutent les lignes du changement.
+Traitements groupés (update(), boucles de save(), bulk_create) :
+`journal_statuts(ids, user)` lit les statuts des commandes avant et après
+le bloc (une requête chacune) et écrit tous les changements en un
+bulk_create ; pendant le bloc, les signaux ignorent ces commandes.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.utils import timezone
+
+from common.backfill import DEFAULT_BATCH_SIZE
+from .models import Commande, CommandeStatutEvent
+
+# Champ du journal -> champ de la commande
+CHAMPS = {"livraison": "statut_livraison", "vente": "statut_vente"}
+
+_en_lot = ContextVar("statuts_en_lot", default=frozenset())
+
+
+def en_lot(commande_id):
+    """La commande est-elle suivie par un `journal_statuts` en cours ?"""
+    return commande_id in _en_lot.get()
+
+
+def etat(commande):
+    return {
+        "livraison": commande.statut_livraison,
+        "vente": commande.statut_vente,
+        "livreur_id": commande.livreur_id,
+        "date_livraison": commande.date_livraison,
+    }
+
+
+def etats(commande_ids):
+    """{pk: état} des commandes telles qu'enregistrées en base."""
+    return {
+        pk: {"livraison": livraison, "vente": vente, "livreur_id": livreur_id, "date_livraison": date_livraison}
+        for pk, livraison, vente, livreur_id, date_livraison in Commande._base_manager.filter(pk__in=commande_ids)
+        .values_list("pk", "statut_livraison", "statut_vente", "livreur_id", "date_livraison")
+    }
+
+
+def journaliser(avant, apres, user=None):
+    """Ajoute un événement par statut qui diffère entre `avant` et `apres` ({pk: état})."""
+    quand = timezone.now()
+    user_id = getattr(user, "pk", user)
+    evenements = [
+        CommandeStatutEvent(
+            commande_id=pk, champ=champ, ancien=avant.get(pk, {}).get(champ) or "", nouveau=nouveau[champ],
+            livreur_id=nouveau["livreur_id"], date_livraison=nouveau["date_livraison"],
+            cree_le=quand, cree_par_id=user_id,
+        )
+        for pk, nouveau in apres.items()
+        for champ in CHAMPS
+        if nouveau[champ] != avant.get(pk, {}).get(champ)
+    ]
+    CommandeStatutEvent.objects.bulk_create(evenements, batch_size=DEFAULT_BATCH_SIZE)
+    return len(evenements)
+
+
+@contextmanager
+def journal_statuts(commande_ids, user=None, nouvelles=False):
+    """
+    Journalise en un seul bulk_create les changements de statut des
+    `commande_ids` faits dans le bloc ; `nouvelles` : commandes tout juste
+    créées (bulk_create), dont les statuts sont journalisés comme créations.
+    """
+    commande_ids = {int(pk) for pk in commande_ids}
+    avant = {} if nouvelles else etats(commande_ids)
+    jeton = _en_lot.set(_en_lot.get() | commande_ids)
+    try:
+        yield
+    finally:
+        _en_lot.reset(jeton)
+    journaliser(avant, etats(commande_ids), user)
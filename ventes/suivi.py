@@ -0,0 +1,37 @@
+# ventes/suivi.py
+"""
+Écritures en masse sur des commandes (update(), bulk_create), qui
+n'émettent pas de signal.
+
+`suivi_commandes_en_masse(ids, user)` reprend en un seul bloc tout ce que
+les signaux d'une commande maintiennent : stock disponible, comptes des
+livreurs, statistiques de livraison, écritures des ventes, répartition des
+charges, journal des statuts et intervalles d'occupation. Chaque suivi lit
+l'état des commandes avant le bloc et met à jour la différence après ; le
+tout dans une transaction (StockInsuffisant, PeriodeCloturee annulent tout).
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from comptabilite.journal import suivi_ventes
+from comptabilite.repartition import suivi_repartition
+from livraison.performances import suivi_stats
+from livraison.soldes import suivi_livreurs
+from stocks.reservation import suivi_commandes
+from .disponibilite import maj_occupations
+from .statuts import journal_statuts
+
+
+@contextmanager
+def suivi_commandes_en_masse(commande_ids, user=None, nouvelles=False):
+    """
+    Suit les `commande_ids` modifiées dans le bloc. `nouvelles` : commandes
+    créées juste avant le bloc (bulk_create), journalisées comme créations.
+    """
+    commande_ids = [int(pk) for pk in commande_ids]
+    with transaction.atomic(), suivi_commandes(commande_ids), suivi_livreurs(commande_ids), \
+            suivi_stats(commande_ids), suivi_ventes(commande_ids), suivi_repartition(commande_ids), \
+            journal_statuts(commande_ids, user, nouvelles=nouvelles):
+        yield
+        maj_occupations(commande_ids)
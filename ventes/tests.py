@@ -1,3 +1,28 @@
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from clients.models import Client
+from .models import Commande, CompteurFacture
+
+
+class NumerotationFacturesTests(TestCase):
+    def setUp(self):
+        self.serie = f"bim{timezone.now():%y%m}-B"
+
+    def test_blocs_consecutifs_sans_chevauchement(self):
+        premier = Commande.generer_numeros_factures(3)
+        second = Commande.generer_numeros_factures(2)
+        self.assertEqual(premier, [f"{self.serie}001", f"{self.serie}002", f"{self.serie}003"])
+        self.assertEqual(second, [f"{self.serie}004", f"{self.serie}005"])
+        self.assertEqual(Commande.generer_numero_facture_atomic(), f"{self.serie}006")
+        self.assertEqual(CompteurFacture.objects.get(prefixe=self.serie).dernier, 6)
+
+    def test_compteur_repris_du_dernier_numero_attribue(self):
+        client = Client.objects.create(nom="Client", contact="0340000000")
+        # Commande antérieure au compteur (bulk_create : pas de numérotation au save)
+        Commande.objects.bulk_create([Commande(client=client, page=None, numero_facture=f"{self.serie}007")])
+        self.assertEqual(Commande.generer_numeros_factures(2), [f"{self.serie}008", f"{self.serie}009"])
+
+    def test_series_independantes(self):
+        Commande.generer_numeros_factures(2)
+        self.assertEqual(Commande.generer_numeros_factures(1, serie="C"), [f"bim{timezone.now():%y%m}-C001"])
@@ -25,6 +25,8 @@ urlpatterns = [
     path('facturation/voir/', views.voir_factures, name='voir_factures'),
     path('facturation/imprimer/', views.imprimer_factures, name='imprimer_factures'),
     path('facturation/pdf/', views.factures_pdf, name='factures_pdf'),
+    path('calendrier/', views.calendrier_location, name='calendrier_location'),
+    path('api/commandes/lot/', views.commandes_lot, name='commandes_lot'),
 
 ]
 
@@ -14,18 +14,23 @@ from django.contrib import messages
 from django.db.models import Sum, Prefetch
 from django.core.paginator import Paginator
 from django.db import transaction
-from datetime import date
+from datetime import date, timedelta
 from weasyprint import HTML
 
+from common import referentiel
 from common.decorators import admin_required
-from common.utils import is_admin, resolve_display_mode
+from common.utils import Periode, is_admin, resolve_display_mode
 from common.models import Pages, Caisse
-from stocks.utils import calculer_stock_article
+from stocks.reservation import StockInsuffisant, disponibles, message_stock_insuffisant, verrouiller
 
 from .models import Commande, LigneCommande, Vente
+from .statuts import journal_statuts
+from .suivi import suivi_commandes_en_masse
+from .saisie_lot import MAX_COMMANDES, saisir_commandes
+from .disponibilite import calendrier, message_surreservation, parcs, surreservations
 from clients.models import Client
 from articles.models import Article
-from livraison.models import Livraison, Livreur
+from livraison.models import Livraison
 from .forms import VenteForm
 from django.urls import reverse
 from django.db.models import Q
@@ -151,7 +156,7 @@ def build_commandes_context(request):
     page_obj = paginator.get_page(page_number)
 
     # Données nécessaires aux modals inclus (création commande)
-    lieux = Livraison.actifs.all().order_by('lieu')
+    lieux = referentiel.lieux(actifs=True)
 
     # ⚠️ Corrigé : on précharge les FK + on sérialise categorie/taille/couleur en chaînes lisibles
     articles_qs = (
@@ -160,6 +165,7 @@ def build_commandes_context(request):
         .order_by('nom')
     )
 
+    stocks = disponibles()
     articles_data = []
     for a in articles_qs:
         articles_data.append({
@@ -171,7 +177,7 @@ def build_commandes_context(request):
             "livraison": a.livraison or "",
             "prix_vente": int(getattr(a, "prix_vente", 0) or 0),
             "prix_achat": int(getattr(a, "prix_achat", 0) or 0),
-            "stock": int(calculer_stock_article(a) or 0),
+            "stock": stocks.get(a.id, 0),
         })
     articles_json = json.dumps(articles_data, cls=DjangoJSONEncoder)
 
@@ -201,7 +207,7 @@ def build_commandes_context(request):
 
         # Listes pour filtres et modals
         'articles': articles_qs,
-        'pages': Pages.actifs.filter(type="VENTE"),
+        'pages': referentiel.pages("VENTE"),
         'lieux': lieux,
 
         # Totaux
@@ -250,6 +256,19 @@ def detail_commande(request, commande_id):
     return render(request, 'ventes/detail_commande.html', context)
 
 
+def _besoins_articles(post):
+    """{article_id: quantité totale} des lignes postées (même article sur plusieurs lignes cumulé)."""
+    besoins = {}
+    for article_id, quantite in zip(post.getlist('article'), post.getlist('quantite')):
+        try:
+            article_id, quantite = int(article_id), int(quantite or 0)
+        except (TypeError, ValueError):
+            continue
+        if quantite > 0:
+            besoins[article_id] = besoins.get(article_id, 0) + quantite
+    return besoins
+
+
 @login_required
 def creer_commande(request):
     # Jeux de données pour GET et pour (re)afficher le formulaire après erreur
@@ -258,8 +277,8 @@ def creer_commande(request):
         .select_related('categorie', 'taille', 'couleur')
         .order_by('nom')
     )
-    pages = Pages.actifs.filter(type="VENTE")
-    lieux = Livraison.actifs.all().order_by('lieu')
+    pages = referentiel.pages("VENTE")
+    lieux = referentiel.lieux(actifs=True)
 
     if request.method == 'POST':
         # --- Récupération champs ---
@@ -287,94 +306,112 @@ def creer_commande(request):
 
         page_id = request.POST.get('page')
 
+        # --- Disponibilité des articles sur la période de prestation ---
+        aujourd_hui = timezone.now().date()
+        conflits = surreservations(
+            _besoins_articles(request.POST),
+            date_debut_prestation or aujourd_hui,
+            date_fin_prestation or aujourd_hui,
+        )
+
         # --- Validations rapides ---
         if not nom or not contact or not lieu_id or not page_id:
             messages.error(request, "Merci de renseigner Nom, Contact, Lieu et Page.")
+        elif conflits:
+            messages.error(request, message_surreservation(conflits))
         else:
-            # --- Récup objets liés ---
-            lieu = get_object_or_404(Livraison, id=lieu_id)
-            page = get_object_or_404(Pages, id=page_id)
-
-            # --- Client : rechercher existant puis MAJ douce, sinon créer ---
-            client = None
-            # 1) priorité au contact (souvent unique)
-            if contact:
-                client = Client.objects.filter(contact__iexact=contact).order_by('-id').first()
-            # 2) fallback (nom, contact)
-            if not client and nom and contact:
-                client = Client.objects.filter(nom__iexact=nom, contact__iexact=contact).order_by('-id').first()
-            # 3) fallback nom seul
-            if not client and nom:
-                client = Client.objects.filter(nom__iexact=nom).order_by('-id').first()
-
-            if client:
-                # MAJ sans écraser avec des vides
-                if nom and client.nom != nom:
-                    client.nom = nom
-                if contact and client.contact != contact:
-                    client.contact = contact
-                if reference_client:
-                    client.reference_client = reference_client
-                # on prend les valeurs fournies si présentes (sinon on garde l'existant)
-                if lieu:
-                    client.lieu = lieu
-                if precision_lieu:
-                    client.precision_lieu = precision_lieu
-                client.save()
+            try:
+                with transaction.atomic():
+                    # Compteurs des articles pris dans l'ordre des clés (pas d'interblocage)
+                    verrouiller(request.POST.getlist('article'))
+
+                    # --- Récup objets liés ---
+                    lieu = get_object_or_404(Livraison, id=lieu_id)
+                    page = get_object_or_404(Pages, id=page_id)
+
+                    # --- Client : rechercher existant puis MAJ douce, sinon créer ---
+                    client = None
+                    # 1) priorité au contact (souvent unique)
+                    if contact:
+                        client = Client.objects.filter(contact__iexact=contact).order_by('-id').first()
+                    # 2) fallback (nom, contact)
+                    if not client and nom and contact:
+                        client = Client.objects.filter(nom__iexact=nom, contact__iexact=contact).order_by('-id').first()
+                    # 3) fallback nom seul
+                    if not client and nom:
+                        client = Client.objects.filter(nom__iexact=nom).order_by('-id').first()
+
+                    if client:
+                        # MAJ sans écraser avec des vides
+                        if nom and client.nom != nom:
+                            client.nom = nom
+                        if contact and client.contact != contact:
+                            client.contact = contact
+                        if reference_client:
+                            client.reference_client = reference_client
+                        # on prend les valeurs fournies si présentes (sinon on garde l'existant)
+                        if lieu:
+                            client.lieu = lieu
+                        if precision_lieu:
+                            client.precision_lieu = precision_lieu
+                        client.save()
+                    else:
+                        client = Client.objects.create(
+                            nom=nom,
+                            contact=contact,
+                            lieu=lieu,
+                            precision_lieu=precision_lieu,
+                            reference_client=reference_client
+                        )
+
+                    # --- Commande ---
+                    commande = Commande.objects.create(
+                        client=client,
+                        page=page,
+                        remarque=remarque,
+                        date_commande=date_commande or timezone.now().date(),
+                        date_livraison=date_livraison or timezone.now().date(),
+                        date_debut_prestation=date_debut_prestation or timezone.now().date(),
+                        date_fin_prestation=date_fin_prestation or timezone.now().date(),
+                        frais_livreur=frais_livreur,
+                        frais_livraison=frais_livraison,
+                    )
+
+                    # --- Lignes ---
+                    article_ids = request.POST.getlist('article')
+                    quantites   = request.POST.getlist('quantite')
+                    pu_list     = request.POST.getlist('pu')
+
+                    for i in range(len(article_ids)):
+                        if not article_ids[i]:
+                            continue
+                        article = get_object_or_404(Article, pk=article_ids[i])
+
+                        try:
+                            pu = int(pu_list[i] or 0)
+                        except (TypeError, ValueError):
+                            pu = 0
+
+                        try:
+                            qte = int(quantites[i] or 0)
+                        except (TypeError, ValueError):
+                            qte = 0
+
+                        LigneCommande.objects.create(
+                            commande=commande,
+                            article=article,
+                            prix_unitaire=pu,
+                            prix_achat=article.prix_achat,
+                            quantite=qte,
+                        )
+            except StockInsuffisant as e:
+                messages.error(request, message_stock_insuffisant(e.manquants))
             else:
-                client = Client.objects.create(
-                    nom=nom,
-                    contact=contact,
-                    lieu=lieu,
-                    precision_lieu=precision_lieu,
-                    reference_client=reference_client
-                )
-
-            # --- Commande ---
-            commande = Commande.objects.create(
-                client=client,
-                page=page,
-                remarque=remarque,
-                date_commande=date_commande or timezone.now().date(),
-                date_livraison=date_livraison or timezone.now().date(),
-                date_debut_prestation=date_debut_prestation or timezone.now().date(),
-                date_fin_prestation=date_fin_prestation or timezone.now().date(),
-                frais_livreur=frais_livreur,
-                frais_livraison=frais_livraison,
-            )
-
-            # --- Lignes ---
-            article_ids = request.POST.getlist('article')
-            quantites   = request.POST.getlist('quantite')
-            pu_list     = request.POST.getlist('pu')
-
-            for i in range(len(article_ids)):
-                if not article_ids[i]:
-                    continue
-                article = get_object_or_404(Article, pk=article_ids[i])
-
-                try:
-                    pu = int(pu_list[i] or 0)
-                except (TypeError, ValueError):
-                    pu = 0
-
-                try:
-                    qte = int(quantites[i] or 0)
-                except (TypeError, ValueError):
-                    qte = 0
-
-                LigneCommande.objects.create(
-                    commande=commande,
-                    article=article,
-                    prix_unitaire=pu,
-                    prix_achat=article.prix_achat,
-                    quantite=qte,
-                )
-
-            return redirect('commande_detail', commande_id=commande.id)
+                return redirect('commande_detail', commande_id=commande.id)
 
     # --- GET (ou POST invalide)
     # JSON articles pour le JS (valeurs lisibles pour les FK)
+    stocks = disponibles()
     articles_data = []
     for a in articles:
         articles_data.append({
@@ -386,7 +423,7 @@ def creer_commande(request):
             "livraison": a.livraison or "",
             "prix_vente": int(getattr(a, "prix_vente", 0) or 0),
             "prix_achat": int(getattr(a, "prix_achat", 0) or 0),
-            "stock": int(calculer_stock_article(a) or 0),
+            "stock": stocks.get(a.id, 0),
         })
     articles_json = json.dumps(articles_data, cls=DjangoJSONEncoder)
     date_du_jour = date.today().isoformat()
@@ -409,15 +446,16 @@ def commande_edit(request, commande_id):
         messages.warning(request, "Impossible de modifier une commande déjà payée.")
         return redirect('commande_detail', commande_id=commande.id)
 
-    pages = Pages.actifs.filter(type="VENTE")
-    lieux = Livraison.actifs.all().order_by('lieu')
+    pages = referentiel.pages("VENTE")
+    lieux = referentiel.lieux(actifs=True)
     articles = (
         Article.actifs
         .select_related('categorie', 'taille', 'couleur')
         .order_by('nom')
     )
+    stocks = disponibles()
     for a in articles:
-        a.stock = calculer_stock_article(a)
+        a.stock = stocks.get(a.id, 0)
 
     if request.method == 'POST':
         # --- Récupération champs ---
@@ -445,78 +483,98 @@ def commande_edit(request, commande_id):
 
         page_id = request.POST.get('page')
 
+        # --- Disponibilité (hors lignes actuelles de cette commande) ---
+        aujourd_hui = timezone.now().date()
+        conflits = surreservations(
+            _besoins_articles(request.POST),
+            date_debut_prestation or commande.date_debut_prestation or aujourd_hui,
+            date_fin_prestation or commande.date_fin_prestation or aujourd_hui,
+            exclure_commande=commande.id,
+        )
+
         # --- Validations minimales ---
         if not nom or not contact or not lieu_id or not page_id:
             messages.error(request, "Merci de renseigner Nom, Contact, Lieu et Page.")
+        elif conflits:
+            messages.error(request, message_surreservation(conflits))
         else:
-            # --- MAJ objets liés ---
-            commande.page = get_object_or_404(Pages, id=page_id)
-            commande.date_commande = date_commande or commande.date_commande or timezone.now().date()
-            commande.date_livraison = date_livraison or commande.date_livraison or timezone.now().date()
-
-            # 🆕 champs prestation
-            if date_debut_prestation:
-                commande.date_debut_prestation = date_debut_prestation
-            elif not commande.date_debut_prestation:
-                commande.date_debut_prestation = timezone.now().date()
-
-            if date_fin_prestation:
-                commande.date_fin_prestation = date_fin_prestation
-            elif not commande.date_fin_prestation:
-                commande.date_fin_prestation = timezone.now().date()
-
-            commande.remarque = remarque
-            commande.frais_livreur = frais_livreur
-            commande.frais_livraison = frais_livraison
-            commande.save()
-
-            # Client
-            client = commande.client
-            client.nom = nom
-            client.contact = contact
-            client.lieu = get_object_or_404(Livraison, id=int(lieu_id))
-            client.precision_lieu = precision_lieu
-            if reference_client:                      # 🆕 n’écrase que si une valeur est envoyée
-                client.reference_client = reference_client  # 🆕
-            client.save()
-
-            # Lignes : on remplace proprement
-            LigneCommande.objects.filter(commande=commande).delete()
-
-            article_ids = request.POST.getlist('article')
-            quantites   = request.POST.getlist('quantite')
-            pu_list     = request.POST.getlist('pu')
-
-            for i in range(len(article_ids)):
-                if not article_ids[i]:
-                    continue
-                article = get_object_or_404(Article, pk=article_ids[i])
-
-                try:
-                    pu = int(pu_list[i] or 0)
-                except (TypeError, ValueError):
-                    pu = 0
-
-                try:
-                    qte = int(quantites[i] or 0)
-                except (TypeError, ValueError):
-                    qte = 0
-
-                LigneCommande.objects.create(
-                    commande=commande,
-                    article=article,
-                    prix_unitaire=pu,
-                    prix_achat=article.prix_achat,
-                    quantite=qte,
-                )
-
-            return redirect('commande_detail', commande_id=commande.id)
+            try:
+                with transaction.atomic():
+                    verrouiller(
+                        request.POST.getlist('article')
+                        + list(commande.lignes_commandes.values_list('article_id', flat=True))
+                    )
+
+                    # --- MAJ objets liés ---
+                    commande.page = get_object_or_404(Pages, id=page_id)
+                    commande.date_commande = date_commande or commande.date_commande or timezone.now().date()
+                    commande.date_livraison = date_livraison or commande.date_livraison or timezone.now().date()
+
+                    # 🆕 champs prestation
+                    if date_debut_prestation:
+                        commande.date_debut_prestation = date_debut_prestation
+                    elif not commande.date_debut_prestation:
+                        commande.date_debut_prestation = timezone.now().date()
+
+                    if date_fin_prestation:
+                        commande.date_fin_prestation = date_fin_prestation
+                    elif not commande.date_fin_prestation:
+                        commande.date_fin_prestation = timezone.now().date()
+
+                    commande.remarque = remarque
+                    commande.frais_livreur = frais_livreur
+                    commande.frais_livraison = frais_livraison
+                    commande.save()
+
+                    # Client
+                    client = commande.client
+                    client.nom = nom
+                    client.contact = contact
+                    client.lieu = get_object_or_404(Livraison, id=int(lieu_id))
+                    client.precision_lieu = precision_lieu
+                    if reference_client:                      # 🆕 n’écrase que si une valeur est envoyée
+                        client.reference_client = reference_client  # 🆕
+                    client.save()
+
+                    # Lignes : on remplace proprement
+                    LigneCommande.objects.filter(commande=commande).delete()
+
+                    article_ids = request.POST.getlist('article')
+                    quantites   = request.POST.getlist('quantite')
+                    pu_list     = request.POST.getlist('pu')
+
+                    for i in range(len(article_ids)):
+                        if not article_ids[i]:
+                            continue
+                        article = get_object_or_404(Article, pk=article_ids[i])
+
+                        try:
+                            pu = int(pu_list[i] or 0)
+                        except (TypeError, ValueError):
+                            pu = 0
+
+                        try:
+                            qte = int(quantites[i] or 0)
+                        except (TypeError, ValueError):
+                            qte = 0
+
+                        LigneCommande.objects.create(
+                            commande=commande,
+                            article=article,
+                            prix_unitaire=pu,
+                            prix_achat=article.prix_achat,
+                            quantite=qte,
+                        )
+            except StockInsuffisant as e:
+                messages.error(request, message_stock_insuffisant(e.manquants))
+            else:
+                return redirect('commande_detail', commande_id=commande.id)
 
     # --- GET (ou POST invalide) : préparer contexte pour le template d’édition ---
     # Annoter le stock actuel pour affichage
     lignes = LigneCommande.objects.filter(commande=commande).select_related('article')
     for ligne in lignes:
-        ligne.stock = calculer_stock_article(ligne.article)
+        ligne.stock = stocks.get(ligne.article_id, 0)
 
     # Données articles pour JS (même format que créer commande)
     articles_data = [{
@@ -583,11 +641,16 @@ def commande_restore(request, commande_id):
         messages.warning(request, "Mot de passe incorrect. Restauration annulée.")
         return redirect('liste_commandes')
 
-    # Restaurer les données
-    commande.restore(user=request.user)
-    commande.statut_vente = "En attente"
-    commande.statut_livraison = "En attente"
-    commande.save(update_fields=["statut_vente", "statut_livraison"])
+    # Restaurer les données (la commande reprend ses articles en stock)
+    try:
+        with transaction.atomic():
+            commande.restore(user=request.user)
+            commande.statut_vente = "En attente"
+            commande.statut_livraison = "En attente"
+            commande.save(update_fields=["statut_vente", "statut_livraison"])
+    except StockInsuffisant as e:
+        messages.warning(request, f"Restauration impossible. {message_stock_insuffisant(e.manquants)}")
+        return redirect('liste_commandes')
 
     messages.success(request, f"La commande #{commande.numero_facture} a été restaurée avec succès.")
     return redirect('liste_commandes')
@@ -648,12 +711,12 @@ def build_ventes_context(request):
         'total_ventes': total_ventes,
         'total_montant': total_montant,
         'total_frais': total_frais,
-        'paiements': Caisse.actifs.all(),
+        'paiements': referentiel.caisses(),
         'date_livraison': date_livraison,
         'date_encaissement': date_encaissement,
         'paiement_id': paiement_id,
         'filtre_page': page_id_filter,
-        'pages': Pages.actifs.filter(type="VENTE"),
+        'pages': referentiel.pages("VENTE"),
         'extra_querystring': extra_querystring,
         'display_mode': display_mode,
         'form_mod_dict': form_mod_dict,
@@ -737,9 +800,9 @@ def encaissement_ventes(request):
             clean_params.setlist(key, clean_values)
     extra_querystring = '&' + clean_params.urlencode() if clean_params else ''
 
-    caisses = Caisse.actifs.all()
+    caisses = referentiel.caisses()
     today = timezone.now().date()
-    livreurs = Livreur.objects.all().order_by("id")  # ajustez 'id' en 'nom' si dispo
+    livreurs = referentiel.livreurs()
 
     context = {
         'commandes': page_obj.object_list,
@@ -797,7 +860,7 @@ def encaissement_ventes_groupes(request):
         )
         return redirect('encaissement_ventes')
 
-    with transaction.atomic():
+    with transaction.atomic(), journal_statuts(ids, request.user):
         for commande in commandes:
             Vente.objects.create(
                 commande=commande,
@@ -1006,15 +1069,101 @@ def mise_a_jour_statuts_ventes_groupes(request):
             messages.warning(request, "Aucune commande sélectionnée.")
             return redirect('mise_a_jour_statuts_ventes')
 
+        if action not in ('en_attente', 'annulée'):
+            messages.error(request, "Action non reconnue.")
+            return redirect('mise_a_jour_statuts_ventes')
+        statut = 'En attente' if action == 'en_attente' else 'Annulée'
+
         commandes = Commande.objects.filter(id__in=ids)
+        try:
+            with suivi_commandes_en_masse(ids, request.user):  # update() sans signal
+                commandes.update(statut_vente=statut, statut_livraison=statut)
+        except StockInsuffisant as e:
+            messages.error(request, f"Remise en attente impossible. {message_stock_insuffisant(e.manquants)}")
+            return redirect('mise_a_jour_statuts_ventes')
 
         if action == 'en_attente':
-            commandes.update(statut_vente='En attente', statut_livraison='En attente')
             messages.success(request, f"{commandes.count()} commande(s) mises en attente.")
-        elif action == 'annulée':
-            commandes.update(statut_vente='Annulée', statut_livraison='Annulée')
-            messages.success(request, f"{commandes.count()} commande(s) annulée(s).")
         else:
-            messages.error(request, "Action non reconnue.")
-
+            messages.success(request, f"{commandes.count()} commande(s) annulée(s).")
         return redirect('mise_a_jour_statuts_ventes')
+
+
+def _periode_calendrier(valeur):
+    """« AAAA-MM » (input type=month) -> Periode du mois ; mois courant par défaut."""
+    aujourd_hui = timezone.localdate()
+    annee, _, mois = (valeur or "").partition("-")
+    return Periode.lire_mois(annee, mois, Periode.mois(aujourd_hui.year, aujourd_hui.month))
+
+
+@login_required
+def calendrier_location(request):
+    """
+    Grille d'occupation du parc (articles × jours du mois), lue dans
+    OccupationJour. ?format=json renvoie la même grille en JSON compact :
+    {"debut", "jours", "articles": [[id, nom, parc, [unités par jour]]]}.
+    """
+    periode = _periode_calendrier(request.GET.get("mois"))
+    recherche = request.GET.get("q", "").strip()
+
+    jours, occupation = calendrier(periode)
+    parc = parcs()
+    articles = Article.objects.filter(id__in=set(occupation) | {pk for pk, p in parc.items() if p})
+    if recherche:
+        articles = articles.filter(nom__icontains=recherche)
+    vides = [0] * len(jours)
+    lignes = [
+        (pk, nom, parc.get(pk), occupation.get(pk, vides))
+        for pk, nom in articles.order_by("nom").values_list("id", "nom")
+    ]
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "debut": periode.debut.isoformat(),
+            "jours": len(jours),
+            "articles": [list(ligne) for ligne in lignes],
+        })
+
+    mois_precedent = periode.debut - timedelta(days=1)
+    return render(request, "ventes/calendrier_location.html", {
+        "jours": jours,
+        "lignes": [
+            {
+                "nom": nom,
+                "parc": p,
+                # complet : tout le parc est sorti ; surréservé : plus que le parc
+                "cellules": [
+                    (q, "" if not q else "table-danger" if p is not None and q > p
+                     else "table-warning" if p is not None and q == p else "table-success")
+                    for q in occupes
+                ],
+            }
+            for _, nom, p, occupes in lignes
+        ],
+        "mois": periode.debut.strftime("%Y-%m"),
+        "mois_precedent": mois_precedent.strftime("%Y-%m"),
+        "mois_suivant": periode.fin.strftime("%Y-%m"),
+        "q": recherche,
+    })
+
+
+@login_required
+@require_POST
+def commandes_lot(request):
+    """
+    Saisie en lot : POST JSON {"commandes": [...]} (format dans ventes.saisie_lot).
+    Répond {"resultats": [un résultat par commande], "creees": n, "rejetees": n}.
+    """
+    try:
+        donnees = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({'error': 'JSON invalide.'}, status=400)
+    commandes = donnees.get('commandes') if isinstance(donnees, dict) else None
+    if not isinstance(commandes, list) or not commandes:
+        return JsonResponse({'error': 'Liste « commandes » attendue.'}, status=400)
+    if len(commandes) > MAX_COMMANDES:
+        return JsonResponse({'error': f'{MAX_COMMANDES} commandes au plus par lot.'}, status=400)
+
+    resultats = saisir_commandes(commandes, user=request.user)
+    creees = sum(1 for r in resultats if r['statut'] == 'créée')
+    return JsonResponse({'resultats': resultats, 'creees': creees, 'rejetees': len(resultats) - creees})